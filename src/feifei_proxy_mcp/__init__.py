@@ -1,3 +1,5 @@
+# 最先导入，启动耗时统计从包导入开始计时
+from .startup_timer import startup_timer  # noqa: F401
 from .server import startup
 
 def main():
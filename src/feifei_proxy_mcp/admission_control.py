@@ -0,0 +1,150 @@
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from .enums import ProxyErrorCode
+from .logger import McpLogger
+from .mcp_exception import McpProxyError
+from .tracing import span
+
+logger = McpLogger.get_logger()
+
+
+class ConcurrencyLimiter:
+    """
+    并发限制器 最多 limit 个请求同时执行，超出的请求进入有界等待队列（先进先出）
+    队列已满时立即拒绝，排队超过 queue_timeout 秒同样拒绝
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.active: int = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+        # 统计信息
+        self.rejected: int = 0
+        self.timed_out: int = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise McpProxyError(ProxyErrorCode.OVERLOADED.value,
+                                f"{self.name} is overloaded: {self.active} running, {len(self._waiters)} queued")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await waiter
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # 超时 / 取消的同时恰好拿到了执行名额，归还给下一个等待者
+                self.release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, TimeoutError):
+                self.timed_out += 1
+                raise McpProxyError(ProxyErrorCode.OVERLOADED.value,
+                                    f"{self.name} is overloaded: queued for more than {self.queue_timeout}s")
+            raise
+
+    def release(self):
+        # 名额直接移交给队首仍在等待的请求，active 不变
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class AdmissionController:
+    """
+    准入控制 在工具调用发往上游之前限制并发，保护上游进程并让尾延迟有界
+
+    全局限制（环境变量）：
+      PROXY_MCP_MAX_CONCURRENCY   全局最大并发工具调用数，0 表示不限制
+      PROXY_MCP_MAX_QUEUE         超出并发限制后的最大排队请求数
+      PROXY_MCP_QUEUE_TIMEOUT     最长排队时间（秒）
+
+    单个工具限制（PROXY_MCP_SERVER_CONFIG）：
+      "tools": {
+        "fetch": {"maxConcurrency": 4, "maxQueue": 20, "queueTimeout": 10}
+      }
+
+    队列已满或排队超时时，以 JSON-RPC 错误（-32003）快速拒绝
+    """
+
+    def __init__(self, max_concurrency: int = 0, max_queue: int = 100, queue_timeout: float = 30):
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.global_limiter: ConcurrencyLimiter | None = None
+        if max_concurrency > 0:
+            self.global_limiter = ConcurrencyLimiter("proxy", max_concurrency, max_queue, queue_timeout)
+        self.tool_limiters: dict[tuple[str, str], ConcurrencyLimiter] = {}
+
+    def _tool_limiter(self, mcp_name: str, tool_name: str, tool_config: dict[str, Any]) -> ConcurrencyLimiter | None:
+        max_concurrency = int(tool_config.get('maxConcurrency', 0))
+        if max_concurrency <= 0:
+            return None
+
+        key = (mcp_name, tool_name)
+        limiter = self.tool_limiters.get(key)
+        if limiter is None:
+            limiter = ConcurrencyLimiter(f"tool {mcp_name}/{tool_name}", max_concurrency,
+                                         int(tool_config.get('maxQueue', self.max_queue)),
+                                         float(tool_config.get('queueTimeout', self.queue_timeout)))
+            self.tool_limiters[key] = limiter
+        return limiter
+
+    def forget_server(self, mcp_name: str):
+        """ 配置热更新后丢弃某个 mcp server 的工具级限制器，按新配置重新创建；已获取名额的调用仍在旧限制器上释放 """
+        for key in [key for key in self.tool_limiters if key[0] == mcp_name]:
+            del self.tool_limiters[key]
+
+    @asynccontextmanager
+    async def admit(self, mcp_name: str, tool_name: str, tool_config: dict[str, Any]) -> AsyncIterator[None]:
+        """ 获取执行名额：先获取工具级名额，再获取全局名额，避免在单个工具上排队的请求占用全局名额 """
+        tool_limiter = self._tool_limiter(mcp_name, tool_name, tool_config)
+        if tool_limiter is not None:
+            with span("admission"):
+                await tool_limiter.acquire()
+        try:
+            if self.global_limiter is not None:
+                with span("admission"):
+                    await self.global_limiter.acquire()
+            try:
+                yield
+            finally:
+                if self.global_limiter is not None:
+                    self.global_limiter.release()
+        finally:
+            if tool_limiter is not None:
+                tool_limiter.release()
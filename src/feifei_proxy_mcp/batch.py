@@ -0,0 +1,96 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+import mcp
+
+from .logger import McpLogger
+
+logger = McpLogger.get_logger()
+
+
+def parse_batch_calls(body: bytes, max_calls: int) -> tuple[list[tuple[str, dict[str, Any]]], int | None]:
+    """
+    解析批量调用请求体，返回 (调用列表, 下游指定的并发数)，格式错误时抛出 ValueError
+
+    {"calls": [{"tool": "fetch.fetch", "arguments": {"url": "..."}}, ...], "concurrency": 8}
+    也可以直接传入调用列表
+    """
+    payload = json.loads(body)
+    concurrency = None
+    if isinstance(payload, dict):
+        concurrency = payload.get('concurrency')
+        payload = payload.get('calls')
+    if not isinstance(payload, list) or not payload:
+        raise ValueError("calls must be a non-empty list")
+    if len(payload) > max_calls:
+        raise ValueError(f"too many calls in one batch: {len(payload)} > {max_calls}")
+    if concurrency is not None and (isinstance(concurrency, bool) or not isinstance(concurrency, int)
+                                    or concurrency <= 0):
+        raise ValueError("concurrency must be a positive integer")
+
+    calls: list[tuple[str, dict[str, Any]]] = []
+    for index, item in enumerate(payload):
+        tool = item.get('tool') if isinstance(item, dict) else None
+        arguments = (item.get('arguments') or {}) if isinstance(item, dict) else None
+        if not isinstance(tool, str) or not isinstance(arguments, dict):
+            raise ValueError(f"calls[{index}] must be an object with tool (string) and arguments (object)")
+        calls.append((tool, arguments))
+    return calls, concurrency
+
+
+def _encode(index: int, tool: str, result: mcp.types.CallToolResult | None = None,
+            error: mcp.types.ErrorData | None = None) -> str:
+    """ 单个调用的结果：{"index", "tool", "isError", "result" | "error"}，结果直接由 pydantic 序列化后拼接 """
+    head = f'{{"index":{index},"tool":{json.dumps(tool, ensure_ascii=False)},'
+    if error is not None:
+        return f'{head}"isError":true,"error":{error.model_dump_json(by_alias=True, exclude_none=True)}}}'
+    is_error = "true" if result.isError else "false"
+    return f'{head}"isError":{is_error},"result":{result.model_dump_json(by_alias=True, exclude_none=True)}}}'
+
+
+async def run_batch(execute: Callable[[str, dict[str, Any]], Awaitable[mcp.types.CallToolResult]],
+                    calls: list[tuple[str, dict[str, Any]]], concurrency: int) -> AsyncIterator[str]:
+    """
+    批量工具调用 最多 concurrency 个调用同时执行，按完成顺序逐个返回结果（json 字符串）
+
+    - 每个调用独立返回结果与错误状态，单个调用失败不影响其他调用
+    - 上游 JSON-RPC 错误（熔断 / 过载 / 超过截止时间等）以 error 返回，其余异常与 tools/call 一致以 isError 结果返回，
+      调用内部泄漏出的 CancelledError / BaseExceptionGroup 以 INTERNAL_ERROR 返回，每个调用恰好返回一行结果
+    - 迭代提前结束（下游断开）时取消尚未完成的调用
+    """
+    pending = iter(enumerate(calls))
+    results: asyncio.Queue[str] = asyncio.Queue()
+
+    async def worker():
+        # 所有 worker 共享同一个迭代器，空闲的 worker 立即领取下一个调用
+        for index, (tool, arguments) in pending:
+            try:
+                result = await execute(tool, arguments)
+            except mcp.McpError as e:
+                results.put_nowait(_encode(index, tool, error=e.error))
+                continue
+            except Exception as e:
+                result = mcp.types.CallToolResult(content=[mcp.types.TextContent(type="text", text=str(e))],
+                                                  isError=True)
+            except BaseException as e:
+                # 批量请求结束（下游断开）时 worker 自身被取消
+                if isinstance(e, asyncio.CancelledError) and asyncio.current_task().cancelling():
+                    raise
+                # 调用内部泄漏出的取消（如截止时间）/ 异常组同样只影响该调用，保证每个调用都有一行结果
+                results.put_nowait(_encode(index, tool, error=mcp.types.ErrorData(
+                    code=mcp.types.INTERNAL_ERROR, message=f"tool call interrupted: {e!r}")))
+                if not isinstance(e, (asyncio.CancelledError, BaseExceptionGroup)):
+                    raise
+                continue
+            results.put_nowait(_encode(index, tool, result=result))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(calls)))]
+    try:
+        for _ in range(len(calls)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,81 @@
+import time
+from typing import Any
+
+from .enums import CircuitState, ProxyErrorCode
+from .logger import McpLogger
+from .mcp_exception import McpProxyError
+
+logger = McpLogger.get_logger()
+
+
+class CircuitBreaker:
+    """
+    熔断器 上游连续失败时快速失败，避免请求堆积在已经不可用的上游上
+
+    "circuitBreaker": {
+      "failureThreshold": 5,    # 连续失败多少次后熔断
+      "recoveryTimeout": 30     # 熔断多少秒后进入半开状态，放行一个探测请求
+    }
+
+    closed -> open: 连续失败次数达到 failureThreshold
+    open -> half_open: 熔断 recoveryTimeout 秒后
+    half_open -> closed: 探测请求成功；half_open -> open: 探测请求失败（含超过截止时间）
+    探测请求被取消时（下游断开）立即归还探测名额，不必等待 recoveryTimeout
+    """
+
+    def __init__(self, mcp_name: str, config: dict[str, Any]):
+        self.mcp_name = mcp_name
+        self.failure_threshold: int = max(1, int(config.get('failureThreshold', 5)))
+        self.recovery_timeout: float = float(config.get('recoveryTimeout', 30))
+
+        self.state: CircuitState = CircuitState.CLOSED
+        self._consecutive_failures: int = 0
+        self._opened_at: float = 0.0
+        self._probe_started_at: float | None = None
+
+    def before_call(self) -> bool:
+        """ 请求前检查熔断状态，熔断中直接抛出 JSON-RPC 错误；返回本次请求是否为半开状态下的探测请求 """
+        if self.state == CircuitState.CLOSED:
+            return False
+
+        now = time.monotonic()
+        if self.state == CircuitState.OPEN:
+            retry_after = self._opened_at + self.recovery_timeout - now
+            if retry_after > 0:
+                raise McpProxyError(ProxyErrorCode.CIRCUIT_OPEN.value,
+                                    f"Server {self.mcp_name} is unavailable (circuit open), "
+                                    f"retry after {retry_after:.1f}s")
+            self._transition(CircuitState.HALF_OPEN)
+
+        # 半开状态同一时间只放行一个探测请求，探测请求迟迟未结束时允许发起新的探测
+        if self._probe_started_at is not None and now - self._probe_started_at < self.recovery_timeout:
+            raise McpProxyError(ProxyErrorCode.CIRCUIT_OPEN.value,
+                                f"Server {self.mcp_name} is recovering (circuit half open), retry later")
+        self._probe_started_at = now
+        return True
+
+    def release_probe(self):
+        """ 探测请求结束但没有结果（被取消），归还探测名额，下一个请求即可重新探测 """
+        self._probe_started_at = None
+
+    def record_success(self):
+        self._consecutive_failures = 0
+        self._probe_started_at = None
+        if self.state != CircuitState.CLOSED:
+            self._transition(CircuitState.CLOSED)
+
+    def record_failure(self):
+        self._consecutive_failures += 1
+        self._probe_started_at = None
+        if self.state == CircuitState.HALF_OPEN or (
+                self.state == CircuitState.CLOSED and self._consecutive_failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            self._transition(CircuitState.OPEN)
+
+    def reset(self):
+        """ 上游会话重建成功后重置熔断器 """
+        self.record_success()
+
+    def _transition(self, state: CircuitState):
+        logger.warning(f"Server {self.mcp_name}: circuit breaker {self.state.value} -> {state.value}")
+        self.state = state
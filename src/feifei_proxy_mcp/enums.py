@@ -8,4 +8,23 @@ class McpTransportType(str, Enum):
     STDIO = 'stdio'  # 本地标准输入输出服务
     SSE = 'sse'  # 远程 http sse服务 废弃
     STREAMABLE_HTTP = 'streamable_http'  # 远程 http 流式服务
-    OPENAPI = 'openapi'  # 开放平台http服务 后续支持，自动转为mcp服务
\ No newline at end of file
+    OPENAPI = 'openapi'  # 开放平台http服务 后续支持，自动转为mcp服务
+
+class CircuitState(str, Enum):
+    """
+    熔断器状态枚举
+    """
+    CLOSED = 'closed'  # 正常放行
+    OPEN = 'open'  # 熔断中，快速失败
+    HALF_OPEN = 'half_open'  # 熔断恢复期，放行探测请求
+
+
+class ProxyErrorCode(int, Enum):
+    """
+    代理自身产生的 JSON-RPC 错误码，-32000 ~ -32099 为协议保留的服务端自定义错误区间
+    """
+    UPSTREAM_UNAVAILABLE = -32001  # 上游 mcp server 当前没有可用会话
+    CIRCUIT_OPEN = -32002  # 上游 mcp server 熔断中
+    OVERLOADED = -32003  # 代理过载，并发已满且等待队列已满 / 排队超时
+    DEADLINE_EXCEEDED = -32004  # 工具调用超过截止时间，上游调用已取消
+    REQUEST_CANCELLED = -32005  # 下游取消请求 / 断开连接，上游调用已取消
@@ -0,0 +1,206 @@
+from collections import deque
+from collections.abc import Hashable
+from contextvars import ContextVar
+from itertools import count
+from typing import Any
+
+from mcp.server.streamable_http import EventCallback, EventId, EventMessage, EventStore, StreamId
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from mcp.types import JSONRPCMessage
+
+from .logger import McpLogger
+
+logger = McpLogger.get_logger()
+
+# 全局写入顺序中失效条目（已被单个流的数量上限淘汰 / 所属流已释放）超过该数量时压缩
+_ORDER_SLACK = 64
+
+
+class _Event:
+    __slots__ = ('seq', 'message', 'size')
+
+    def __init__(self, seq: int, message: JSONRPCMessage, size: int):
+        self.seq = seq
+        self.message = message
+        self.size = size
+
+
+class RingBufferEventStore(EventStore):
+    """
+    有界内存事件存储 用于 streamable_http 有状态模式下的断线续传（Last-Event-ID）
+
+    - 每个流最多保留 max_events_per_stream 条事件，超出后丢弃该流最早的事件
+    - 所有流共享 max_bytes 内存预算，超出后按写入顺序丢弃全局最早的事件
+    - 事件 ID 为全局递增序号，续传时重放同一个流中该序号之后的所有事件；事件已被淘汰时无法续传，客户端需重新发起请求
+    - 各会话通过 session_store() 获取独立的视图（mcp 以请求 ID 作为流 ID，不同会话的流 ID 会重复），
+      会话结束时释放该会话的所有流
+    """
+
+    def __init__(self, max_events_per_stream: int = 1000, max_bytes: int = 16 * 1024 * 1024):
+        self.max_events_per_stream = max_events_per_stream
+        self.max_bytes = max_bytes
+        self.current_bytes: int = 0
+
+        self._seq = count(1)
+        self._session_seq = count(1)
+        self._streams: dict[Hashable, deque[_Event]] = {}
+        # 事件序号 -> 所属流，用于续传时定位流
+        self._event_streams: dict[int, Hashable] = {}
+        # 全局写入顺序，按内存预算淘汰时从队首开始；其中已失效的条目在数量超过有效事件数时压缩
+        self._order: deque[tuple[int, Hashable]] = deque()
+
+        # 统计信息
+        self.evictions: int = 0
+
+    def session_store(self) -> "SessionEventStore":
+        return SessionEventStore(self, next(self._session_seq))
+
+    async def store_event(self, stream_id: Hashable, message: JSONRPCMessage) -> EventId:
+        seq = next(self._seq)
+        event = _Event(seq, message, len(message.model_dump_json(by_alias=True, exclude_none=True)))
+
+        events = self._streams.get(stream_id)
+        if events is None:
+            events = self._streams[stream_id] = deque()
+        events.append(event)
+        self._event_streams[seq] = stream_id
+        self._order.append((seq, stream_id))
+        self.current_bytes += event.size
+
+        while len(events) > self.max_events_per_stream:
+            self._evict_oldest(stream_id)
+        while self.current_bytes > self.max_bytes and self._order:
+            oldest_seq, oldest_stream_id = self._order.popleft()
+            # 已因单个流的数量上限被淘汰 / 所属流已释放的事件直接跳过
+            if oldest_seq in self._event_streams:
+                self._evict_oldest(oldest_stream_id)
+        self._compact_order()
+
+        return str(seq)
+
+    def _evict_oldest(self, stream_id: Hashable):
+        events = self._streams[stream_id]
+        event = events.popleft()
+        del self._event_streams[event.seq]
+        self.current_bytes -= event.size
+        self.evictions += 1
+        if not events:
+            del self._streams[stream_id]
+
+    def _compact_order(self):
+        """ 单个流淘汰的事件不会从全局写入顺序中移除，失效条目过多时重建，保证内存占用与保留的事件数成正比 """
+        if len(self._order) > 2 * len(self._event_streams) + _ORDER_SLACK:
+            self._order = deque(entry for entry in self._order if entry[0] in self._event_streams)
+
+    def drop_stream(self, stream_id: Hashable):
+        """ 释放一个流的所有事件 """
+        events = self._streams.pop(stream_id, None)
+        if not events:
+            return
+        for event in events:
+            del self._event_streams[event.seq]
+            self.current_bytes -= event.size
+        self._compact_order()
+
+    async def replay_events_after(self, last_event_id: EventId, send_callback: EventCallback) -> Hashable | None:
+        try:
+            last_seq = int(last_event_id)
+        except ValueError:
+            logger.warning(f"invalid Last-Event-ID: {last_event_id}")
+            return None
+
+        stream_id = self._event_streams.get(last_seq)
+        if stream_id is None:
+            logger.warning(f"event {last_event_id} has been evicted or never existed, unable to resume")
+            return None
+
+        # 回调中会写入网络，先复制一份待重放事件，避免重放期间新事件写入导致迭代出错
+        replay = [event for event in self._streams[stream_id] if event.seq > last_seq]
+        for event in replay:
+            await send_callback(EventMessage(event.message, str(event.seq)))
+        return stream_id
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "streams": len(self._streams),
+            "events": len(self._event_streams),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class SessionEventStore(EventStore):
+    """ 单个会话的事件存储视图：流 ID 加上会话标识后写入共享的 RingBufferEventStore，只能续传本会话的事件 """
+
+    def __init__(self, store: RingBufferEventStore, session_key: int):
+        self.store = store
+        self.session_key = session_key
+        self._stream_ids: set[StreamId] = set()
+
+    async def store_event(self, stream_id: StreamId, message: JSONRPCMessage) -> EventId:
+        self._stream_ids.add(stream_id)
+        return await self.store.store_event((self.session_key, stream_id), message)
+
+    async def replay_events_after(self, last_event_id: EventId, send_callback: EventCallback) -> StreamId | None:
+        try:
+            stream_key = self.store._event_streams.get(int(last_event_id))
+        except ValueError:
+            stream_key = None
+        if stream_key is not None and stream_key[0] != self.session_key:
+            logger.warning(f"event {last_event_id} belongs to another session, unable to resume")
+            return None
+        stream_key = await self.store.replay_events_after(last_event_id, send_callback)
+        return stream_key[1] if stream_key is not None else None
+
+    def close(self):
+        """ 会话结束，释放该会话的所有流 """
+        for stream_id in self._stream_ids:
+            self.store.drop_stream((self.session_key, stream_id))
+        self._stream_ids.clear()
+
+
+# 新建会话时创建的事件存储视图，会话的服务任务复制创建时的上下文，结束时据此释放
+_session_events: ContextVar[SessionEventStore | None] = ContextVar("feifei_proxy_mcp_session_events",
+                                                                   default=None)
+
+
+class _ReleasingApp:
+    """ 代理 mcp server 的 run，会话结束（DELETE 终止 / 异常退出）时释放该会话的事件 """
+
+    def __init__(self, app: Any):
+        self._app = app
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._app, name)
+
+    async def run(self, *args: Any, **kwargs: Any) -> Any:
+        events = _session_events.get()
+        try:
+            return await self._app.run(*args, **kwargs)
+        finally:
+            if events is not None:
+                events.close()
+
+
+class SessionScopedManager(StreamableHTTPSessionManager):
+    """
+    streamable_http 会话管理器 mcp 的会话管理器为所有会话共用同一个事件存储，
+    这里在每次新建会话时（读取 event_store）返回该会话独立的视图，并在会话结束时释放其事件
+    依赖 mcp 1.12 的内部实现：只在新建会话时读取 event_store，会话的服务任务复制新建请求的上下文（pyproject 中限定了版本范围）
+    """
+
+    def __init__(self, app: Any, event_store: RingBufferEventStore | None = None, **kwargs: Any):
+        super().__init__(app=_ReleasingApp(app), event_store=event_store, **kwargs)
+
+    @property
+    def event_store(self) -> SessionEventStore | None:
+        if self._ring_buffer is None:
+            return None
+        events = self._ring_buffer.session_store()
+        _session_events.set(events)
+        return events
+
+    @event_store.setter
+    def event_store(self, value: RingBufferEventStore | None):
+        self._ring_buffer = value
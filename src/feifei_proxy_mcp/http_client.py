@@ -0,0 +1,105 @@
+from typing import Any
+
+import httpx
+
+from .enums import McpTransportType
+from .logger import McpLogger
+
+logger = McpLogger.get_logger()
+
+# 各传输类型的默认超时（秒）：(timeout, connectTimeout)，与此前 mcp 客户端 / openapi 的默认值保持一致
+_DEFAULT_TIMEOUTS: dict[str, tuple[float, float]] = {
+    McpTransportType.SSE.value: (10, 10),
+    McpTransportType.STREAMABLE_HTTP.value: (30, 30),
+    McpTransportType.OPENAPI.value: (30, 5),
+}
+
+# 需要 http 客户端的传输类型
+HTTP_TRANSPORTS = tuple(_DEFAULT_TIMEOUTS)
+
+
+class _SharedClientContext:
+    """ mcp 客户端以 async with 使用 httpx_client_factory 返回的客户端，会话结束时不关闭共享客户端 """
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def __aenter__(self) -> httpx.AsyncClient:
+        return self.client
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+
+class SharedHttpClient:
+    """
+    同一个 mcp server 的所有上游会话共享的 http 客户端（sse / streamable_http / openapi）
+
+    "fetch": {
+      "transport": "streamable_http",
+      "url": "http://xxx.xxx.xx/mcp",
+      "timeout": 30,              # 请求超时（秒），sse 默认 10
+      "connectTimeout": 30,       # 建立连接超时（秒），openapi 默认 5
+      "sseReadTimeout": 300,      # sse 流等待下一个事件的超时（秒）
+      "http2": false,             # 需要额外安装 h2（pip install 'httpx[http2]'）
+      "limits": {"maxConnections": 100, "maxKeepaliveConnections": 20, "keepaliveExpiry": 30}
+    }
+
+    - 连接池内参数（headers / timeout / auth）相同的会话复用同一组 keep-alive 连接，会话断开重建时无需重新建立 TCP / TLS 连接
+    - 由连接池持有并在连接池关闭时关闭，单个会话关闭时不关闭
+    """
+
+    def __init__(self, mcp_name: str, server_config: dict[str, Any]):
+        self.mcp_name = mcp_name
+        default_timeout, default_connect_timeout = _DEFAULT_TIMEOUTS.get(
+            server_config.get('transport', ''), _DEFAULT_TIMEOUTS[McpTransportType.STREAMABLE_HTTP.value])
+        self.timeout: float = float(server_config.get('timeout', default_timeout))
+        self.connect_timeout: float = float(server_config.get('connectTimeout', default_connect_timeout))
+        self.sse_read_timeout: float = float(server_config.get('sseReadTimeout', 60 * 5))
+        self.http2: bool = bool(server_config.get('http2', False))
+
+        limits_config = server_config.get('limits', {})
+        self.limits = httpx.Limits(max_connections=int(limits_config.get('maxConnections', 100)),
+                                   max_keepalive_connections=int(limits_config.get('maxKeepaliveConnections', 20)),
+                                   keepalive_expiry=float(limits_config.get('keepaliveExpiry', 30)))
+        # 按客户端参数区分的共享客户端，同一个 mcp server 的会话参数相同，通常只有一个
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def get(self, **kwargs: Any) -> httpx.AsyncClient:
+        """ 获取与参数（headers / timeout / auth 等）对应的共享客户端，参数相同的会话复用同一个客户端 """
+        kwargs.setdefault('timeout', httpx.Timeout(self.timeout, connect=self.connect_timeout))
+        key = _client_key(kwargs)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            if self.http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    raise ImportError("h2 is required for http2, please install it with: "
+                                      "pip install 'httpx[http2]'") from None
+            client = httpx.AsyncClient(limits=self.limits, http2=self.http2, **kwargs)
+            self._clients[key] = client
+            logger.debug(f"Server {self.mcp_name}: created shared http client, http2: {self.http2}, "
+                         f"clients: {len(self._clients)}")
+        return client
+
+    def mcp_client_factory(self, headers: dict[str, str] | None = None, timeout: httpx.Timeout | None = None,
+                           auth: httpx.Auth | None = None) -> Any:
+        """
+        mcp sse / streamable_http 客户端的 httpx_client_factory，使用 mcp 客户端传入的 headers / timeout / auth，
+        连接超时取 connectTimeout 配置（mcp 客户端传入的连接超时与请求超时相同）
+        """
+        if timeout is None:
+            timeout = httpx.Timeout(self.timeout, read=self.sse_read_timeout)
+        timeout = httpx.Timeout(timeout.read, connect=self.connect_timeout, write=timeout.write, pool=timeout.pool)
+        return _SharedClientContext(self.get(headers=headers, timeout=timeout, auth=auth, follow_redirects=True))
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+
+def _client_key(kwargs: dict[str, Any]) -> str:
+    """ 客户端参数的键，httpx.Timeout 等参数不可哈希，使用 repr（auth 等对象按实例区分） """
+    return repr(sorted(kwargs.items(), key=lambda item: item[0]))
@@ -1,18 +1,54 @@
+import atexit
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any
+
+# 参数中出现以下关键字的字段，日志中以 *** 代替
+_REDACT_KEYWORDS = ('password', 'passwd', 'secret', 'token', 'authorization', 'api_key', 'apikey', 'cookie')
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    只在调用线程（事件循环）中复制日志记录并入队，消息拼接（msg % args）与异常堆栈格式化
+    由 QueueListener 后台线程中的处理器完成；标准库的 QueueHandler.prepare 会在调用线程中格式化整条记录
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
 
 
 class McpLogger:
-    """ mcp代理日志服务配置 """
+    """
+    mcp代理日志服务配置
+
+    日志记录只在事件循环线程中放入内存队列，由后台线程（QueueListener）写入文件与控制台，避免磁盘 I/O 阻塞事件循环
+
+    PROXY_MCP_LOG_LEVEL         日志级别，默认 INFO
+    PROXY_MCP_LOG_FORMAT        日志格式（logging 格式字符串）
+    PROXY_MCP_LOG_MAX_PAYLOAD   工具参数等大字段在日志中保留的最大字符数，超出部分截断
+    PROXY_MCP_LOG_SAMPLE_RATE   高频日志（如每次工具调用）的采样率，0 ~ 1，默认 1 即全部记录
+    """
 
     logger: logging.Logger | None = None
     logger_name = "feifei_proxy_mcp"
+    listener: QueueListener | None = None
+
+    max_payload: int = 1024
+    sample_rate: float = 1.0
 
     @classmethod
     def setup_logger(cls):
         McpLogger.logger = logging.getLogger(McpLogger.logger_name)
-        McpLogger.logger.setLevel(logging.INFO)
+        level = logging.getLevelName(os.getenv("PROXY_MCP_LOG_LEVEL", "INFO").upper())
+        McpLogger.logger.setLevel(level if isinstance(level, int) else logging.INFO)
+
+        McpLogger.max_payload = int(os.getenv("PROXY_MCP_LOG_MAX_PAYLOAD", str(McpLogger.max_payload)))
+        McpLogger.sample_rate = float(os.getenv("PROXY_MCP_LOG_SAMPLE_RATE", str(McpLogger.sample_rate)))
 
         # 防止重复添加处理器
         if McpLogger.logger.handlers:
@@ -23,7 +59,7 @@ class McpLogger:
         os.makedirs(log_dir, exist_ok=True)
 
         formatter = logging.Formatter(
-            "%(asctime)s | %(name)-15s | %(levelname)-8s | %(message)s",
+            os.getenv("PROXY_MCP_LOG_FORMAT", "%(asctime)s | %(name)-15s | %(levelname)-8s | %(message)s"),
             datefmt="%Y-%m-%d %H:%M:%S"
         )
 
@@ -34,17 +70,20 @@ class McpLogger:
             backupCount=5,  # 保留5个备份文件
             encoding="utf-8"
         )
-        file_handler.setLevel(logging.INFO)
         file_handler.setFormatter(formatter)
 
-        McpLogger.logger.addHandler(file_handler)
-        McpLogger.logger.propagate = False
-
         # 添加控制台输出
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
-        McpLogger.logger.addHandler(console_handler)
+
+        # 事件循环线程只负责入队，由后台线程格式化并写入（见 DeferredQueueHandler）
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        McpLogger.listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        McpLogger.listener.start()
+        atexit.register(McpLogger.listener.stop)
+
+        McpLogger.logger.addHandler(DeferredQueueHandler(log_queue))
+        McpLogger.logger.propagate = False
 
     @classmethod
     def get_logger(cls) -> logging.Logger:
@@ -54,3 +93,29 @@ class McpLogger:
             return logging.getLogger(McpLogger.logger_name)
         else:
             return McpLogger.logger
+
+    @classmethod
+    def sampled(cls) -> bool:
+        """ 高频日志采样，返回 True 时记录本条日志 """
+        return McpLogger.sample_rate >= 1.0 or random.random() < McpLogger.sample_rate
+
+    @classmethod
+    def format_payload(cls, payload: Any) -> str:
+        """ 将工具参数等大字段格式化为日志文本：敏感字段脱敏，超出 PROXY_MCP_LOG_MAX_PAYLOAD 的部分截断 """
+        try:
+            text = json.dumps(_redact(payload), ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            text = str(payload)
+        if len(text) > McpLogger.max_payload:
+            return f"{text[:McpLogger.max_payload]}...({len(text) - McpLogger.max_payload} chars truncated)"
+        return text
+
+
+def _redact(payload: Any) -> Any:
+    if isinstance(payload, dict):
+        return {key: '***' if isinstance(key, str) and any(k in key.lower() for k in _REDACT_KEYWORDS)
+                else _redact(value)
+                for key, value in payload.items()}
+    if isinstance(payload, list):
+        return [_redact(item) for item in payload]
+    return payload
@@ -1,36 +1,100 @@
 import asyncio
-from typing import Any
+import time
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from typing import Any, TypeVar
 from contextlib import AsyncExitStack
 
+import anyio
 import mcp
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 from mcp import ClientSession
+from mcp.client.session import MessageHandlerFnT
 from mcp.client.stdio import StdioServerParameters, stdio_client
 from mcp.client.sse import sse_client
 from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.message import SessionMessage
 
 from .enums import McpTransportType
+from .http_client import SharedHttpClient
 from .logger import McpLogger
+from .metrics import HEALTH_PROBE_DURATION
+from .notification_relay import NotificationRelay
+from .passthrough import RawChannel, RawResponse, passthrough_stdio_client
+from .tracing import span
 
 logger = McpLogger.get_logger()
 
+T = TypeVar("T")
 
-def _stdio_transport_context(config: dict[str, Any]):
-    server_params = StdioServerParameters(command=config['command'], args=config['args'] if 'args' in config else [],
-                                          env=config['env'] if 'env' in config else {})
-    return stdio_client(server_params)
 
+def _stdio_server_params(config: dict[str, Any]) -> StdioServerParameters:
+    return StdioServerParameters(command=config['command'], args=config['args'] if 'args' in config else [],
+                                 env=config['env'] if 'env' in config else {})
 
-def _sse_transport_context(config: dict[str, Any]):
-    return sse_client(url=config['url'], headers=config['headers'] if 'headers' in config else {}, timeout=10)
 
+def _stdio_transport_context(config: dict[str, Any], http_client: SharedHttpClient | None):
+    return stdio_client(_stdio_server_params(config))
 
-def _streamable_http_transport_context(config: dict[str, Any]):
-    return streamablehttp_client(url=config["url"], headers=config['headers'] if 'headers' in config else {})
+
+def _passthrough_stdio_transport_context(config: dict[str, Any], http_client: SharedHttpClient | None):
+    return passthrough_stdio_client(_stdio_server_params(config))
+
+
+def _sse_transport_context(config: dict[str, Any], http_client: SharedHttpClient):
+    return sse_client(url=config['url'], headers=config['headers'] if 'headers' in config else {},
+                      timeout=http_client.timeout, sse_read_timeout=http_client.sse_read_timeout,
+                      httpx_client_factory=http_client.mcp_client_factory)
+
+
+def _streamable_http_transport_context(config: dict[str, Any], http_client: SharedHttpClient):
+    return streamablehttp_client(url=config["url"], headers=config['headers'] if 'headers' in config else {},
+                                 timeout=http_client.timeout, sse_read_timeout=http_client.sse_read_timeout,
+                                 httpx_client_factory=http_client.mcp_client_factory)
+
+
+# 当前任务通过 ClientSession 发出的请求 ID，由 execute_tool 设置，用于取消时通知上游
+_sent_request_ids: ContextVar[list[mcp.types.RequestId] | None] = ContextVar("feifei_proxy_mcp_sent_request_ids",
+                                                                            default=None)
+
+
+class _RequestTrackingStream:
+    """
+    ClientSession 的写入流 ClientSession 在发起请求的任务中写入消息，
+    这里记录该任务发出的请求 ID，取消时据此向上游发送 notifications/cancelled
+    """
+
+    def __init__(self, stream: MemoryObjectSendStream[SessionMessage]):
+        self._stream = stream
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+    async def __aenter__(self) -> "_RequestTrackingStream":
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> bool | None:
+        return await self._stream.__aexit__(*exc_info)
+
+    async def send(self, message: SessionMessage):
+        request_ids = _sent_request_ids.get()
+        if request_ids is not None and isinstance(message.message.root, mcp.types.JSONRPCRequest):
+            request_ids.append(message.message.root.id)
+        await self._stream.send(message)
+
+
+def is_connection_error(ex: Exception) -> bool:
+    """ 判断异常是否由传输层断开引起 """
+    if isinstance(ex, (anyio.ClosedResourceError, anyio.BrokenResourceError, BrokenPipeError, ConnectionError)):
+        return True
+    return isinstance(ex, mcp.McpError) and ex.error.code == mcp.types.CONNECTION_CLOSED
 
 
 class McpClientManager:
     """
     mcp 客户端 实现 用于连接mcp-server / 会话管理 / 工具调度 / 连接检查 / 资源清理等能力
+    每个实例对应 mcpServers 中某一项配置的一个上游会话，多会话调度见 McpClientPool
 
     "mcpServers": {
       "fetch": {
@@ -46,80 +110,157 @@ class McpClientManager:
         "transport": "streamable_http",
         "url": "http://xxx.xxx.xx/mcp"
       },
+      "fetch3": {
+        "command": "uvx",
+        "args": ["mcp-server-fetch"],
+        "passthrough": true,     # stdio 透传模式，工具调用响应以原始字节返回，见 passthrough.py
+        "cancelUpstream": true   # 下游取消 / 超过截止时间时向上游发送 notifications/cancelled，默认不发送
+      },
     }
 
+    openapi 传输类型由 OpenApiClientManager 处理
+    sse / streamable_http 的超时、连接池、HTTP/2 配置见 SharedHttpClient，同一个 mcp server 的会话共享 http 连接
+
     """
 
-    def __init__(self, mcp_server_config: dict[str, Any]):
+    def __init__(self, mcp_name: str, server_config: dict[str, Any],
+                 message_handler: MessageHandlerFnT | None = None, http_client: SharedHttpClient | None = None):
         self.session: ClientSession | None = None
+        # 上游主动推送的通知（如 notifications/tools/list_changed）交由该回调处理
+        self._message_handler = message_handler
+        # 正在执行的工具调用的通知转发，上游日志通知转发给这些调用
+        self._relays: set[NotificationRelay] = set()
+        # 健康状态缓存：最近一次上游成功应答的时间（被动存活） / 最近一次 ping 探测结果
+        self.last_success_time: float = 0.0
+        self.health_ok: bool = True
         self._cleanup_lock: asyncio.Lock = asyncio.Lock()
         self.exit_stack: AsyncExitStack = AsyncExitStack()
         self.stdio_context: Any | None = None
         self._initialized_event = asyncio.Event()
         self._shutdown_event = asyncio.Event()
         self._initialized: bool = False  # 初始化状态标记
-
-        mcp_servers = mcp_server_config.get('mcpServers', {})
-        if not mcp_servers:
-            raise ValueError("mcpServers must be contain one mcp server configuration")
-
-        # 这里请注意，mcpServers只能包含一个 mcp server 配置，
-        # 如果配置多个，只会取第一个，其他的将被忽略
-        for key, value in mcp_servers.items():
-            logger.info(f"====== mcp_name: {key}, mcp_config: {value} ======")
-            self.mcp_name = key
-            self.server_config = value
-            break
+        self._connection_lost: bool = False  # 传输层已断开标记（子进程退出 / 管道关闭）
+        self._done_callbacks: list[Callable[[], None]] = []
+        # 透传模式下的原始 JSON-RPC 通道
+        self.raw_channel: RawChannel | None = None
+        # 发送中的取消通知
+        self._background_tasks: set[asyncio.Task] = set()
+
+        # 连接池调度使用：未完成的请求数 / 最后一次被使用的时间
+        self.outstanding_requests: int = 0
+        self.last_used_time: float = time.monotonic()
+
+        self.mcp_name = mcp_name
+        self.server_config = server_config
+        # 会话初始化超时时间（秒），uvx / npx 首次启动需要下载依赖，默认值较为宽松
+        self._init_timeout: float = float(server_config.get('initTimeout', 120))
+        # 下游取消 / 超过截止时间时是否向上游发送 notifications/cancelled，需上游显式开启：
+        # mcp python sdk 1.12 等版本的上游收到取消通知后会话会退出，失败会落在之后无关的调用上
+        self.cancel_upstream: bool = bool(server_config.get('cancelUpstream', False))
 
         transport = self.server_config.get('transport', McpTransportType.STDIO.value)
         if transport == McpTransportType.SSE.value:
             self._transport_context_factory = _sse_transport_context
         elif transport == McpTransportType.STREAMABLE_HTTP.value:
             self._transport_context_factory = _streamable_http_transport_context
+        elif server_config.get('passthrough'):
+            self._transport_context_factory = _passthrough_stdio_transport_context
         else:
             self._transport_context_factory = _stdio_transport_context
 
         self._transport = transport
+        # 远程传输的 http 客户端，通常由连接池创建并在会话间共享；未传入时由本会话自行创建与关闭
+        self._owns_http_client: bool = http_client is None and transport in (McpTransportType.SSE.value,
+                                                                              McpTransportType.STREAMABLE_HTTP.value)
+        self.http_client = SharedHttpClient(mcp_name, server_config) if self._owns_http_client else http_client
         # 创建一个异步任务，等待事件循环去执行。
         self._server_task = asyncio.create_task(self._server_lifespan_cycle())
 
     async def _server_lifespan_cycle(self):
         logger.info("======= Start to connect MCP server ======")
         try:
-            if self._transport == McpTransportType.STREAMABLE_HTTP.value:
-                async with self._transport_context_factory(self.server_config) as (read, write, _):
+            # streamable_http 传输额外返回 get_session_id 回调，这里只取读写流
+            async with self._transport_context_factory(self.server_config, self.http_client) as streams:
+                read, write = streams[0], streams[1]
+                if len(streams) > 2 and isinstance(streams[2], RawChannel):
+                    self.raw_channel = streams[2]
+                    self.raw_channel.cancel_upstream = self.cancel_upstream
+                # 在传输层读取流与会话之间做一层转发，用于感知子进程退出 / 远程连接断开
+                relay_send, relay_receive = anyio.create_memory_object_stream[SessionMessage | Exception](0)
+                async with anyio.create_task_group() as tg:
+                    tg.start_soon(self._watch_transport, read, relay_send)
                     # 构建一个mcp客户端连接
-                    async with ClientSession(read, write) as session:
-                        self.session_initialized_response = await session.initialize()
-                        self.session = session
-                        self._initialized = True
-                        self._initialized_event.set()
-                        await self.wait_for_shutdown_request()
-            else:
-                async with self._transport_context_factory(self.server_config) as (read, write):
-                    # 构建一个mcp客户端连接
-                    async with ClientSession(read, write) as session:
-                        self.session_initialized_response = await session.initialize()
+                    async with ClientSession(relay_receive, _RequestTrackingStream(write), message_handler=self._message_handler,
+                                             logging_callback=self._relay_log_message) as session:
+                        with anyio.fail_after(self._init_timeout):
+                            self.session_initialized_response = await session.initialize()
                         self.session = session
+                        self.last_success_time = time.monotonic()
                         self._initialized = True
                         self._initialized_event.set()
                         await self.wait_for_shutdown_request()
+                    tg.cancel_scope.cancel()
         except Exception as ex:
             logger.warning("failed to init mcp server " + self.mcp_name + ", config: "
-                           + str(self.server_config), exc_info=ex)
+                           + McpLogger.format_payload(self.server_config), exc_info=ex)
             self._initialized = False
             self._initialized_event.set()
             self._shutdown_event.set()
 
+    async def _watch_transport(self, read_stream: MemoryObjectReceiveStream[SessionMessage | Exception],
+                               relay_send: MemoryObjectSendStream[SessionMessage | Exception]):
+        """ 转发传输层消息给会话，读取流结束即表示传输层已断开 """
+        try:
+            async with relay_send:
+                async for message in read_stream:
+                    await relay_send.send(message)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            pass
+
+        if not self._shutdown_event.is_set():
+            # 这里不直接结束生命周期任务：会话需要先向未完成的请求返回 Connection closed 错误，
+            # 由连接池巡检任务回收本会话（cleanup）并重建
+            logger.warning(f"Server {self.mcp_name}: transport closed unexpectedly")
+            self._connection_lost = True
+            for callback in self._done_callbacks:
+                callback()
+
     def get_initialized_response(self) -> mcp.types.InitializeResult:
         return self.session_initialized_response
 
-    async def healthy(self) -> bool:
-        """ 连接mcp server 健康检查 """
+    def is_alive(self) -> bool:
+        """ 不发起请求的快速存活判断，用于连接池调度 """
         return (self.session is not None and
                 self._initialized and
-                not self._shutdown_event.is_set()
-                and not await self.is_session_disconnected())
+                not self._connection_lost and
+                not self._shutdown_event.is_set() and
+                not self._server_task.done())
+
+    def healthy(self) -> bool:
+        """ 返回缓存的健康状态，不发起请求 """
+        return self.is_alive() and self.health_ok
+
+    async def check_health(self, timeout: float, passive_window: float) -> bool:
+        """
+        健康检查：passive_window 秒内有成功应答的工具调用即视为健康（被动存活），
+        否则发送一次 ping 探测，结果缓存在 health_ok 中
+        """
+        if not self.is_alive():
+            self.health_ok = False
+        elif time.monotonic() - self.last_success_time < passive_window:
+            self.health_ok = True
+        else:
+            self.health_ok = not await self.is_session_disconnected(timeout)
+        return self.health_ok
+
+    def _mark_success(self):
+        self.last_success_time = time.monotonic()
+        self.health_ok = True
+
+    def add_done_callback(self, callback: Callable[[], None]):
+        """ 注册会话不可用（传输层断开 / 生命周期结束）回调 """
+        self._done_callbacks.append(callback)
+        self._server_task.add_done_callback(lambda _: callback())
 
     async def wait_for_initialization(self):
         await self._initialized_event.wait()
@@ -136,45 +277,166 @@ class McpClientManager:
             raise RuntimeError(f"Server {self.mcp_name} is not initialized")
 
         tools_response = await self.session.list_tools()
-
+        self._mark_success()
         return tools_response.tools
 
-    async def execute_tool(
-            self,
-            tool_name: str,
-            arguments: dict[str, Any],
-            retries: int = 2,
-            delay: float = 1.0,
-    ) -> Any:
-        """ 调用mcp工具 """
+    async def execute_tool(self, tool_name: str, arguments: dict[str, Any],
+                           relay: NotificationRelay | None = None) -> mcp.types.CallToolResult:
+        """ 调用mcp工具，relay 不为空时将调用过程中的进度 / 日志通知转发给下游 """
         if not self.session:
             raise RuntimeError(f"Server {self.mcp_name} not initialized")
 
-        attempt = 0
-        while attempt < retries:
+        progress_callback = None
+        if relay is not None:
+            self._relays.add(relay)
+            if relay.progress_token is not None:
+                progress_callback = relay.on_progress
+        request_ids: list[mcp.types.RequestId] = []
+        token = _sent_request_ids.set(request_ids)
+        try:
+            with span("upstream"):
+                result = await self.session.call_tool(tool_name, arguments, progress_callback=progress_callback)
+            self._mark_success()
+            if relay is not None:
+                await relay.flush()
+            return result
+        except asyncio.CancelledError:
+            # 下游已断开 / 取消或超过截止时间，通知上游停止执行；本任务发出的第一个请求即为 tools/call
+            if request_ids:
+                self._cancel_upstream_request(request_ids[0])
+            raise
+        except Exception as e:
+            if is_connection_error(e):
+                # 传输层已断开，同一个会话上重试没有意义，交由连接池重建会话
+                self._connection_lost = True
+            raise
+        finally:
+            _sent_request_ids.reset(token)
+            if relay is not None:
+                self._relays.discard(relay)
+                relay.close()
+
+    def _cancel_upstream_request(self, request_id: mcp.types.RequestId):
+        """ 向上游发送 notifications/cancelled，当前任务正在被取消，在后台发送 """
+        if not self.cancel_upstream or self.session is None or not self.is_alive():
+            return
+        notification = mcp.types.ClientNotification(mcp.types.CancelledNotification(
+            method="notifications/cancelled",
+            params=mcp.types.CancelledNotificationParams(requestId=request_id, reason="cancelled by proxy")))
+
+        async def send():
             try:
-                result = await self.session.call_tool(tool_name, arguments)
+                await self.session.send_notification(notification)
+                logger.debug(f"Server {self.mcp_name}: cancelled upstream request {request_id}")
+            except Exception as e:
+                logger.debug(f"Server {self.mcp_name}: failed to cancel upstream request {request_id}: {e}")
 
-                return result
+        task = asyncio.create_task(send())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
 
-            except Exception as e:
-                attempt += 1
-                if attempt < retries:
-                    await asyncio.sleep(delay)
-                    await self.session.initialize()
-                    try:
-                        result = await self.session.call_tool(tool_name, arguments)
-                        return result
-                    except Exception as e:
-                        raise e
-                else:
-                    raise
+    async def execute_tool_raw(self, params: dict[str, Any]) -> RawResponse:
+        """ 透传模式调用工具：请求参数原样发送，响应不解析，以原始字节返回 """
+        if not self.session or self.raw_channel is None:
+            raise RuntimeError(f"Server {self.mcp_name} not initialized")
+        try:
+            with span("upstream"):
+                result = await self.raw_channel.request("tools/call", params)
+        except Exception as e:
+            if is_connection_error(e):
+                self._connection_lost = True
+            raise
+        self._mark_success()
+        return result
+
+    def supports(self, capability: str) -> bool:
+        """ 上游是否声明了某项能力，如 resources / prompts """
+        response = self.session_initialized_response
+        return response is not None and getattr(response.capabilities, capability, None) is not None
+
+    async def _session_request(self, request: Callable[[ClientSession], Awaitable[T]]) -> T:
+        if not self.session:
+            raise RuntimeError(f"Server {self.mcp_name} not initialized")
+        try:
+            result = await request(self.session)
+        except Exception as e:
+            if is_connection_error(e):
+                self._connection_lost = True
+            raise
+        self._mark_success()
+        return result
+
+    async def list_resources(self) -> list[mcp.types.Resource]:
+        """ 获取资源列表（拉取所有分页） """
+        resources: list[mcp.types.Resource] = []
+        cursor = None
+        while True:
+            result = await self._session_request(lambda session: session.list_resources(cursor))
+            resources.extend(result.resources)
+            cursor = result.nextCursor
+            if not cursor:
+                return resources
+
+    async def list_resource_templates(self) -> list[mcp.types.ResourceTemplate]:
+        """ 获取资源模板列表（拉取所有分页） """
+        templates: list[mcp.types.ResourceTemplate] = []
+        cursor = None
+        while True:
+            result = await self._session_request(lambda session: session.list_resource_templates(cursor))
+            templates.extend(result.resourceTemplates)
+            cursor = result.nextCursor
+            if not cursor:
+                return templates
+
+    async def read_resource(self, uri: str) -> mcp.types.ReadResourceResult:
+        return await self._session_request(lambda session: session.read_resource(uri))
+
+    async def subscribe_resource(self, uri: str) -> None:
+        await self._session_request(lambda session: session.subscribe_resource(uri))
+
+    async def unsubscribe_resource(self, uri: str) -> None:
+        await self._session_request(lambda session: session.unsubscribe_resource(uri))
+
+    async def list_prompts(self) -> list[mcp.types.Prompt]:
+        """ 获取提示词列表（拉取所有分页） """
+        prompts: list[mcp.types.Prompt] = []
+        cursor = None
+        while True:
+            result = await self._session_request(lambda session: session.list_prompts(cursor))
+            prompts.extend(result.prompts)
+            cursor = result.nextCursor
+            if not cursor:
+                return prompts
+
+    async def get_prompt(self, name: str, arguments: dict[str, str] | None) -> mcp.types.GetPromptResult:
+        return await self._session_request(lambda session: session.get_prompt(name, arguments))
+
+    async def _relay_log_message(self, params: mcp.types.LoggingMessageNotificationParams) -> None:
+        """
+        上游日志通知不携带请求 ID，只有会话上仅有一个进行中的请求时才能确定归属并转发给该调用，
+        否则丢弃，避免把一个下游的日志发给其他下游；在 ClientSession 的接收循环中调用，只入队不等待发送
+        """
+        if len(self._relays) == 1 and self.outstanding_requests <= 1:
+            next(iter(self._relays)).on_log(params)
+        elif self._relays:
+            logger.debug(f"Server {self.mcp_name}: log message dropped, {self.outstanding_requests} "
+                         f"requests in flight on the session")
 
     async def cleanup(self) -> None:
         """Clean up server resources."""
         async with self._cleanup_lock:
             try:
+                # 通知生命周期任务退出，由其自身关闭会话与传输（stdio 子进程随之退出）
+                self._shutdown_event.set()
+                if not self._initialized_event.is_set():
+                    # 仍在初始化（上游启动缓慢 / 无响应），直接取消生命周期任务，不等待 initTimeout
+                    self._server_task.cancel()
+                    self._initialized_event.set()
+                if not self._server_task.done():
+                    await asyncio.gather(self._server_task, return_exceptions=True)
                 await self.exit_stack.aclose()
+                if self._owns_http_client:
+                    await self.http_client.aclose()
                 self.session = None
                 self.stdio_context = None
             except Exception as e:
@@ -192,23 +454,27 @@ class McpClientManager:
         """
         # 基础检查：session对象是否存在
         if not self.session:
-            logger.info(f"Server {self.mcp_name}: session object is None")
+            logger.debug(f"Server {self.mcp_name}: session object is None")
             return True
 
         # 检查是否已初始化
         if not self._initialized:
-            logger.info(f"Server {self.mcp_name}: not initialized")
+            logger.debug(f"Server {self.mcp_name}: not initialized")
             return True
 
         # 检查是否请求关闭
         if self._shutdown_event.is_set():
-            logger.info(f"Server {self.mcp_name}: shutdown requested")
+            logger.debug(f"Server {self.mcp_name}: shutdown requested")
             return True
 
         try:
-            # 尝试执行一个轻量级操作来测试连接
-            logger.info(f"Server {self.mcp_name}: testing connection health")
-            return await self._test_connection_health(timeout)
+            # 使用 ping 测试连接，避免工具目录较大时 list_tools 的开销
+            logger.debug(f"Server {self.mcp_name}: testing connection health")
+            started = time.perf_counter()
+            try:
+                return await self._test_connection_health(timeout)
+            finally:
+                HEALTH_PROBE_DURATION.observe(time.perf_counter() - started, self.mcp_name)
         except Exception as e:
             logger.warning(f"Server {self.mcp_name}: connection test failed: {e}")
             return True
@@ -229,15 +495,20 @@ class McpClientManager:
             async with asyncio.timeout(timeout):
                 if self.session is None:
                     return True
-                # 尝试调用一个简单的MCP操作
-                await self.session.list_tools()
-                # 更新最后活动时间
-                import time
-                self._last_activity_time = time.time()
+                # 发送 ping 请求
+                await self.session.send_ping()
+                self.last_success_time = time.monotonic()
                 return False  # 连接正常
 
-        except (asyncio.TimeoutError, mcp.McpError, anyio.ClosedResourceError):
-            logger.warning(f"Server {self.mcp_name}: connection test timeout after {timeout}s")
+        except mcp.McpError as e:
+            if is_connection_error(e) or e.error.code == 408:
+                logger.warning(f"Server {self.mcp_name}: ping failed: {e}")
+                return True
+            # 上游正常应答了错误（如不支持 ping），连接本身是正常的
+            self.last_success_time = time.monotonic()
+            return False
+        except (asyncio.TimeoutError, anyio.ClosedResourceError):
+            logger.warning(f"Server {self.mcp_name}: ping failed or timed out after {timeout}s")
             return True
         except (ConnectionError, BrokenPipeError, OSError) as e:
             logger.warning(f"Server {self.mcp_name}: connection error: {e}")
@@ -0,0 +1,611 @@
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+import anyio
+import mcp
+
+from .circuit_breaker import CircuitBreaker
+from .http_client import HTTP_TRANSPORTS, SharedHttpClient
+from .enums import CircuitState, McpTransportType, ProxyErrorCode
+from .logger import McpLogger
+from .mcp_client_manager import McpClientManager, is_connection_error
+from .mcp_exception import McpProxyError
+from .notification_relay import NotificationRelay
+from .openapi_client import OpenApiClientManager, SharedOpenApiSpec
+from .passthrough import RawResponse
+from .tracing import annotate, span
+
+logger = McpLogger.get_logger()
+
+T = TypeVar("T")
+
+# 转发给注册中心的上游通知类型（工具目录变更由连接池自身处理）
+_FORWARDED_NOTIFICATIONS = (mcp.types.ResourceUpdatedNotification, mcp.types.ResourceListChangedNotification,
+                            mcp.types.PromptListChangedNotification)
+
+
+# 当前工具调用的截止时间，由注册中心设置；调用因超过截止时间被取消时计入熔断失败次数
+call_deadline: ContextVar[asyncio.Timeout | None] = ContextVar("feifei_proxy_mcp_call_deadline", default=None)
+
+
+def _client_manager_class(server_config: dict[str, Any]) -> type[McpClientManager] | type[OpenApiClientManager]:
+    """ openapi 服务由 OpenApiClientManager 直接发起 http 请求，其余传输类型均为 mcp 会话 """
+    if server_config.get('transport') == McpTransportType.OPENAPI.value:
+        return OpenApiClientManager
+    return McpClientManager
+
+
+def _is_upstream_failure(ex: Exception) -> bool:
+    """ 判断异常是否表示上游不可用（计入熔断失败次数） """
+    if is_connection_error(ex) or isinstance(ex, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    if isinstance(ex, McpProxyError):
+        return ex.error.code == ProxyErrorCode.UPSTREAM_UNAVAILABLE.value
+    # 会话读取超时，见 mcp.shared.session.BaseSession.send_request
+    return isinstance(ex, mcp.McpError) and ex.error.code == 408
+
+
+def _never_sent(ex: Exception) -> bool:
+    """ 请求写入已关闭的传输层时失败，上游没有收到该请求，非幂等请求同样可以安全重试 """
+    return isinstance(ex, (anyio.ClosedResourceError, anyio.BrokenResourceError, BrokenPipeError))
+
+
+class McpClientPool:
+    """
+    mcp 客户端连接池 为同一个 mcp server 维护多个上游会话（stdio 即多个子进程）
+    提供 最少未完成请求数分发 / 按需扩容 / 空闲缩容 / 崩溃成员替换 等能力
+
+    "fetch": {
+      "command": "uvx",
+      "args": ["mcp-server-fetch"],
+      "pool": {
+        "minSize": 1,          # 常驻会话数
+        "maxSize": 4,          # 最大会话数，所有会话均繁忙时按需扩容
+        "idleTimeout": 300,    # 超过 minSize 的会话空闲多少秒后回收
+        "checkInterval": 5     # 巡检间隔（秒），用于回收空闲会话 / 替换崩溃会话
+      },
+      "toolsTtl": 300,         # 工具目录缓存有效期（秒）
+      "reconnect": {
+        "initialDelay": 1,     # 会话重建失败后的首次重试间隔（秒），之后指数退避并加入随机抖动
+        "maxDelay": 60         # 重试间隔上限（秒）
+      },
+      "circuitBreaker": {"failureThreshold": 5, "recoveryTimeout": 30},
+      "healthCheck": {
+        "interval": 30,        # 健康检查间隔（秒）
+        "timeout": 5,          # ping 超时（秒）
+        "passiveWindow": 30    # 该时间内有成功应答的会话视为健康，不再发送 ping
+      }
+    }
+
+    未配置 pool 时 minSize = maxSize = 1，行为与单会话一致
+
+    后台巡检任务负责监督上游会话：会话传输层断开后立即唤醒巡检任务重建会话，重建失败按指数退避重试；
+    上游连续失败时由熔断器快速失败，避免请求堆积在不可用的上游上
+
+    工具目录在启动时加载并缓存在内存中，tools/list 直接由缓存应答：
+    缓存过期后先返回旧目录并在后台刷新，收到上游 notifications/tools/list_changed 时立即失效并刷新
+
+    资源 / 提示词请求与工具调用使用相同的调度与熔断策略，资源更新等通知转发给注册中心
+    """
+
+    def __init__(self, mcp_name: str, server_config: dict[str, Any]):
+        self.mcp_name = mcp_name
+        self.server_config = server_config
+
+        pool_config = server_config.get('pool', {})
+        self.min_size: int = max(1, int(pool_config.get('minSize', 1)))
+        self.max_size: int = max(self.min_size, int(pool_config.get('maxSize', self.min_size)))
+        self.idle_timeout: float = float(pool_config.get('idleTimeout', 300))
+        self.check_interval: float = float(pool_config.get('checkInterval', 5))
+
+        # 健康检查：定时 ping 最近没有成功应答的会话，结果缓存供 /ready 等接口直接读取
+        health_config = server_config.get('healthCheck', {})
+        self.health_interval: float = float(health_config.get('interval', 30))
+        self.health_timeout: float = float(health_config.get('timeout', 5))
+        self.health_passive_window: float = float(health_config.get('passiveWindow', self.health_interval))
+        self._health_task: asyncio.Task | None = None
+        self.last_health_check_time: float = 0.0
+
+        self._members: list[McpClientManager] = []
+        self._spawning: set[asyncio.Task] = set()
+        self._supervisor_task: asyncio.Task | None = None
+        self._supervisor_wakeup: asyncio.Event = asyncio.Event()
+        self._closed: bool = False
+
+        # 会话重建退避
+        reconnect_config = server_config.get('reconnect', {})
+        self.reconnect_initial_delay: float = float(reconnect_config.get('initialDelay', 1))
+        self.reconnect_max_delay: float = float(reconnect_config.get('maxDelay', 60))
+        self._reconnect_failures: int = 0
+        self._next_reconnect_at: float = 0.0
+
+        # 统计信息
+        self.sessions_lost: int = 0
+        self.reconnect_failures_total: int = 0
+
+        self.circuit_breaker = CircuitBreaker(mcp_name, server_config.get('circuitBreaker', {}))
+        # 远程上游的所有会话共享同一个 http 客户端，会话重建时复用已建立的连接
+        self.http_client: SharedHttpClient | None = SharedHttpClient(mcp_name, server_config) \
+            if server_config.get('transport') in HTTP_TRANSPORTS else None
+        # openapi 服务的所有会话共享同一份编译后的接口定义
+        self.openapi_spec: SharedOpenApiSpec | None = SharedOpenApiSpec(server_config['specPath']) \
+            if server_config.get('transport') == McpTransportType.OPENAPI.value else None
+        # stdio 透传模式：工具调用响应以原始字节返回，不经过 pydantic 解析
+        self.passthrough: bool = (bool(server_config.get('passthrough'))
+                                  and server_config.get('transport', McpTransportType.STDIO.value)
+                                  == McpTransportType.STDIO.value)
+        self.session_initialized_response: mcp.types.InitializeResult | None = None
+
+        # 工具目录缓存
+        self.tools_ttl: float = float(server_config.get('toolsTtl', 300))
+        self._tools: list[mcp.types.Tool] | None = None
+        self._tools_expire_at: float = 0.0
+        self._tools_generation: int = 0
+        self._tools_changed_pending: bool = False
+        self._tools_lock: asyncio.Lock = asyncio.Lock()
+        self._tools_refresh_task: asyncio.Task | None = None
+        self._tools_changed_listeners: list[Callable[[], Awaitable[None]]] = []
+
+        # 资源订阅：上游订阅绑定在单个会话上，该会话断开后在其他会话上重新订阅
+        self._subscribed_uris: set[str] = set()
+        self._subscription_member: McpClientManager | None = None
+        self._resubscribe_task: asyncio.Task | None = None
+        self._notification_listeners: list[Callable[[str, Any], Awaitable[None]]] = []
+
+        # 进行中的调用数（含准入排队），配置热更新下线连接池前等待其归零
+        self.active_calls: int = 0
+        self._idle_event: asyncio.Event = asyncio.Event()
+        self._idle_event.set()
+
+    @property
+    def size(self) -> int:
+        return len(self._members) + len(self._spawning)
+
+    @property
+    def alive_size(self) -> int:
+        return sum(1 for member in self._members if member.is_alive())
+
+    async def start(self) -> bool:
+        """
+        启动 minSize 个会话，至少一个会话初始化成功即视为启动成功
+        启动失败时巡检任务仍会在后台按退避策略继续重建会话
+        """
+        logger.info(f"====== start mcp client pool: {self.mcp_name}, "
+                    f"min_size: {self.min_size}, max_size: {self.max_size} ======")
+        tasks = [self._spawn_member() for _ in range(self.min_size)]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._closed:
+            return False
+        self._supervisor_task = asyncio.create_task(self._supervise_loop())
+        self._health_task = asyncio.create_task(self._health_loop())
+        if not self._members:
+            return False
+
+        try:
+            await self._refresh_tools()
+        except Exception as e:
+            logger.warning(f"Server {self.mcp_name}: failed to load tool catalog at startup", exc_info=e)
+        return True
+
+    def _spawn_member(self) -> asyncio.Task:
+        """ 在后台创建一个新的上游会话，初始化成功后加入连接池 """
+        task = asyncio.create_task(self._create_member())
+        self._spawning.add(task)
+        task.add_done_callback(self._spawning.discard)
+        return task
+
+    async def _create_member(self) -> McpClientManager | None:
+        extra = {'spec': self.openapi_spec} if self.openapi_spec is not None else {}
+        member = _client_manager_class(self.server_config)(mcp_name=self.mcp_name, server_config=self.server_config,
+                                                           message_handler=self._handle_server_message,
+                                                           http_client=self.http_client, **extra)
+        try:
+            await member.wait_for_initialization()
+        except asyncio.CancelledError:
+            # 连接池关闭时取消初始化中的会话
+            await member.cleanup()
+            raise
+        if self._closed or not member.is_alive():
+            await member.cleanup()
+            if not self._closed:
+                self._schedule_reconnect_backoff()
+            return None
+
+        if self.session_initialized_response is None:
+            self.session_initialized_response = member.get_initialized_response()
+        # 会话结束（传输层断开 / 被回收）时立即唤醒巡检任务
+        member.add_done_callback(lambda: self._supervisor_wakeup.set())
+        self._members.append(member)
+        logger.info(f"Server {self.mcp_name}: pool member added, pool size: {len(self._members)}")
+
+        if self._reconnect_failures > 0 or self.circuit_breaker.state != CircuitState.CLOSED:
+            logger.info(f"Server {self.mcp_name}: session reconnected")
+            self._reconnect_failures = 0
+            self._next_reconnect_at = 0.0
+            self.circuit_breaker.reset()
+        if self._subscribed_uris and self._subscription_member is None:
+            self._schedule_resubscribe()
+        if self._tools is None and self._supervisor_task is not None:
+            # 启动时不可用的 mcp server 恢复后加载工具目录并通知监听者
+            self._tools_changed_pending = True
+            self._schedule_tools_refresh()
+        return member
+
+    def _schedule_reconnect_backoff(self):
+        """ 会话重建失败，按指数退避 + 随机抖动计算下一次重建时间 """
+        self._reconnect_failures += 1
+        self.reconnect_failures_total += 1
+        delay = min(self.reconnect_max_delay,
+                    self.reconnect_initial_delay * (2 ** (self._reconnect_failures - 1)))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self._next_reconnect_at = time.monotonic() + delay
+        logger.warning(f"Server {self.mcp_name}: failed to create session "
+                       f"({self._reconnect_failures} times), retry in {delay:.1f}s")
+
+    def supports(self, capability: str) -> bool:
+        """ 上游是否声明了某项能力，如 resources / prompts """
+        response = self.session_initialized_response
+        return response is not None and getattr(response.capabilities, capability, None) is not None
+
+    def tool_config(self, tool_name: str) -> dict[str, Any]:
+        """ 获取单个工具的配置（tools.<工具名称>），如 cacheTtl """
+        return self.server_config.get('tools', {}).get(tool_name, {})
+
+    def get_initialized_response(self) -> mcp.types.InitializeResult:
+        return self.session_initialized_response
+
+    def healthy(self) -> bool:
+        """ 连接池健康状态（缓存），任意一个会话健康且未熔断即视为健康，不访问上游 """
+        return (self.circuit_breaker.state != CircuitState.OPEN and
+                any(member.healthy() for member in self._members))
+
+    def health_status(self) -> dict[str, Any]:
+        return {
+            "healthy": self.healthy(),
+            "sessions": self.alive_size,
+            "healthySessions": sum(1 for member in self._members if member.healthy()),
+            "circuit": self.circuit_breaker.state.value,
+            "lastCheckAgo": round(time.monotonic() - self.last_health_check_time, 3)
+            if self.last_health_check_time else None,
+        }
+
+    def _least_loaded_member(self) -> McpClientManager | None:
+        alive_members = [member for member in self._members if member.is_alive()]
+        if not alive_members:
+            return None
+        # 优先选择健康检查通过的会话
+        return min(alive_members, key=lambda member: (not member.health_ok, member.outstanding_requests))
+
+    async def _acquire_member(self) -> McpClientManager:
+        """ 选取未完成请求数最少的会话，所有会话均繁忙且未达上限时后台扩容 """
+        member = self._least_loaded_member()
+        if member is None:
+            # 没有可用会话（全部崩溃），唤醒巡检任务回收；不在退避期时立即重建一个会话并等待，否则快速失败
+            self._supervisor_wakeup.set()
+            if not self._spawning and not self._closed and time.monotonic() >= self._next_reconnect_at:
+                self._spawn_member()
+            if self._spawning:
+                # 使用 wait 而不是 gather：当前请求被取消时不取消初始化中的会话
+                await asyncio.wait(list(self._spawning))
+                member = self._least_loaded_member()
+            if member is None:
+                raise McpProxyError(ProxyErrorCode.UPSTREAM_UNAVAILABLE.value,
+                                    f"Server {self.mcp_name} has no available session, reconnecting")
+        elif member.outstanding_requests > 0 and self.size < self.max_size:
+            logger.info(f"Server {self.mcp_name}: all sessions busy, scale up pool")
+            self._spawn_member()
+        return member
+
+    async def list_tools(self) -> list[mcp.types.Tool]:
+        """ 从工具目录缓存获取工具列表，缓存失效时才访问上游 """
+        if self._tools is None:
+            return await self._refresh_tools()
+        if time.monotonic() >= self._tools_expire_at:
+            self._schedule_tools_refresh()
+        return self._tools
+
+    async def _refresh_tools(self) -> list[mcp.types.Tool]:
+        """ 从上游拉取最新工具目录，并发刷新只会访问上游一次 """
+        async with self._tools_lock:
+            while True:
+                if self._tools is not None and time.monotonic() < self._tools_expire_at:
+                    return self._tools
+                # 拉取期间若目录被失效（收到 list_changed），丢弃本次结果重新拉取
+                generation = self._tools_generation
+                # 与其他请求相同的调度 / 重试 / 熔断策略
+                tools = await self._dispatch("tools/list", lambda member: member.list_tools())
+                if generation == self._tools_generation:
+                    self._tools = tools
+                    self._tools_expire_at = time.monotonic() + self.tools_ttl
+                    logger.info(f"Server {self.mcp_name}: tool catalog refreshed, {len(tools)} tools")
+                    return tools
+
+    def _schedule_tools_refresh(self):
+        """ 后台刷新工具目录，目录发生过变更时刷新完成后通知监听者 """
+        if self._tools_refresh_task is not None and not self._tools_refresh_task.done():
+            return
+
+        async def refresh():
+            try:
+                await self._refresh_tools()
+            except Exception as e:
+                logger.warning(f"Server {self.mcp_name}: failed to refresh tool catalog", exc_info=e)
+                return
+            if self._tools_changed_pending:
+                self._tools_changed_pending = False
+                for listener in self._tools_changed_listeners:
+                    try:
+                        await listener()
+                    except Exception as e:
+                        logger.warning(f"Server {self.mcp_name}: tools changed listener failed", exc_info=e)
+
+        self._tools_refresh_task = asyncio.create_task(refresh())
+
+    def invalidate_tools(self):
+        """ 使工具目录缓存立即失效 """
+        self._tools = None
+        self._tools_expire_at = 0.0
+        self._tools_generation += 1
+
+    def add_tools_changed_listener(self, listener: Callable[[], Awaitable[None]]):
+        """ 注册工具目录变更监听，用于将变更继续推送给下游会话 """
+        self._tools_changed_listeners.append(listener)
+
+    async def _handle_server_message(self, message: Any) -> None:
+        """ 处理上游会话推送的消息 """
+        if isinstance(message, mcp.types.ServerNotification) and \
+                isinstance(message.root, mcp.types.ToolListChangedNotification):
+            logger.info(f"Server {self.mcp_name}: received tools/list_changed, invalidate tool catalog")
+            self.invalidate_tools()
+            self._tools_changed_pending = True
+            self._schedule_tools_refresh()
+        elif isinstance(message, mcp.types.ServerNotification) and isinstance(message.root, _FORWARDED_NOTIFICATIONS):
+            for listener in self._notification_listeners:
+                await listener(self.mcp_name, message.root)
+
+    def add_notification_listener(self, listener: Callable[[str, Any], Awaitable[None]]):
+        """ 注册资源更新 / 资源列表变更 / 提示词列表变更通知监听 """
+        self._notification_listeners.append(listener)
+
+    async def execute_tool(self, tool_name: str, arguments: dict[str, Any],
+                           relay: NotificationRelay | None = None) -> mcp.types.CallToolResult:
+        """ 调用mcp工具，分发到最空闲的会话；工具调用不一定幂等，只有请求未发出时才换一个会话重试 """
+        return await self._run_on_member(
+            tool_name, lambda member: member.execute_tool(tool_name=tool_name, arguments=arguments, relay=relay),
+            idempotent=False)
+
+    async def execute_tool_raw(self, params: dict[str, Any]) -> RawResponse:
+        """ 透传模式调用工具，与 execute_tool 使用相同的调度 / 重试 / 熔断策略 """
+        return await self._run_on_member(params['name'], lambda member: member.execute_tool_raw(params),
+                                         idempotent=False)
+
+    async def list_resources(self) -> list[mcp.types.Resource]:
+        if not self.supports('resources'):
+            return []
+        return await self._run_on_member("resources/list", lambda member: member.list_resources())
+
+    async def list_resource_templates(self) -> list[mcp.types.ResourceTemplate]:
+        if not self.supports('resources'):
+            return []
+        return await self._run_on_member("resources/templates/list",
+                                         lambda member: member.list_resource_templates())
+
+    async def read_resource(self, uri: str) -> mcp.types.ReadResourceResult:
+        return await self._run_on_member(uri, lambda member: member.read_resource(uri))
+
+    async def subscribe_resource(self, uri: str) -> bool:
+        """ 订阅上游资源更新，上游不支持订阅时返回 False """
+        capability = self.session_initialized_response.capabilities.resources \
+            if self.session_initialized_response else None
+        if capability is None or not capability.subscribe:
+            return False
+        if uri in self._subscribed_uris:
+            return True
+
+        async def subscribe(member: McpClientManager):
+            await member.subscribe_resource(uri)
+            self._subscription_member = member
+
+        # 订阅发出前即登记，并发的相同订阅只向上游订阅一次，失败时撤销
+        self._subscribed_uris.add(uri)
+        try:
+            # 所有订阅集中在同一个会话上，避免多个会话重复推送同一个资源的更新通知
+            member = self._subscription_member
+            if member is not None and member.is_alive():
+                await member.subscribe_resource(uri)
+            else:
+                await self._run_on_member(uri, subscribe)
+        except BaseException:
+            self._subscribed_uris.discard(uri)
+            raise
+        return True
+
+    def _schedule_resubscribe(self):
+        if self._resubscribe_task is None or self._resubscribe_task.done():
+            self._resubscribe_task = asyncio.create_task(self._resubscribe())
+
+    async def _resubscribe(self):
+        """ 持有订阅的会话断开后，在其他会话上重新订阅 """
+        self._subscription_member = None
+        uris, self._subscribed_uris = list(self._subscribed_uris), set()
+        for uri in uris:
+            try:
+                await self.subscribe_resource(uri)
+            except Exception as e:
+                # 保留订阅，下一个会话加入连接池时重试
+                self._subscribed_uris.add(uri)
+                logger.warning(f"Server {self.mcp_name}: failed to resubscribe resource {uri}: {e}")
+
+    async def list_prompts(self) -> list[mcp.types.Prompt]:
+        if not self.supports('prompts'):
+            return []
+        return await self._run_on_member("prompts/list", lambda member: member.list_prompts())
+
+    async def get_prompt(self, name: str, arguments: dict[str, str] | None) -> mcp.types.GetPromptResult:
+        return await self._run_on_member(name, lambda member: member.get_prompt(name, arguments))
+
+    @contextmanager
+    def tracked_call(self):
+        """ 登记一次进行中的调用，可嵌套 """
+        self.active_calls += 1
+        self._idle_event.clear()
+        try:
+            yield
+        finally:
+            self.active_calls -= 1
+            if self.active_calls == 0:
+                self._idle_event.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """ 等待进行中的调用全部完成（配置热更新下线连接池前），超时返回 False """
+        try:
+            await asyncio.wait_for(self._idle_event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run_on_member(self, description: str, request: Callable[[McpClientManager], Awaitable[T]],
+                             idempotent: bool = True) -> T:
+        with self.tracked_call():
+            return await self._dispatch(description, request, idempotent)
+
+    async def _dispatch(self, description: str, request: Callable[[McpClientManager], Awaitable[T]],
+                        idempotent: bool = True) -> T:
+        """
+        在最空闲的会话上执行请求，经过熔断判断；会话传输层断开时换一个可用会话（没有时等待重建）重试一次，
+        非幂等请求（工具调用）只在请求未发出时重试
+        """
+        probe = self.circuit_breaker.before_call()
+        try:
+            return await self._dispatch_with_retry(description, request, idempotent)
+        finally:
+            if probe:
+                # 探测请求被取消时没有记录结果，归还探测名额
+                self.circuit_breaker.release_probe()
+
+    async def _dispatch_with_retry(self, description: str, request: Callable[[McpClientManager], Awaitable[T]],
+                                   idempotent: bool) -> T:
+        retried = False
+        while True:
+            try:
+                with span("acquire"):
+                    member = await self._acquire_member()
+            except Exception:
+                self.circuit_breaker.record_failure()
+                raise
+
+            # 同一个会话上并发的请求数，上游往返耗时包含在共享会话上的排队
+            annotate(sessionInflight=member.outstanding_requests)
+            member.outstanding_requests += 1
+            try:
+                result = await request(member)
+            except asyncio.CancelledError:
+                deadline = call_deadline.get()
+                if deadline is not None and deadline.expired():
+                    # 超过截止时间，上游迟迟没有应答（卡死的上游同样会触发熔断）
+                    self.circuit_breaker.record_failure()
+                raise
+            except Exception as e:
+                if not _is_upstream_failure(e):
+                    # 上游正常应答了错误（如参数错误），上游本身是可用的
+                    self.circuit_breaker.record_success()
+                    raise
+                if is_connection_error(e):
+                    self._supervisor_wakeup.set()
+                    if not retried and not self._closed and (idempotent or _never_sent(e)):
+                        logger.warning(f"Server {self.mcp_name}: session lost while calling {description}, "
+                                       f"retry on another session")
+                        retried = True
+                        continue
+                self.circuit_breaker.record_failure()
+                raise
+            finally:
+                member.outstanding_requests -= 1
+                member.last_used_time = time.monotonic()
+
+            self.circuit_breaker.record_success()
+            return result
+
+    async def _supervise_loop(self):
+        """ 连接池巡检：重建断开的会话 / 补足 minSize / 回收空闲会话，会话断开时立即被唤醒 """
+        while not self._closed:
+            timeout = self.check_interval
+            if self.size < self.min_size:
+                timeout = min(timeout, max(0.0, self._next_reconnect_at - time.monotonic()))
+            try:
+                await asyncio.wait_for(self._supervisor_wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._supervisor_wakeup.clear()
+
+            try:
+                await self._maintain()
+            except Exception as e:
+                logger.warning(f"Server {self.mcp_name}: pool maintenance failed", exc_info=e)
+
+    async def _health_loop(self):
+        """ 定时健康检查：最近有成功应答的会话视为健康（被动存活），其余会话发送 ping 探测 """
+        while not self._closed:
+            await asyncio.sleep(self.health_interval)
+            members = [member for member in self._members if member.is_alive()]
+            try:
+                await asyncio.gather(*(member.check_health(self.health_timeout, self.health_passive_window)
+                                       for member in members))
+            except Exception as e:
+                logger.warning(f"Server {self.mcp_name}: health check failed", exc_info=e)
+            self.last_health_check_time = time.monotonic()
+
+    async def _maintain(self):
+        now = time.monotonic()
+        removed: list[McpClientManager] = []
+
+        for member in list(self._members):
+            if not member.is_alive():
+                logger.warning(f"Server {self.mcp_name}: pool member is dead, replace it")
+                self.sessions_lost += 1
+                removed.append(member)
+            elif (len(self._members) - len(removed) > self.min_size
+                  and member.outstanding_requests == 0
+                  and member is not self._subscription_member
+                  and now - member.last_used_time > self.idle_timeout):
+                logger.info(f"Server {self.mcp_name}: pool member idle for {self.idle_timeout}s, scale down")
+                removed.append(member)
+
+        for member in removed:
+            self._members.remove(member)
+        await asyncio.gather(*(member.cleanup() for member in removed), return_exceptions=True)
+        if self._subscription_member in removed:
+            self._subscription_member = None
+            if self._least_loaded_member() is not None:
+                self._schedule_resubscribe()
+
+        # 处于退避期时不重建，等待下一次巡检
+        if now >= self._next_reconnect_at:
+            for _ in range(self.min_size - self.size):
+                self._spawn_member()
+
+    async def cleanup(self) -> None:
+        """ 关闭连接池内所有会话 """
+        self._closed = True
+        if self._supervisor_task is not None:
+            self._supervisor_task.cancel()
+        if self._health_task is not None:
+            self._health_task.cancel()
+        if self._tools_refresh_task is not None:
+            self._tools_refresh_task.cancel()
+        if self._resubscribe_task is not None:
+            self._resubscribe_task.cancel()
+        # 初始化中的会话直接取消，不等待上游初始化完成（最长 initTimeout）
+        spawning = list(self._spawning)
+        for task in spawning:
+            task.cancel()
+        await asyncio.gather(*spawning, return_exceptions=True)
+        members, self._members = self._members, []
+        await asyncio.gather(*(member.cleanup() for member in members), return_exceptions=True)
+        if self.http_client is not None:
+            await self.http_client.aclose()
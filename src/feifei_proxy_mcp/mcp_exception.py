@@ -1,3 +1,7 @@
+from mcp import McpError
+from mcp.types import ErrorData
+
+
 class McpException(Exception):
     """ mcp 异常类 """
     msg: str | None = None
@@ -10,3 +14,10 @@ class McpException(Exception):
 
     def get_error_message(self) -> str | None:
         return self.msg
+
+
+class McpProxyError(McpError):
+    """ 代理自身产生的 JSON-RPC 错误（上游不可用 / 熔断等），会以 JSON-RPC error 原样返回给下游 """
+
+    def __init__(self, code: int, msg: str):
+        super().__init__(ErrorData(code=code, message=msg))
@@ -0,0 +1,531 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import mcp
+
+from .admission_control import AdmissionController
+from .enums import ProxyErrorCode
+from .logger import McpLogger
+from .mcp_client_pool import McpClientPool, call_deadline
+from .mcp_exception import McpProxyError
+from .metrics import TOOL_CALL_DURATION, TOOL_CALL_ERRORS, TOOL_CALLS, TOOL_CALLS_IN_FLIGHT
+from .notification_relay import NotificationRelay
+from .passthrough import RawResponse
+from .single_flight import SingleFlight
+from .tool_result_cache import ToolResultCache, tool_call_key
+from .tracing import annotate, span
+
+logger = McpLogger.get_logger()
+
+# 多个 mcp server 聚合时，工具名称的命名空间分隔符，例如 fetch.fetch
+TOOL_NAMESPACE_SEPARATOR = "."
+
+# 不在工具目录中的工具调用，指标的 tool 标签
+UNKNOWN_TOOL_LABEL = "unknown"
+
+
+class McpServerRegistry:
+    """
+    mcp server 注册中心 将 mcpServers 中配置的所有 mcp server 聚合到同一个代理中
+
+    "mcpServers": {
+      "fetch": {"command": "uvx", "args": ["mcp-server-fetch"]},
+      "Bazi": {"command": "npx", "args": ["bazi-mcp"]}
+    }
+
+    - 每个 mcp server 拥有独立的连接池 McpClientPool，启动时并发连接，单个 mcp server 启动失败不影响其他 mcp server，
+      启动失败的 mcp server 由连接池在后台持续重连
+    - 配置多个 mcp server 时工具名称带上命名空间（如 fetch.fetch / Bazi.getBaziDetail），
+      仅配置一个 mcp server 时保持原始工具名称
+    - 工具名称 -> (连接池, 上游工具名称) 的路由表，工具调用 O(1) 路由
+    - 配置了 cacheTtl 的工具，调用结果由 ToolResultCache 缓存
+    - 配置了 coalesce 的工具，同一时刻参数相同的调用由 SingleFlight 合并为一次上游请求
+    - 发往上游的工具调用经过 AdmissionController 准入控制（全局 / 单个工具并发限制）
+    - 工具调用超过截止时间（callTimeout / 下游请求头）或下游取消时，取消上游调用并释放并发名额
+    - 每次工具调用记录调用次数、错误次数与耗时指标（/metrics）
+    - 配置了 passthrough 的 stdio mcp server，工具调用响应以原始字节透传（execute_tool_raw）
+    - 资源 / 提示词同样聚合：资源按 uri 路由，提示词名称与工具一样带上命名空间；
+      配置了 resourceCacheTtl 的 mcp server，resources/read 结果按 uri 缓存；
+      下游订阅的资源同时向上游订阅，收到 notifications/resources/updated 时立即失效
+    - 配置热更新（reload）：只重建配置发生变化的 mcp server，旧连接池排空后关闭
+    """
+
+    def __init__(self, mcp_server_config: dict[str, Any], result_cache_max_bytes: int = 64 * 1024 * 1024,
+                 admission_controller: AdmissionController | None = None, call_timeout: float = 0):
+        mcp_servers: dict[str, dict[str, Any]] = mcp_server_config.get('mcpServers', {})
+        if not mcp_servers:
+            raise ValueError("mcpServers must be contain at least one mcp server configuration")
+
+        self.server_configs = mcp_servers
+        self.namespaced: bool = len(mcp_servers) > 1
+        self.pools: dict[str, McpClientPool] = {}
+
+        self._tools: list[mcp.types.Tool] | None = None
+        # 构建聚合工具目录时各连接池返回的工具列表，连接池目录刷新后为新的列表对象
+        self._tool_sources: list[list[mcp.types.Tool]] = []
+        self._routes: dict[str, tuple[McpClientPool, str]] = {}
+        self._tools_changed_listeners: list[Callable[[], Awaitable[None]]] = []
+        # 资源 uri -> 连接池，资源模板 uri 前缀 -> 连接池，提示词名称 -> (连接池, 上游提示词名称)
+        self._resource_routes: dict[str, McpClientPool] = {}
+        self._template_routes: dict[str, McpClientPool] = {}
+        self._prompt_routes: dict[str, tuple[McpClientPool, str]] = {}
+        self._notification_listeners: list[Callable[[Any], Awaitable[None]]] = []
+        self.result_cache = ToolResultCache(max_bytes=result_cache_max_bytes)
+        self.single_flight = SingleFlight()
+        self.admission_controller = admission_controller or AdmissionController()
+        # 工具调用默认截止时间（秒），0 表示不限制
+        self.call_timeout = call_timeout
+        # 配置热更新：串行执行，被替换的旧连接池在后台等待进行中的调用完成后关闭
+        self._reload_lock: asyncio.Lock = asyncio.Lock()
+        self._retiring: dict[asyncio.Task, McpClientPool] = {}
+
+    async def start(self) -> bool:
+        """ 并发启动所有 mcp server，至少一个启动成功即视为启动成功 """
+        self.pools, started = await self._start_pools(self.server_configs)
+        return bool(started)
+
+    async def _start_pools(self, server_configs: dict[str, dict[str, Any]]) -> tuple[dict[str, McpClientPool], list[str]]:
+        """ 并发启动连接池，返回 (所有连接池, 启动成功的 mcp server 名称) """
+        pools = {mcp_name: McpClientPool(mcp_name=mcp_name, server_config=server_config)
+                 for mcp_name, server_config in server_configs.items()}
+        results = await asyncio.gather(*(pool.start() for pool in pools.values()), return_exceptions=True)
+
+        started: list[str] = []
+        for (mcp_name, pool), result in zip(pools.items(), results):
+            # 启动失败的 mcp server 同样保留，由连接池巡检任务在后台重连，恢复后自动加入工具目录
+            pool.add_tools_changed_listener(self._on_server_tools_changed)
+            pool.add_notification_listener(self._on_server_notification)
+            if result is True:
+                started.append(mcp_name)
+                logger.info(f"====== mcp server {mcp_name} started ======")
+            elif isinstance(result, BaseException):
+                logger.warning(f"failed to start mcp server {mcp_name}, reconnect in background", exc_info=result)
+            else:
+                logger.warning(f"failed to start mcp server {mcp_name}, reconnect in background")
+
+        return pools, started
+
+    async def reload(self, mcp_server_config: dict[str, Any], drain_timeout: float = 30) -> dict[str, list[str]]:
+        """
+        配置热更新，返回各 mcp server 的变更情况：
+        - 配置未变化的 mcp server 保留原连接池，上游会话不中断
+        - 新增 / 配置变更的 mcp server 与旧连接池并行启动，全部启动成功后一次性切换路由；
+          任意一个启动失败时放弃本次更新，继续使用当前配置
+        - 被替换 / 移除的旧连接池等待进行中的调用完成（最长 drain_timeout 秒）后关闭
+        """
+        mcp_servers: dict[str, dict[str, Any]] = mcp_server_config.get('mcpServers', {})
+        if not mcp_servers:
+            raise ValueError("mcpServers must be contain at least one mcp server configuration")
+
+        async with self._reload_lock:
+            unchanged = [name for name, config in mcp_servers.items() if self.server_configs.get(name) == config]
+            changed = [name for name in mcp_servers if name in self.server_configs and name not in unchanged]
+            added = [name for name in mcp_servers if name not in self.server_configs]
+            removed = [name for name in self.server_configs if name not in mcp_servers]
+            diff = {"added": added, "changed": changed, "removed": removed, "unchanged": unchanged}
+            if not (added or changed or removed):
+                return diff
+
+            new_pools, started = await self._start_pools({name: mcp_servers[name] for name in added + changed})
+            failed = [name for name in new_pools if name not in started]
+            if failed:
+                await asyncio.gather(*(pool.cleanup() for pool in new_pools.values()), return_exceptions=True)
+                raise RuntimeError(f"failed to start mcp servers {failed}, keep current configuration")
+
+            pools = {name: new_pools.get(name) or self.pools[name] for name in mcp_servers}
+            namespaced = len(pools) > 1
+            # 切换前预先构建新的工具目录与路由表
+            sources = await self._fetch_tools(pools)
+            tools, routes, complete = self._combine_catalog(pools, sources, namespaced)
+
+            # 一次性切换路由（中间没有 await），之后的请求全部路由到新的连接池
+            retired = [self.pools[name] for name in changed + removed]
+            self.server_configs, self.pools, self.namespaced = mcp_servers, pools, namespaced
+            self._routes, self._tools, self._tool_sources = routes, tools if complete else None, sources
+            self._resource_routes, self._template_routes, self._prompt_routes = {}, {}, {}
+            for name in changed + removed:
+                self.result_cache.invalidate_server(name)
+                self.admission_controller.forget_server(name)
+            for pool in retired:
+                task = asyncio.create_task(self._retire(pool, drain_timeout))
+                self._retiring[task] = pool
+                task.add_done_callback(self._retiring.pop)
+
+        logger.info(f"mcp server configuration reloaded, added: {added}, changed: {changed}, removed: {removed}")
+        for listener in self._tools_changed_listeners:
+            await listener()
+        for notification in (mcp.types.ResourceListChangedNotification(method="notifications/resources/list_changed"),
+                             mcp.types.PromptListChangedNotification(method="notifications/prompts/list_changed")):
+            for listener in self._notification_listeners:
+                try:
+                    await listener(notification)
+                except Exception as e:
+                    logger.warning(f"failed to notify downstream of configuration reload: {e}")
+        return diff
+
+    async def _retire(self, pool: McpClientPool, drain_timeout: float):
+        """ 等待旧连接池上进行中的调用完成后关闭 """
+        if not await pool.drain(drain_timeout):
+            logger.warning(f"Server {pool.mcp_name}: {pool.active_calls} calls still in flight after "
+                           f"{drain_timeout}s, close retired pool")
+        await pool.cleanup()
+        logger.info(f"Server {pool.mcp_name}: retired pool closed")
+
+    def get_initialized_response(self) -> mcp.types.InitializeResult | None:
+        """ 仅代理一个 mcp server 时返回其初始化信息，聚合多个时返回 None """
+        if len(self.pools) == 1 and not self.namespaced:
+            return next(iter(self.pools.values())).get_initialized_response()
+        return None
+
+    def healthy(self) -> bool:
+        """ 任意一个 mcp server 可用即视为健康，读取连接池缓存的健康状态，不访问上游 """
+        return any(pool.healthy() for pool in self.pools.values())
+
+    def health_status(self) -> dict[str, dict[str, Any]]:
+        return {mcp_name: pool.health_status() for mcp_name, pool in self.pools.items()}
+
+    def _tool_name(self, mcp_name: str, tool_name: str) -> str:
+        if self.namespaced:
+            return f"{mcp_name}{TOOL_NAMESPACE_SEPARATOR}{tool_name}"
+        return tool_name
+
+    async def list_tools(self) -> list[mcp.types.Tool]:
+        """
+        聚合所有 mcp server 的工具列表，并重建路由表
+        每次都经过连接池的工具目录缓存（过期时由连接池在后台刷新，见 toolsTtl），
+        各连接池返回的目录均未变化时直接复用聚合结果
+        """
+        sources = await self._fetch_tools(self.pools)
+        if self._tools is not None and len(sources) == len(self._tool_sources) and all(
+                source is cached for source, cached in zip(sources, self._tool_sources)):
+            return self._tools
+
+        tools, routes, complete = self._combine_catalog(self.pools, sources, self.namespaced)
+        self._routes, self._tool_sources = routes, sources
+        # 部分 mcp server 拉取失败时不缓存聚合结果，下次重新拉取
+        self._tools = tools if complete else None
+        return tools
+
+    @staticmethod
+    async def _fetch_tools(pools: dict[str, McpClientPool]) -> list[Any]:
+        """ 拉取各连接池的工具列表（连接池缓存中的列表对象），失败时为对应的异常 """
+        return await asyncio.gather(*(pool.list_tools() for pool in pools.values()), return_exceptions=True)
+
+    @staticmethod
+    def _combine_catalog(pools: dict[str, McpClientPool], sources: list[Any], namespaced: bool) \
+            -> tuple[list[mcp.types.Tool], dict[str, tuple[McpClientPool, str]], bool]:
+        """ 合并各连接池的工具列表，返回 (聚合工具列表, 路由表, 是否全部拉取成功) """
+        tools: list[mcp.types.Tool] = []
+        routes: dict[str, tuple[McpClientPool, str]] = {}
+        for (mcp_name, pool), result in zip(pools.items(), sources):
+            if isinstance(result, BaseException):
+                logger.warning(f"failed to list tools for mcp server {mcp_name}: {result}")
+                continue
+            for tool in result:
+                name = f"{mcp_name}{TOOL_NAMESPACE_SEPARATOR}{tool.name}" if namespaced else tool.name
+                routes[name] = (pool, tool.name)
+                tools.append(tool.model_copy(update={"name": name}) if name != tool.name else tool)
+
+        return tools, routes, not any(isinstance(result, BaseException) for result in sources)
+
+    async def _resolve(self, tool_name: str) -> tuple[McpClientPool, str]:
+        route = self._routes.get(tool_name)
+        if route is None:
+            # 路由表可能尚未构建或已过期，刷新一次
+            self._tools = None
+            await self.list_tools()
+            route = self._routes.get(tool_name)
+        if route is None and self.namespaced:
+            # mcp server 暂不可用时工具不在目录中，仍按命名空间路由，由连接池返回不可用 / 熔断错误
+            mcp_name, _, upstream_tool_name = tool_name.partition(TOOL_NAMESPACE_SEPARATOR)
+            if mcp_name in self.pools and upstream_tool_name:
+                route = (self.pools[mcp_name], upstream_tool_name)
+        if route is None:
+            raise ValueError(f"Unknown tool: {tool_name}")
+        return route
+
+    async def execute_tool(self, tool_name: str, arguments: dict[str, Any],
+                           relay: NotificationRelay | None = None,
+                           timeout: float | None = None) -> mcp.types.CallToolResult:
+        """
+        按路由表将工具调用转发到对应的 mcp server，按工具配置使用结果缓存 / 相同请求合并
+        relay 用于将上游的进度 / 日志通知转发给下游（被合并的请求只有首个请求收到通知）
+        timeout 为下游请求的截止时间（秒），只能缩短配置的截止时间
+        """
+        with span("route"):
+            pool, upstream_tool_name = await self._resolve(tool_name)
+        return await self._instrumented(pool, upstream_tool_name,
+                                        lambda: self._execute_tool(pool, upstream_tool_name, arguments, relay),
+                                        self._call_timeout(pool, upstream_tool_name, timeout),
+                                        self._tool_label(tool_name, upstream_tool_name))
+
+    def _call_timeout(self, pool: McpClientPool, upstream_tool_name: str, requested: float | None) -> float | None:
+        """ 截止时间：工具 callTimeout > mcp server callTimeout > 全局默认值，下游请求头指定时取较小值 """
+        configured = float(pool.tool_config(upstream_tool_name).get(
+            'callTimeout', pool.server_config.get('callTimeout', self.call_timeout)))
+        timeouts = [timeout for timeout in (configured, requested) if timeout is not None and timeout > 0]
+        return min(timeouts) if timeouts else None
+
+    async def execute_tool_raw(self, tool_name: str, arguments: dict[str, Any],
+                               timeout: float | None = None) -> RawResponse | None:
+        """
+        透传模式调用工具，返回上游的原始 JSON-RPC 响应；
+        mcp server 未开启 passthrough 或工具配置了结果缓存 / 相同请求合并时返回 None，由调用方走常规处理
+        """
+        with span("route"):
+            pool, upstream_tool_name = await self._resolve(tool_name)
+        if not pool.passthrough:
+            return None
+        tool_config = pool.tool_config(upstream_tool_name)
+        if float(tool_config.get('cacheTtl', 0)) > 0 or tool_config.get('coalesce', False):
+            return None
+
+        async def call() -> RawResponse:
+            async with self.admission_controller.admit(pool.mcp_name, upstream_tool_name, tool_config):
+                return await pool.execute_tool_raw({"name": upstream_tool_name, "arguments": arguments})
+
+        return await self._instrumented(pool, upstream_tool_name, call,
+                                        self._call_timeout(pool, upstream_tool_name, timeout),
+                                        self._tool_label(tool_name, upstream_tool_name))
+
+    def _tool_label(self, tool_name: str, upstream_tool_name: str) -> str:
+        """
+        指标的 tool 标签：不在工具目录中的工具名（命名空间兜底路由）统一记为 unknown，
+        避免下游传入的任意工具名撑大指标的标签基数
+        """
+        return upstream_tool_name if tool_name in self._routes else UNKNOWN_TOOL_LABEL
+
+    async def _instrumented(self, pool: McpClientPool, upstream_tool_name: str,
+                            call: Callable[[], Awaitable[Any]], timeout: float | None, tool_label: str) -> Any:
+        """ 在截止时间内执行工具调用，记录调用次数、错误次数与耗时指标（按 tool_label 打标签） """
+        TOOL_CALLS.inc(pool.mcp_name, tool_label)
+        TOOL_CALLS_IN_FLIGHT.inc(pool.mcp_name)
+        started = time.perf_counter()
+        error_code: str | None = None
+        annotate(server=pool.mcp_name)
+        try:
+            deadline = asyncio.timeout(timeout)
+            token = call_deadline.set(deadline)
+            try:
+                with pool.tracked_call():
+                    async with deadline:
+                        result = await call()
+            except TimeoutError:
+                if not deadline.expired():
+                    raise
+                # 超时取消已传递到上游会话（notifications/cancelled）与准入控制（释放并发名额）
+                raise McpProxyError(ProxyErrorCode.DEADLINE_EXCEEDED.value,
+                                    f"Server {pool.mcp_name}: tool {upstream_tool_name} "
+                                    f"exceeded deadline of {timeout}s") from None
+            finally:
+                call_deadline.reset(token)
+            if isinstance(result, RawResponse):
+                error_code = result.error_code
+            elif result.isError:
+                error_code = "tool_error"
+            return result
+        except mcp.McpError as e:
+            error_code = str(e.error.code)
+            raise
+        except asyncio.CancelledError:
+            # 下游断开 / 取消
+            error_code = "cancelled"
+            raise
+        except Exception:
+            error_code = "exception"
+            raise
+        finally:
+            TOOL_CALLS_IN_FLIGHT.dec(pool.mcp_name)
+            TOOL_CALL_DURATION.observe(time.perf_counter() - started, pool.mcp_name, tool_label)
+            if error_code is not None:
+                TOOL_CALL_ERRORS.inc(pool.mcp_name, tool_label, error_code)
+                annotate(error=error_code)
+
+    async def _execute_tool(self, pool: McpClientPool, upstream_tool_name: str, arguments: dict[str, Any],
+                            relay: NotificationRelay | None) -> mcp.types.CallToolResult:
+        tool_config = pool.tool_config(upstream_tool_name)
+        cache_ttl = float(tool_config.get('cacheTtl', 0))
+        coalesce = bool(tool_config.get('coalesce', False))
+        if cache_ttl <= 0 and not coalesce:
+            return await self._call_upstream(pool, upstream_tool_name, arguments, tool_config, relay)
+
+        call_key = tool_call_key(pool.mcp_name, upstream_tool_name, arguments)
+        if cache_ttl > 0:
+            result = self.result_cache.get(call_key)
+            if result is not None:
+                return result
+
+        async def call() -> mcp.types.CallToolResult:
+            result = await self._call_upstream(pool, upstream_tool_name, arguments, tool_config, relay)
+            if cache_ttl > 0:
+                # 只由实际发往上游的调用写入缓存，被合并的调用共享同一个结果
+                self.result_cache.put(call_key, result, ttl=cache_ttl)
+            return result
+
+        if coalesce:
+            return await self.single_flight.do(call_key, call)
+        return await call()
+
+    async def _call_upstream(self, pool: McpClientPool, tool_name: str, arguments: dict[str, Any],
+                             tool_config: dict[str, Any], relay: NotificationRelay | None) -> mcp.types.CallToolResult:
+        """ 经过准入控制后调用上游工具 """
+        async with self.admission_controller.admit(pool.mcp_name, tool_name, tool_config):
+            return await pool.execute_tool(tool_name=tool_name, arguments=arguments, relay=relay)
+
+    async def list_resources(self) -> list[mcp.types.Resource]:
+        """ 聚合所有 mcp server 的资源列表（资源 uri 不加命名空间），并重建资源路由表 """
+        pools = [pool for pool in self.pools.values() if pool.supports('resources')]
+        results = await asyncio.gather(*(pool.list_resources() for pool in pools), return_exceptions=True)
+
+        resources: list[mcp.types.Resource] = []
+        routes: dict[str, McpClientPool] = {}
+        for pool, result in zip(pools, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"failed to list resources for mcp server {pool.mcp_name}: {result}")
+                continue
+            for resource in result:
+                routes.setdefault(str(resource.uri), pool)
+                resources.append(resource)
+        self._resource_routes = routes
+        return resources
+
+    async def list_resource_templates(self) -> list[mcp.types.ResourceTemplate]:
+        """ 聚合所有 mcp server 的资源模板，模板中第一个变量之前的部分作为路由前缀 """
+        pools = [pool for pool in self.pools.values() if pool.supports('resources')]
+        results = await asyncio.gather(*(pool.list_resource_templates() for pool in pools), return_exceptions=True)
+
+        templates: list[mcp.types.ResourceTemplate] = []
+        routes: dict[str, McpClientPool] = {}
+        for pool, result in zip(pools, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"failed to list resource templates for mcp server {pool.mcp_name}: {result}")
+                continue
+            for template in result:
+                prefix = template.uriTemplate.split('{', 1)[0]
+                if prefix:
+                    routes.setdefault(prefix, pool)
+                templates.append(template)
+        self._template_routes = routes
+        return templates
+
+    def _match_resource(self, uri: str) -> McpClientPool | None:
+        pool = self._resource_routes.get(uri)
+        if pool is not None:
+            return pool
+        # 最长前缀匹配资源模板
+        matched = [prefix for prefix in self._template_routes if uri.startswith(prefix)]
+        if matched:
+            return self._template_routes[max(matched, key=len)]
+        return None
+
+    async def _resolve_resource(self, uri: str) -> McpClientPool:
+        pool = self._match_resource(uri)
+        if pool is None:
+            # 路由表可能尚未构建或已过期，刷新一次
+            await asyncio.gather(self.list_resources(), self.list_resource_templates())
+            pool = self._match_resource(uri)
+        if pool is None:
+            # 动态资源不一定出现在列表中，交给第一个支持资源的 mcp server 处理
+            pool = next((pool for pool in self.pools.values() if pool.supports('resources')), None)
+        if pool is None:
+            raise ValueError(f"Unknown resource: {uri}")
+        return pool
+
+    async def read_resource(self, uri: str) -> mcp.types.ReadResourceResult:
+        """ 按 uri 路由读取资源，配置了 resourceCacheTtl 时缓存读取结果，并发的相同读取合并为一次上游请求 """
+        pool = await self._resolve_resource(uri)
+        cache_ttl = float(pool.server_config.get('resourceCacheTtl', 0))
+        if cache_ttl <= 0:
+            return await pool.read_resource(uri)
+
+        key = _resource_key(pool.mcp_name, uri)
+        result = self.result_cache.get(key)
+        if result is not None:
+            return result
+
+        async def read() -> mcp.types.ReadResourceResult:
+            result = await pool.read_resource(uri)
+            self.result_cache.put(key, result, ttl=cache_ttl)
+            return result
+
+        return await self.single_flight.do(key, read)
+
+    async def subscribe_resource(self, uri: str) -> bool:
+        """ 下游订阅资源时向上游订阅（每个资源只订阅一次），返回上游是否支持订阅 """
+        pool = await self._resolve_resource(uri)
+        return await pool.subscribe_resource(uri)
+
+    async def list_prompts(self) -> list[mcp.types.Prompt]:
+        """ 聚合所有 mcp server 的提示词列表，与工具一样带上命名空间，并重建提示词路由表 """
+        pools = [pool for pool in self.pools.values() if pool.supports('prompts')]
+        results = await asyncio.gather(*(pool.list_prompts() for pool in pools), return_exceptions=True)
+
+        prompts: list[mcp.types.Prompt] = []
+        routes: dict[str, tuple[McpClientPool, str]] = {}
+        for pool, result in zip(pools, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"failed to list prompts for mcp server {pool.mcp_name}: {result}")
+                continue
+            for prompt in result:
+                name = self._tool_name(pool.mcp_name, prompt.name)
+                routes[name] = (pool, prompt.name)
+                prompts.append(prompt.model_copy(update={"name": name}) if name != prompt.name else prompt)
+        self._prompt_routes = routes
+        return prompts
+
+    async def get_prompt(self, name: str, arguments: dict[str, str] | None) -> mcp.types.GetPromptResult:
+        route = self._prompt_routes.get(name)
+        if route is None:
+            await self.list_prompts()
+            route = self._prompt_routes.get(name)
+        if route is None and self.namespaced:
+            mcp_name, _, upstream_name = name.partition(TOOL_NAMESPACE_SEPARATOR)
+            if mcp_name in self.pools and upstream_name:
+                route = (self.pools[mcp_name], upstream_name)
+        if route is None:
+            raise ValueError(f"Unknown prompt: {name}")
+        pool, upstream_name = route
+        return await pool.get_prompt(upstream_name, arguments)
+
+    def add_notification_listener(self, listener: Callable[[Any], Awaitable[None]]):
+        """ 注册资源更新 / 资源列表变更 / 提示词列表变更通知监听，用于继续推送给下游会话 """
+        self._notification_listeners.append(listener)
+
+    async def _on_server_notification(self, mcp_name: str, notification: Any):
+        if isinstance(notification, mcp.types.ResourceUpdatedNotification):
+            uri = str(notification.params.uri)
+            if self.result_cache.invalidate(_resource_key(mcp_name, uri)):
+                logger.debug(f"Server {mcp_name}: resource {uri} updated, cache invalidated")
+        elif isinstance(notification, mcp.types.ResourceListChangedNotification):
+            self._resource_routes = {}
+        for listener in self._notification_listeners:
+            try:
+                await listener(notification)
+            except Exception as e:
+                logger.warning(f"failed to forward notification from mcp server {mcp_name}: {e}")
+
+    def add_tools_changed_listener(self, listener: Callable[[], Awaitable[None]]):
+        """ 注册工具目录变更监听，用于将变更继续推送给下游会话 """
+        self._tools_changed_listeners.append(listener)
+
+    async def _on_server_tools_changed(self):
+        self._tools = None
+        await self.list_tools()
+        for listener in self._tools_changed_listeners:
+            await listener()
+
+    async def cleanup(self) -> None:
+        """ 关闭所有 mcp server 连接 """
+        pools, self.pools = self.pools, {}
+        retiring, self._retiring = self._retiring, {}
+        for task in retiring:
+            task.cancel()
+        await asyncio.gather(*(pool.cleanup() for pool in [*pools.values(), *retiring.values()]),
+                             return_exceptions=True)
+        self.result_cache.clear()
+
+
+def _resource_key(mcp_name: str, uri: str) -> tuple[str, str, str]:
+    return mcp_name, "resources/read", uri
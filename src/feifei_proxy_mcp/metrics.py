@@ -0,0 +1,168 @@
+import bisect
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING
+
+from .enums import CircuitState
+
+if TYPE_CHECKING:
+    from .mcp_server_registry import McpServerRegistry
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """
+    计数器 代理运行在单个事件循环线程中，指标更新只是一次字典读写，不需要加锁
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: defaultdict[tuple, float] = defaultdict(float)
+
+    def inc(self, *label_values, amount: float = 1.0):
+        self._values[label_values] += amount
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.label_names, label_values)} {value}"
+
+
+class Gauge(Counter):
+    """ 仪表盘 """
+
+    def dec(self, *label_values, amount: float = 1.0):
+        self._values[label_values] -= amount
+
+    def set(self, value: float, *label_values):
+        self._values[label_values] = value
+
+    def collect(self) -> Iterator[str]:
+        for line in super().collect():
+            yield line.replace(" counter", " gauge", 1) if line.startswith("# TYPE") else line
+
+
+class Histogram:
+    """ 直方图 每次观测只累加所在分桶，采集时再计算累计值 """
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        # 每组标签：[各分桶计数..., +Inf 计数], 总和
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: defaultdict[tuple, float] = defaultdict(float)
+
+    def observe(self, value: float, *label_values):
+        counts = self._counts.get(label_values)
+        if counts is None:
+            counts = self._counts[label_values] = [0] * (len(self.buckets) + 1)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[label_values] += value
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, label_values, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            cumulative += counts[-1]
+            labels = _format_labels(self.label_names, label_values, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, label_values)} {self._sums[label_values]}"
+            yield f"{self.name}_count{_format_labels(self.label_names, label_values)} {cumulative}"
+
+
+def _sample_lines(name: str, documentation: str, metric_type: str, label_names: tuple[str, ...],
+                  samples: Iterable[tuple[tuple, float]]) -> Iterator[str]:
+    """ 采集时才读取的状态类指标，不占用请求链路 """
+    yield f"# HELP {name} {documentation}"
+    yield f"# TYPE {name} {metric_type}"
+    for label_values, value in samples:
+        yield f"{name}{_format_labels(label_names, label_values)} {value}"
+
+
+# ====== 请求链路上实时更新的指标 ======
+
+TOOL_CALLS = Counter("proxy_tool_calls_total", "Tool calls received by the proxy", ("server", "tool"))
+TOOL_CALL_ERRORS = Counter("proxy_tool_call_errors_total", "Tool calls that failed or returned isError",
+                           ("server", "tool", "code"))
+TOOL_CALL_DURATION = Histogram("proxy_tool_call_duration_seconds", "Tool call latency seen by the proxy",
+                               ("server", "tool"))
+TOOL_CALLS_IN_FLIGHT = Gauge("proxy_tool_calls_in_flight", "Tool calls currently being processed", ("server",))
+HEALTH_PROBE_DURATION = Histogram("proxy_upstream_health_probe_duration_seconds",
+                                  "Latency of upstream health probes", ("server",))
+
+_LIVE_METRICS = (TOOL_CALLS, TOOL_CALL_ERRORS, TOOL_CALL_DURATION, TOOL_CALLS_IN_FLIGHT, HEALTH_PROBE_DURATION)
+
+_CIRCUIT_STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+def _registry_lines(registry: "McpServerRegistry") -> Iterator[str]:
+    pools = list(registry.pools.items())
+    yield from _sample_lines("proxy_upstream_sessions", "Live upstream sessions per server", "gauge", ("server",),
+                             (((name,), pool.alive_size) for name, pool in pools))
+    yield from _sample_lines("proxy_upstream_healthy", "Cached upstream health (1 healthy, 0 unhealthy)", "gauge",
+                             ("server",), (((name,), int(pool.healthy())) for name, pool in pools))
+    yield from _sample_lines("proxy_upstream_sessions_lost_total", "Upstream sessions lost since start", "counter",
+                             ("server",), (((name,), pool.sessions_lost) for name, pool in pools))
+    yield from _sample_lines("proxy_upstream_reconnect_failures_total", "Failed upstream session rebuilds", "counter",
+                             ("server",), (((name,), pool.reconnect_failures_total) for name, pool in pools))
+    yield from _sample_lines("proxy_upstream_circuit_state", "Circuit breaker state (0 closed, 1 half open, 2 open)",
+                             "gauge", ("server",),
+                             (((name,), _CIRCUIT_STATE_VALUES[pool.circuit_breaker.state]) for name, pool in pools))
+
+    cache = registry.result_cache.stats()
+    for key in ("hits", "misses", "evictions"):
+        yield from _sample_lines(f"proxy_result_cache_{key}_total", f"Tool result cache {key}", "counter", (),
+                                 [((), cache[key])])
+    for key in ("entries", "bytes", "max_bytes"):
+        yield from _sample_lines(f"proxy_result_cache_{key}", f"Tool result cache {key}", "gauge", (),
+                                 [((), cache[key])])
+
+    single_flight = registry.single_flight.stats()
+    yield from _sample_lines("proxy_coalesced_calls_total", "Tool calls served by an identical in-flight call",
+                             "counter", (), [((), single_flight["coalesced"])])
+
+    limiters = list(registry.admission_controller.tool_limiters.values())
+    if registry.admission_controller.global_limiter is not None:
+        limiters.append(registry.admission_controller.global_limiter)
+    for key, metric_type in (("active", "gauge"), ("waiting", "gauge"),
+                             ("rejected", "counter"), ("timed_out", "counter")):
+        name = f"proxy_admission_{key}" + ("_total" if metric_type == "counter" else "")
+        yield from _sample_lines(name, f"Admission control {key} calls", metric_type, ("limiter",),
+                                 (((limiter.name,), limiter.stats()[key]) for limiter in limiters))
+
+
+def render_metrics(registry: "McpServerRegistry | None") -> str:
+    """ 以 Prometheus 文本格式输出所有指标 """
+    lines: list[str] = []
+    for metric in _LIVE_METRICS:
+        lines.extend(metric.collect())
+    if registry is not None:
+        lines.extend(_registry_lines(registry))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,126 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from mcp import types
+from mcp.server.session import ServerSession
+
+from .logger import McpLogger
+
+logger = McpLogger.get_logger()
+
+# 单个下游请求积压的待转发通知上限，下游处理过慢时丢弃新的通知
+_MAX_PENDING_NOTIFICATIONS = 100
+# 工具调用完成后等待积压通知发送完成的最长时间（秒），保证通知先于结果到达下游
+_FLUSH_TIMEOUT = 1.0
+
+
+class NotificationRelay:
+    """
+    通知转发 将上游工具调用过程中推送的进度（notifications/progress）与日志（notifications/message）
+    实时转发给发起该调用的下游请求，长耗时工具在完成前即可向下游持续输出
+
+    - 进度通知：仅当下游请求携带了 progressToken 时转发，并替换为下游的 progressToken
+    - 日志通知：上游日志不关联具体请求，只在能确定归属时转发（见 McpClientManager._relay_log_message）
+    - 通知进入有界队列后由后台任务按顺序发送，不阻塞上游会话的接收循环；积压超过上限时丢弃
+    - 转发失败（下游已断开）不影响上游调用
+    """
+
+    def __init__(self, session: ServerSession, request_id: types.RequestId,
+                 progress_token: types.ProgressToken | None = None):
+        self.session = session
+        self.request_id = request_id
+        self.progress_token = progress_token
+        self._pending: asyncio.Queue[Callable[[], Awaitable[None]]] | None = None
+        self._sender: asyncio.Task | None = None
+
+    @classmethod
+    def from_request_context(cls, request_context, request: types.CallToolRequest) -> "NotificationRelay":
+        meta = request.params.meta
+        return cls(session=request_context.session, request_id=request_context.request_id,
+                   progress_token=meta.progressToken if meta is not None else None)
+
+    async def on_progress(self, progress: float, total: float | None, message: str | None) -> None:
+        if self.progress_token is None:
+            return
+        self._enqueue(lambda: self.session.send_progress_notification(
+            self.progress_token, progress, total=total, message=message, related_request_id=str(self.request_id)))
+
+    def on_log(self, params: types.LoggingMessageNotificationParams) -> None:
+        self._enqueue(lambda: self.session.send_log_message(params.level, params.data, logger=params.logger,
+                                                            related_request_id=self.request_id))
+
+    def _enqueue(self, send: Callable[[], Awaitable[None]]):
+        if self._pending is None:
+            self._pending = asyncio.Queue(maxsize=_MAX_PENDING_NOTIFICATIONS)
+            self._sender = asyncio.create_task(self._send_loop())
+        try:
+            self._pending.put_nowait(send)
+        except asyncio.QueueFull:
+            logger.debug(f"downstream request {self.request_id} is too slow, notification dropped")
+
+    async def _send_loop(self):
+        while True:
+            send = await self._pending.get()
+            try:
+                await send()
+            except Exception as e:
+                logger.debug(f"failed to relay notification to downstream request {self.request_id}: {e}")
+            finally:
+                self._pending.task_done()
+
+    async def flush(self, timeout: float = _FLUSH_TIMEOUT):
+        """ 工具调用完成后、返回结果前等待积压的通知发送完成 """
+        if self._pending is None:
+            return
+        try:
+            await asyncio.wait_for(self._pending.join(), timeout)
+        except TimeoutError:
+            logger.debug(f"downstream request {self.request_id}: pending notifications not flushed in {timeout}s")
+
+    def close(self):
+        if self._sender is not None:
+            self._sender.cancel()
+
+
+class HttpResponseRelay(NotificationRelay):
+    """
+    无状态 http 工具调用快速路径的通知转发：没有下游会话，通知直接写入本次 http 响应
+    - 调用过程中没有通知时由调用方以 JSON 返回结果
+    - 收到第一条通知时以 SSE 流式响应开始（text/event-stream），工具调用结果作为最后一个事件（finish）
+    """
+
+    def __init__(self, send, request_id: types.RequestId, progress_token: types.ProgressToken | None = None):
+        super().__init__(session=None, request_id=request_id, progress_token=progress_token)
+        self._send = send
+        self.streaming: bool = False
+
+    async def on_progress(self, progress: float, total: float | None, message: str | None) -> None:
+        if self.progress_token is None:
+            return
+        notification = types.ProgressNotification(
+            method="notifications/progress",
+            params=types.ProgressNotificationParams(progressToken=self.progress_token, progress=progress,
+                                                    total=total, message=message))
+        self._enqueue(lambda: self._send_notification(notification))
+
+    def on_log(self, params: types.LoggingMessageNotificationParams) -> None:
+        notification = types.LoggingMessageNotification(method="notifications/message", params=params)
+        self._enqueue(lambda: self._send_notification(notification))
+
+    async def _send_notification(self, notification: types.ProgressNotification | types.LoggingMessageNotification):
+        message = types.JSONRPCNotification(jsonrpc="2.0", **notification.model_dump(by_alias=True, mode="json",
+                                                                                     exclude_none=True))
+        await self._send_event(message.model_dump_json(by_alias=True, exclude_none=True).encode())
+
+    async def _send_event(self, data: bytes, more_body: bool = True):
+        if not self.streaming:
+            self.streaming = True
+            await self._send({"type": "http.response.start", "status": 200,
+                              "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")]})
+        await self._send({"type": "http.response.body", "body": b"event: message\ndata: " + data + b"\n\n",
+                          "more_body": more_body})
+
+    async def finish(self, content: bytes):
+        """ 已开始流式响应时，以最后一个事件发送工具调用结果（JSON-RPC 响应）并结束响应 """
+        self.close()
+        await self._send_event(content, more_body=False)
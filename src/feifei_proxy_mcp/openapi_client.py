@@ -0,0 +1,365 @@
+import asyncio
+import json
+import re
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote
+
+import httpx
+import mcp
+from jsonschema import Draft202012Validator
+
+from .enums import ProxyErrorCode
+from .http_client import SharedHttpClient
+from .logger import McpLogger
+from .mcp_exception import McpProxyError
+from .notification_relay import NotificationRelay
+from .tracing import span
+
+logger = McpLogger.get_logger()
+
+_HTTP_METHODS = ('get', 'put', 'post', 'delete', 'patch', 'head', 'options')
+
+# 请求体在工具参数中对应的字段名
+BODY_ARGUMENT = "body"
+
+# 健康检查探测 baseUrl 时视为上游不可用的状态码
+_GATEWAY_ERRORS = (502, 503, 504)
+
+
+def load_openapi_spec(spec_path: str) -> dict[str, Any]:
+    """ 读取本地 OpenAPI 文档，支持 json / yaml（yaml 需要额外安装 pyyaml） """
+    text = Path(spec_path).read_text(encoding="utf-8")
+    if spec_path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("pyyaml is required to load yaml openapi spec, please install it or use json") from None
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+def _resolve_refs(spec: dict[str, Any], node: Any, resolving: tuple[str, ...] = ()) -> Any:
+    """ 展开文档内的 $ref（#/components/...），循环引用处保留为不限制类型的 schema """
+    if isinstance(node, dict):
+        ref = node.get('$ref')
+        if isinstance(ref, str) and ref.startswith('#/'):
+            if ref in resolving:
+                return {}
+            target: Any = spec
+            for part in ref[2:].split('/'):
+                target = target[part.replace('~1', '/').replace('~0', '~')]
+            return _resolve_refs(spec, target, resolving + (ref,))
+        return {key: _resolve_refs(spec, value, resolving) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_resolve_refs(spec, item, resolving) for item in node]
+    return node
+
+
+class OpenApiOperation:
+    """ 单个 OpenAPI 接口编译后的工具：工具定义 + 预编译的参数校验器 + 请求构建信息 """
+
+    __slots__ = ('tool', 'method', 'path', 'path_params', 'query_params', 'header_params', 'has_body', 'validator')
+
+    def __init__(self, tool: mcp.types.Tool, method: str, path: str, path_params: list[str],
+                 query_params: list[str], header_params: list[str], has_body: bool):
+        self.tool = tool
+        self.method = method
+        self.path = path
+        self.path_params = path_params
+        self.query_params = query_params
+        self.header_params = header_params
+        self.has_body = has_body
+        self.validator = Draft202012Validator(tool.inputSchema)
+
+
+def _nullable_to_json_schema(node: Any) -> Any:
+    """
+    OpenAPI 3.0 的 nullable: true 不是 JSON Schema 关键字，转换为允许 null 的类型联合，
+    使工具参数定义与 JSON Schema 校验器（Draft 2020-12）语义一致
+    """
+    if isinstance(node, list):
+        return [_nullable_to_json_schema(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+    schema = {key: _nullable_to_json_schema(value) for key, value in node.items() if key != 'nullable'}
+    if node.get('nullable') is not True:
+        return schema
+    schema_type = schema.get('type')
+    if schema_type is None:
+        # 没有声明类型（allOf / oneOf 等组合）时整体与 null 取并集
+        return {"anyOf": [schema, {"type": "null"}]}
+    types = schema_type if isinstance(schema_type, list) else [schema_type]
+    if "null" not in types:
+        schema['type'] = [*types, "null"]
+    if 'enum' in schema and None not in schema['enum']:
+        schema['enum'] = [*schema['enum'], None]
+    return schema
+
+
+def _tool_name(method: str, path: str, operation: dict[str, Any]) -> str:
+    name = operation.get('operationId') or f"{method}_{path}"
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', name).strip('_')
+
+
+def compile_operations(spec: dict[str, Any]) -> dict[str, OpenApiOperation]:
+    """ 将 OpenAPI 文档中的每个接口编译为一个 mcp 工具，只在启动时执行一次 """
+    operations: dict[str, OpenApiOperation] = {}
+    for path, path_item in spec.get('paths', {}).items():
+        path_item = _resolve_refs(spec, path_item)
+        common_parameters = path_item.get('parameters', [])
+        for method in _HTTP_METHODS:
+            operation = path_item.get(method)
+            if operation is None:
+                continue
+
+            properties: dict[str, Any] = {}
+            required: list[str] = []
+            path_params, query_params, header_params = [], [], []
+            # 接口级参数覆盖路径级同名参数
+            parameters = {(p['name'], p.get('in')): p for p in [*common_parameters, *operation.get('parameters', [])]}
+            for (name, location), parameter in parameters.items():
+                if location == 'path':
+                    path_params.append(name)
+                elif location == 'query':
+                    query_params.append(name)
+                elif location == 'header':
+                    header_params.append(name)
+                else:
+                    continue
+                schema = _nullable_to_json_schema(parameter.get('schema', {}))
+                if parameter.get('description'):
+                    schema.setdefault('description', parameter['description'])
+                properties[name] = schema
+                if parameter.get('required') or location == 'path':
+                    required.append(name)
+
+            has_body = False
+            request_body = operation.get('requestBody')
+            if request_body:
+                content = request_body.get('content', {})
+                media = content.get('application/json') or next(iter(content.values()), {})
+                properties[BODY_ARGUMENT] = _nullable_to_json_schema(media.get('schema', {}))
+                has_body = True
+                if request_body.get('required'):
+                    required.append(BODY_ARGUMENT)
+
+            input_schema: dict[str, Any] = {"type": "object", "properties": properties}
+            if required:
+                input_schema["required"] = required
+
+            name = _tool_name(method, path, operation)
+            description = operation.get('description') or operation.get('summary') or f"{method.upper()} {path}"
+            tool = mcp.types.Tool(name=name, description=description, inputSchema=input_schema)
+            operations[name] = OpenApiOperation(tool, method.upper(), path, path_params, query_params,
+                                                header_params, has_body)
+    return operations
+
+
+class SharedOpenApiSpec:
+    """ 同一个 openapi 服务的所有会话共享的接口定义，文档只读取 / 编译一次；失败时下一个会话重新加载 """
+
+    def __init__(self, spec_path: str):
+        self.spec_path = spec_path
+        self._load_task: asyncio.Task | None = None
+
+    async def load(self) -> tuple[dict[str, Any], dict[str, OpenApiOperation]]:
+        """ 返回 (OpenAPI 文档, 编译后的接口)，并发调用只加载一次 """
+        if self._load_task is None or (self._load_task.done() and (self._load_task.cancelled()
+                                                                   or self._load_task.exception())):
+            self._load_task = asyncio.create_task(self._load())
+        return await asyncio.shield(self._load_task)
+
+    async def _load(self) -> tuple[dict[str, Any], dict[str, OpenApiOperation]]:
+        # 文档读取与编译只在启动时执行一次，放到线程中避免阻塞事件循环
+        spec = await asyncio.to_thread(load_openapi_spec, self.spec_path)
+        return spec, await asyncio.to_thread(compile_operations, spec)
+
+
+class OpenApiClientManager:
+    """
+    OpenAPI 客户端 将本地 OpenAPI 文档中的接口作为 mcp 工具提供，无需为每个 http 服务启动子进程
+    与 McpClientManager 提供相同的接口，由 McpClientPool 统一调度
+
+    "petstore": {
+      "transport": "openapi",
+      "specPath": "/data/petstore.json",     # 本地 OpenAPI 文档（json / yaml）
+      "baseUrl": "http://petstore:8080",     # 默认取文档中 servers[0].url
+      "headers": {"Authorization": "Bearer xxx"},
+      "timeout": 30,                         # 请求超时（秒）
+      "connectTimeout": 5,                   # 建立连接超时（秒）
+      "limits": {"maxConnections": 100, "maxKeepaliveConnections": 20, "keepaliveExpiry": 30},
+      "healthPath": "/health"                # 健康检查路径（相对 baseUrl），默认只探测 baseUrl 是否可达
+    }
+    超时与连接池配置见 SharedHttpClient
+
+    - 启动时读取文档并将每个接口编译为工具（operationId 作为工具名称），参数校验器预先编译，
+      连接池内的所有会话共享同一份编译结果（SharedOpenApiSpec）
+    - OpenAPI 3.0 的 nullable 转换为 JSON Schema 的 null 类型联合
+    - 路径 / 查询 / 请求头参数与请求体（body）合并为工具参数
+    - 所有工具调用复用同一个 keep-alive 连接池（连接池内的所有会话共享）
+    - HTTP 状态码 >= 400 时返回 isError 结果；连接失败 / 超时计入熔断
+    - 健康检查：最近没有成功的调用时主动探测（healthPath / baseUrl），上游恢复后无需等待流量即可恢复健康
+    """
+
+    def __init__(self, mcp_name: str, server_config: dict[str, Any], message_handler: Any = None,
+                 http_client: SharedHttpClient | None = None, spec: SharedOpenApiSpec | None = None):
+        self.mcp_name = mcp_name
+        self.server_config = server_config
+        self._owns_http_client: bool = http_client is None
+        self.http_client = http_client or SharedHttpClient(mcp_name, server_config)
+        self.spec = spec or SharedOpenApiSpec(server_config['specPath'])
+        self.health_path: str = server_config.get('healthPath', '')
+
+        self.operations: dict[str, OpenApiOperation] = {}
+        self.client: httpx.AsyncClient | None = None
+        self.session_initialized_response: mcp.types.InitializeResult | None = None
+        self._initialized: bool = False
+        self._closed: bool = False
+        self._done_callbacks: list[Callable[[], None]] = []
+
+        # 与 McpClientManager 一致的调度 / 健康状态信息
+        self.outstanding_requests: int = 0
+        self.last_used_time: float = time.monotonic()
+        self.last_success_time: float = 0.0
+        self.health_ok: bool = True
+
+        self._init_task = asyncio.create_task(self._initialize())
+
+    async def _initialize(self):
+        logger.info(f"======= Start to load OpenAPI spec for {self.mcp_name} ======")
+        try:
+            spec_path = self.spec.spec_path
+            spec, self.operations = await self.spec.load()
+
+            base_url = self.server_config.get('baseUrl') or next(
+                (server.get('url') for server in spec.get('servers', []) if server.get('url')), None)
+            if not base_url:
+                raise ValueError(f"baseUrl is not configured and openapi spec {spec_path} has no servers")
+
+            self.client = self.http_client.get(base_url=base_url, headers=self.server_config.get('headers', {}))
+
+            info = spec.get('info', {})
+            self.session_initialized_response = mcp.types.InitializeResult(
+                protocolVersion=mcp.types.LATEST_PROTOCOL_VERSION,
+                capabilities=mcp.types.ServerCapabilities(tools=mcp.types.ToolsCapability(listChanged=False)),
+                serverInfo=mcp.types.Implementation(name=info.get('title', self.mcp_name),
+                                                    version=str(info.get('version', '0.0.0'))),
+            )
+            self.last_success_time = time.monotonic()
+            self._initialized = True
+            logger.info(f"Server {self.mcp_name}: compiled {len(self.operations)} tools from {spec_path}, "
+                        f"base url: {base_url}")
+        except Exception as ex:
+            logger.warning("failed to init openapi server " + self.mcp_name + ", config: "
+                           + McpLogger.format_payload(self.server_config), exc_info=ex)
+            self._initialized = False
+
+    async def wait_for_initialization(self):
+        await asyncio.shield(self._init_task)
+
+    def get_initialized_response(self) -> mcp.types.InitializeResult:
+        return self.session_initialized_response
+
+    def is_alive(self) -> bool:
+        return self._initialized and not self._closed
+
+    def healthy(self) -> bool:
+        return self.is_alive() and self.health_ok
+
+    async def check_health(self, timeout: float, passive_window: float) -> bool:
+        """
+        健康检查：passive_window 秒内有成功的调用即视为健康（被动存活），
+        否则主动探测一次，上游恢复后即使没有流量也能重新变为健康
+        """
+        if not self.is_alive():
+            self.health_ok = False
+        elif time.monotonic() - self.last_success_time < passive_window:
+            self.health_ok = True
+        else:
+            self.health_ok = await self._probe(timeout)
+            if self.health_ok:
+                self.last_success_time = time.monotonic()
+        return self.health_ok
+
+    async def _probe(self, timeout: float) -> bool:
+        """
+        配置了 healthPath 时 GET 该路径，返回 2xx / 3xx 即视为可用；
+        否则 HEAD 请求 baseUrl 只探测可达性，除网关错误（502 / 503 / 504）外的任意响应（包括不支持 HEAD 的 405 / 501）均视为可用
+        """
+        try:
+            if self.health_path:
+                response = await self.client.request("GET", self.health_path, timeout=timeout)
+                return response.status_code < 400
+            response = await self.client.request("HEAD", "", timeout=timeout)
+        except httpx.HTTPError as e:
+            logger.debug(f"Server {self.mcp_name}: health probe failed: {e!r}")
+            return False
+        return response.status_code not in _GATEWAY_ERRORS
+
+    def supports(self, capability: str) -> bool:
+        """ OpenAPI 服务只提供工具 """
+        return capability == 'tools'
+
+    def add_done_callback(self, callback: Callable[[], None]):
+        self._done_callbacks.append(callback)
+
+    async def list_tools(self) -> list[mcp.types.Tool]:
+        if not self._initialized:
+            raise RuntimeError(f"Server {self.mcp_name} is not initialized")
+        return [operation.tool for operation in self.operations.values()]
+
+    async def execute_tool(self, tool_name: str, arguments: dict[str, Any],
+                           relay: NotificationRelay | None = None) -> mcp.types.CallToolResult:
+        """ 将工具调用转换为一次 http 请求 """
+        if self.client is None:
+            raise RuntimeError(f"Server {self.mcp_name} not initialized")
+
+        operation = self.operations.get(tool_name)
+        if operation is None:
+            return _error_result(f"Unknown tool: {tool_name}")
+        error = next(operation.validator.iter_errors(arguments), None)
+        if error is not None:
+            return _error_result(f"Invalid arguments for tool {tool_name}: {error.message}")
+
+        path = operation.path
+        for name in operation.path_params:
+            path = path.replace('{' + name + '}', quote(str(arguments[name]), safe=''))
+        params = {name: arguments[name] for name in operation.query_params if name in arguments}
+        headers = {name: str(arguments[name]) for name in operation.header_params if name in arguments}
+        body = arguments.get(BODY_ARGUMENT) if operation.has_body else None
+
+        try:
+            with span("upstream"):
+                response = await self.client.request(operation.method, path, params=params, headers=headers,
+                                                     json=body)
+        except httpx.TimeoutException as e:
+            self.health_ok = False
+            raise McpProxyError(ProxyErrorCode.UPSTREAM_UNAVAILABLE.value,
+                                f"Server {self.mcp_name} request timed out: {e!r}")
+        except httpx.TransportError as e:
+            self.health_ok = False
+            raise McpProxyError(ProxyErrorCode.UPSTREAM_UNAVAILABLE.value,
+                                f"Server {self.mcp_name} request failed: {e!r}")
+
+        self.last_success_time = time.monotonic()
+        self.health_ok = True
+        text = response.text
+        if response.is_error:
+            return _error_result(f"HTTP {response.status_code}: {text}")
+        return mcp.types.CallToolResult(content=[mcp.types.TextContent(type="text", text=text)])
+
+    async def cleanup(self) -> None:
+        self._closed = True
+        if not self._init_task.done():
+            self._init_task.cancel()
+        if self._owns_http_client:
+            await self.http_client.aclose()
+        for callback in self._done_callbacks:
+            callback()
+
+
+def _error_result(message: str) -> mcp.types.CallToolResult:
+    return mcp.types.CallToolResult(content=[mcp.types.TextContent(type="text", text=message)], isError=True)
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import re
+import secrets
+import sys
+from contextlib import asynccontextmanager
+from itertools import count
+from typing import Any
+
+import anyio
+import mcp
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from mcp.client.stdio import (PROCESS_TERMINATION_TIMEOUT, StdioServerParameters, _create_platform_compatible_process,
+                              _get_executable_command, _terminate_process_tree, get_default_environment)
+from mcp.shared.message import SessionMessage
+
+from .logger import McpLogger
+
+logger = McpLogger.get_logger()
+
+# 小于该大小的响应直接解析，用于识别 JSON-RPC 错误与 isError；更大的响应只做字节级匹配
+_PARSE_LIMIT = 64 * 1024
+# 响应中请求 ID 通常位于开头或结尾，先在首尾窗口内查找，找不到时再扫描整行
+_ID_WINDOW = 256
+_IS_ERROR_PATTERN = re.compile(rb'"isError"\s*:\s*true')
+
+
+def _connection_closed() -> mcp.McpError:
+    """ 与 ClientSession 一致，传输层断开时未完成的请求返回 Connection closed 错误 """
+    return mcp.McpError(mcp.types.ErrorData(code=mcp.types.CONNECTION_CLOSED, message="Connection closed"))
+
+
+class RawResponse:
+    """
+    上游的原始 JSON-RPC 响应（一行字节），只记录请求 ID 所在位置，替换为下游请求 ID 后原样返回给下游
+    """
+
+    __slots__ = ('line', 'id_span', '_classified', '_error_code')
+
+    def __init__(self, line: bytes, id_span: tuple[int, int]):
+        self.line = line
+        self.id_span = id_span
+        self._classified = False
+        self._error_code: str | None = None
+
+    def with_id(self, request_id: Any) -> bytes:
+        start, end = self.id_span
+        return b''.join((self.line[:start], b'"id":', json.dumps(request_id).encode(), self.line[end:]))
+
+    @property
+    def error_code(self) -> str | None:
+        """ 用于指标统计：JSON-RPC 错误码 / tool_error（isError），成功时为 None """
+        if not self._classified:
+            self._classified = True
+            if len(self.line) <= _PARSE_LIMIT:
+                message = json.loads(self.line)
+                if 'error' in message:
+                    self._error_code = str(message['error'].get('code'))
+                elif message.get('result', {}).get('isError'):
+                    self._error_code = "tool_error"
+            elif _IS_ERROR_PATTERN.search(self.line):
+                # 较大的 JSON-RPC 错误响应几乎不存在，只识别 isError
+                self._error_code = "tool_error"
+        return self._error_code
+
+
+class RawChannel:
+    """
+    原始 JSON-RPC 通道 与 ClientSession 共用同一个 stdio 子进程：
+
+    - 透传请求使用带随机标记的字符串 ID（raw-<token>-<seq>），与 ClientSession 的整数 ID 不会冲突
+    - 读取上游输出时，包含该标记的行按字节匹配到等待中的透传请求，不做 pydantic 解析
+    - 其余消息（初始化、ping、通知、ClientSession 发起的请求）照常解析后交给 ClientSession
+    - 透传请求被取消时向上游发送 notifications/cancelled（cancelUpstream 开启时）
+    """
+
+    def __init__(self, send_line):
+        self._send_line = send_line
+        self._token = secrets.token_hex(6).encode()
+        self._id_prefix = b'"raw-' + self._token + b'-'
+        self._id_pattern = re.compile(rb'"id"\s*:\s*"raw-' + self._token + rb'-(\d+)"')
+        self._seq = count(1)
+        self._pending: dict[int, asyncio.Future[RawResponse]] = {}
+        self._closed: bool = False
+        self._background_tasks: set[asyncio.Task] = set()
+        # 透传请求被取消时是否通知上游（mcp server 的 cancelUpstream 配置）
+        self.cancel_upstream: bool = False
+
+    async def request(self, method: str, params: dict[str, Any]) -> RawResponse:
+        if self._closed:
+            raise _connection_closed()
+        seq = next(self._seq)
+        future: asyncio.Future[RawResponse] = asyncio.get_running_loop().create_future()
+        self._pending[seq] = future
+        try:
+            line = b'{"jsonrpc":"2.0","id":"raw-%s-%d","method":%s,"params":%s}\n' % (
+                self._token, seq, json.dumps(method).encode(), json.dumps(params, ensure_ascii=False).encode())
+            await self._send_line(line)
+            return await future
+        except asyncio.CancelledError:
+            self._cancel(seq)
+            raise
+        finally:
+            self._pending.pop(seq, None)
+
+    def _cancel(self, seq: int):
+        if self._closed or not self.cancel_upstream:
+            return
+        line = b'{"jsonrpc":"2.0","method":"notifications/cancelled","params":{"requestId":"raw-%s-%d",' \
+               b'"reason":"cancelled by proxy"}}\n' % (self._token, seq)
+
+        async def send():
+            try:
+                await self._send_line(line)
+            except Exception as e:
+                logger.debug(f"failed to cancel upstream request raw-{self._token.decode()}-{seq}: {e}")
+
+        task = asyncio.create_task(send())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def dispatch(self, line: bytes) -> bool:
+        """ 尝试将一行上游输出匹配到透传请求，不是透传请求的响应时返回 False """
+        if self._id_prefix not in line:
+            return False
+        match = (self._id_pattern.search(line, 0, _ID_WINDOW)
+                 or self._id_pattern.search(line, max(0, len(line) - _ID_WINDOW))
+                 or self._id_pattern.search(line))
+        if match is None:
+            return False
+        future = self._pending.get(int(match.group(1)))
+        if future is not None and not future.done():
+            future.set_result(RawResponse(line, match.span()))
+        # 已取消的透传请求的响应直接丢弃
+        return True
+
+    def close(self):
+        self._closed = True
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(_connection_closed())
+
+
+@asynccontextmanager
+async def passthrough_stdio_client(server: StdioServerParameters, errlog=sys.stderr):
+    """
+    与 mcp.client.stdio.stdio_client 相同的子进程管理，额外返回 RawChannel 用于透传工具调用
+    """
+    read_stream_writer: MemoryObjectSendStream[SessionMessage | Exception]
+    read_stream: MemoryObjectReceiveStream[SessionMessage | Exception]
+    write_stream: MemoryObjectSendStream[SessionMessage]
+    write_stream_reader: MemoryObjectReceiveStream[SessionMessage]
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+
+    try:
+        process = await _create_platform_compatible_process(
+            command=_get_executable_command(server.command),
+            args=server.args,
+            env=({**get_default_environment(), **server.env} if server.env is not None else get_default_environment()),
+            errlog=errlog,
+            cwd=server.cwd,
+        )
+    except OSError:
+        for stream in (read_stream, write_stream, read_stream_writer, write_stream_reader):
+            await stream.aclose()
+        raise
+
+    write_lock = anyio.Lock()
+
+    async def send_line(line: bytes):
+        async with write_lock:
+            await process.stdin.send(line)
+
+    channel = RawChannel(send_line)
+
+    async def handle_line(line: bytes):
+        line = line.rstrip(b'\r')
+        if not line or channel.dispatch(line):
+            return
+        try:
+            message = mcp.types.JSONRPCMessage.model_validate_json(line)
+        except Exception as exc:
+            await read_stream_writer.send(exc)
+            return
+        await read_stream_writer.send(SessionMessage(message))
+
+    async def stdout_reader():
+        try:
+            async with read_stream_writer:
+                # 大响应分多块到达，按块暂存到换行时再拼接，避免反复拼接缓冲区
+                pending: list[bytes] = []
+                async for chunk in process.stdout:
+                    start = 0
+                    while (end := chunk.find(b'\n', start)) != -1:
+                        pending.append(chunk[start:end])
+                        line = b''.join(pending)
+                        pending = []
+                        await handle_line(line)
+                        start = end + 1
+                    if start < len(chunk):
+                        pending.append(chunk[start:])
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+        finally:
+            channel.close()
+
+    async def stdin_writer():
+        try:
+            async with write_stream_reader:
+                async for session_message in write_stream_reader:
+                    data = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
+                    await send_line((data + "\n").encode(encoding=server.encoding,
+                                                          errors=server.encoding_error_handler))
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+
+    async with anyio.create_task_group() as tg, process:
+        tg.start_soon(stdout_reader)
+        tg.start_soon(stdin_writer)
+        try:
+            yield read_stream, write_stream, channel
+        finally:
+            channel.close()
+            try:
+                await process.stdin.aclose()
+            except Exception:
+                pass
+            try:
+                with anyio.fail_after(PROCESS_TERMINATION_TIMEOUT):
+                    await process.wait()
+            except TimeoutError:
+                await _terminate_process_tree(process)
+            except ProcessLookupError:
+                pass
+            for stream in (read_stream, write_stream, read_stream_writer, write_stream_reader):
+                await stream.aclose()
+
+
+def parse_tool_call(body: bytes) -> tuple[Any, str, dict[str, Any]] | None:
+    """
+    下游请求体为单个 tools/call 请求且不需要进度通知时，返回 (请求 ID, 工具名称, 参数)，否则返回 None 走常规处理
+    """
+    try:
+        message = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or message.get('method') != 'tools/call' or 'id' not in message:
+        return None
+    params = message.get('params')
+    if not isinstance(params, dict) or not isinstance(params.get('name'), str):
+        return None
+    meta = params.get('_meta')
+    if isinstance(meta, dict) and meta.get('progressToken') is not None:
+        # 进度通知需要流式响应，交给常规处理
+        return None
+    arguments = params.get('arguments') or {}
+    if not isinstance(arguments, dict):
+        return None
+    return message['id'], params['name'], arguments
+
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+def replay_receive(body: bytes, receive):
+    """ 已读取的请求体交给常规处理时重新提供给下游的 receive """
+    replayed = False
+
+    async def wrapped():
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        return await receive()
+
+    return wrapped
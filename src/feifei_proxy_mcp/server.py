@@ -1,15 +1,28 @@
+import asyncio
 import json
+import logging
 import os
-import traceback
+import secrets
+import signal
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any
 
 import anyio
-from mcp import types
+from mcp import McpError, types
 from mcp.server import Server
+from mcp.server.lowlevel import NotificationOptions
+from mcp.server.session import ServerSession
 
-from .enums import McpTransportType
+from .enums import McpTransportType, ProxyErrorCode
+from .admission_control import AdmissionController
 from .logger import McpLogger
-from .mcp_client_manager import McpClientManager
+from .mcp_server_registry import McpServerRegistry
 from .mcp_exception import McpException
+from .notification_relay import NotificationRelay
+from .startup_timer import startup_timer
+from . import tracing
 
 logger = McpLogger.get_logger()
 
@@ -22,73 +35,609 @@ proxy_mcp_server_config: dict = {}
 # 代理的mcp名称
 proxy_mcp_name: str = ""
 
+# 工具调用结果缓存的内存预算（字节），所有开启缓存的工具共享
+result_cache_max_bytes: int = 64 * 1024 * 1024
+
+# 准入控制：全局最大并发工具调用数（0 表示不限制） / 最大排队请求数 / 最长排队时间（秒）
+max_concurrency: int = 0
+max_queue: int = 100
+queue_timeout: float = 30
+
+# 工具调用默认截止时间（秒），0 表示不限制；下游可通过请求头 X-Request-Timeout 缩短
+call_timeout: float = 0
+REQUEST_TIMEOUT_HEADER = "x-request-timeout"
+# 下游 http 请求（ASGI scope）上正在执行的工具调用，下游断开时取消
+DOWNSTREAM_CALLS_KEY = "feifei_proxy_mcp.downstream_calls"
+
+# 批量工具调用：单个批量请求的最大并发调用数 / 最大调用数
+batch_concurrency: int = 16
+batch_max_calls: int = 1000
+
+# 多进程模式：worker 进程数（共享监听端口，各自持有独立的上游会话） /
+# 上游持续不可用多少秒后重启当前 worker（0 表示不重启）
+workers: int = 1
+worker_restart_after: float = 300
+
+# 配置热更新：旧连接池等待进行中的调用完成的最长时间（秒） / 管理接口鉴权 token（为空时不开放管理接口）
+drain_timeout: float = 30
+admin_token: str = ""
+
+# 调用追踪：保留的最近 / 最慢调用数（0 表示关闭） / 慢调用阈值（毫秒，0 表示关闭） / 慢调用是否附带调用栈采样
+trace_buffer_size: int = 100
+trace_slow_ms: float = 0
+trace_profile: bool = False
+
+# streamable_http 有状态模式：保留会话状态，并通过有界内存事件存储支持断线续传（Last-Event-ID）
+stateful_http: bool = False
+event_store_max_bytes: int = 16 * 1024 * 1024
+event_store_max_events_per_stream: int = 1000
+
 # 代理的mcp server 实例
 proxy_mcp_server: Server
 
 # 定义代理版本
 mcp_proxy_version: str = "0.0.1"
 
-# mcp 客户端管理服务 McpClientManager 对应着连接/会话/工具调用等服务
-mcp_client_manager: McpClientManager = None
+# mcp server 注册中心 聚合 mcpServers 中的所有 mcp server，每个 mcp server 对应一个连接池 McpClientPool
+mcp_server_registry: McpServerRegistry = None
+
+# 代理初始化任务，启动预热与并发到达的请求共享同一个初始化过程，避免重复创建上游连接
+_init_task: asyncio.Task | None = None
+
+# 信号触发的配置热更新任务
+_reload_tasks: set[asyncio.Task] = set()
+
+# 多进程模式下的 worker 看门狗任务
+_watchdog_task: asyncio.Task | None = None
+
+# 已连接的下游会话，用于推送 notifications/tools/list_changed 等通知（会话结束后自动移除）
+downstream_sessions: weakref.WeakSet[ServerSession] = weakref.WeakSet()
+
+# 资源 uri -> 订阅了该资源的下游会话，用于推送 notifications/resources/updated
+resource_subscriptions: dict[str, weakref.WeakSet[ServerSession]] = {}
+
+
+class ProxyMcpServer(Server):
+    """ 代理mcp server 默认声明支持各类 list_changed 通知与资源订阅，由上游通知驱动推送给下游 """
+
+    def create_initialization_options(self, notification_options: NotificationOptions | None = None,
+                                      experimental_capabilities=None):
+        # streamable_http 会话管理器不传入通知参数，在这里统一设置默认值
+        return super().create_initialization_options(
+            notification_options or NotificationOptions(prompts_changed=True, resources_changed=True,
+                                                        tools_changed=True),
+            experimental_capabilities)
+
+    def get_capabilities(self, notification_options: NotificationOptions,
+                         experimental_capabilities) -> types.ServerCapabilities:
+        capabilities = super().get_capabilities(notification_options, experimental_capabilities)
+        if capabilities.resources is not None:
+            capabilities.resources.subscribe = True
+        return capabilities
 
 
 def startup():
     """ web应用启动入口 """
-    global transport_type, proxy_mcp_name, proxy_mcp_server_config, proxy_mcp_server
-
     logger.info("====== Start mcp proxy server application begin =======")
+    load_proxy_mcp_settings()
+    if workers == 1:
+        # 多进程模式下主进程只负责监听端口与管理 worker，代理由各 worker 进程在应用工厂中构建
+        build_proxy_mcp()
+
+    # 启动代理mcp server
+    start_proxy_mcp_server()
+
+    logger.info("======  Start mcp proxy server application end =======")
+
+
+def configure_proxy_mcp():
+    """ 读取环境变量与 mcp server 配置，构建代理mcp server（多进程模式下每个 worker 进程各执行一次） """
+    load_proxy_mcp_settings()
+    build_proxy_mcp()
+
+
+def load_proxy_mcp_settings():
+    """ 读取环境变量 """
+    global transport_type, proxy_mcp_name, result_cache_max_bytes
+    global max_concurrency, max_queue, queue_timeout, call_timeout, drain_timeout, admin_token
+    global batch_concurrency, batch_max_calls, workers, worker_restart_after
+    global trace_buffer_size, trace_slow_ms, trace_profile
+    global stateful_http, event_store_max_bytes, event_store_max_events_per_stream
+
+    startup_timer.mark("imports")
 
     # 1. 获取环境变量相关信息
     proxy_mcp_name = os.getenv("PROXY_MCP_NAME", "")
     transport_type = os.getenv("TRANSPORT_TYPE", McpTransportType.STREAMABLE_HTTP.value)
-    proxy_mcp_server_config_str = os.getenv("PROXY_MCP_SERVER_CONFIG", "")
-    if proxy_mcp_server_config_str:
-        proxy_mcp_server_config = json.loads(proxy_mcp_server_config_str)
-        # TODO mcp配置 参数 合法性校验，确保mcp配置参数正确 后续完善
-    else:
-        raise ValueError("PROXY_MCP_SERVER_CONFIG is empty, please check!")
+    result_cache_max_bytes = int(os.getenv("PROXY_MCP_RESULT_CACHE_MAX_BYTES", str(result_cache_max_bytes)))
+    max_concurrency = int(os.getenv("PROXY_MCP_MAX_CONCURRENCY", str(max_concurrency)))
+    max_queue = int(os.getenv("PROXY_MCP_MAX_QUEUE", str(max_queue)))
+    queue_timeout = float(os.getenv("PROXY_MCP_QUEUE_TIMEOUT", str(queue_timeout)))
+    call_timeout = float(os.getenv("PROXY_MCP_CALL_TIMEOUT", str(call_timeout)))
+    drain_timeout = float(os.getenv("PROXY_MCP_DRAIN_TIMEOUT", str(drain_timeout)))
+    batch_concurrency = int(os.getenv("PROXY_MCP_BATCH_CONCURRENCY", str(batch_concurrency)))
+    batch_max_calls = int(os.getenv("PROXY_MCP_BATCH_MAX_CALLS", str(batch_max_calls)))
+    admin_token = os.getenv("PROXY_MCP_ADMIN_TOKEN", "")
+    workers = max(1, int(os.getenv("PROXY_MCP_WORKERS", str(workers))))
+    worker_restart_after = float(os.getenv("PROXY_MCP_WORKER_RESTART_AFTER", str(worker_restart_after)))
+    stateful_http = os.getenv("PROXY_MCP_STATEFUL_HTTP", "false").lower() in ("1", "true", "yes")
+    event_store_max_bytes = int(os.getenv("PROXY_MCP_EVENT_STORE_MAX_BYTES", str(event_store_max_bytes)))
+    event_store_max_events_per_stream = int(os.getenv("PROXY_MCP_EVENT_STORE_MAX_EVENTS_PER_STREAM",
+                                                      str(event_store_max_events_per_stream)))
+    trace_buffer_size = int(os.getenv("PROXY_MCP_TRACE_BUFFER_SIZE", str(trace_buffer_size)))
+    trace_slow_ms = float(os.getenv("PROXY_MCP_TRACE_SLOW_MS", str(trace_slow_ms)))
+    trace_profile = os.getenv("PROXY_MCP_TRACE_PROFILE", "false").lower() in ("1", "true", "yes")
+    tracing.recorder.configure(trace_buffer_size, trace_slow_ms / 1000, trace_profile)
+
+    if workers > 1:
+        # 会话状态（sse 的 /messages/ 会话、有状态模式的会话与事件存储）只存在于单个 worker 进程中，
+        # 后续请求被分发到其他 worker 时会失败
+        if transport_type == McpTransportType.STDIO.value:
+            logger.warning("PROXY_MCP_WORKERS is ignored for stdio transport")
+            workers = 1
+        elif transport_type == McpTransportType.SSE.value:
+            raise ValueError("PROXY_MCP_WORKERS > 1 is not supported for sse transport, "
+                             "sse sessions only exist in one worker process, use streamable_http instead")
+        elif stateful_http:
+            raise ValueError("PROXY_MCP_WORKERS > 1 is not supported with PROXY_MCP_STATEFUL_HTTP, "
+                             "sessions and the event store only exist in one worker process")
+
+
+def build_proxy_mcp():
+    """ 读取 mcp server 配置，构建代理mcp server """
+    global proxy_mcp_server_config, proxy_mcp_server
+
+    proxy_mcp_server_config = load_proxy_mcp_server_config()
+
+    startup_timer.mark("config")
 
     # 初始化代理mcp server实例
-    proxy_mcp_server = Server("feifei-proxy-mcp")
+    proxy_mcp_server = ProxyMcpServer("feifei-proxy-mcp")
 
     logger.info(f"init proxy server,"
                 f"transport_type: {transport_type}, "
                 f"proxy_mcp_name: {proxy_mcp_name}, "
-                f"proxy_mcp_server_config: {proxy_mcp_server_config}, "
+                f"proxy_mcp_server_config: {McpLogger.format_payload(proxy_mcp_server_config)}, "
                 f"version: {mcp_proxy_version}")
 
     # 构建代理mcp server
     create_proxy_mcp_server()
+    startup_timer.mark("proxy server")
 
-    # 启动代理mcp server
-    start_proxy_mcp_server()
 
-    logger.info("======  Start mcp proxy server application end =======")
+def load_proxy_mcp_server_config() -> dict:
+    """ 读取 mcp server 配置：优先读取 PROXY_MCP_SERVER_CONFIG_FILE 指向的文件（热更新时重新读取），其次 PROXY_MCP_SERVER_CONFIG """
+    config_file = os.getenv("PROXY_MCP_SERVER_CONFIG_FILE", "")
+    if config_file:
+        with open(config_file, encoding="utf-8") as f:
+            return validate_proxy_mcp_server_config(json.load(f))
+    proxy_mcp_server_config_str = os.getenv("PROXY_MCP_SERVER_CONFIG", "")
+    if proxy_mcp_server_config_str:
+        return validate_proxy_mcp_server_config(json.loads(proxy_mcp_server_config_str))
+    raise ValueError("PROXY_MCP_SERVER_CONFIG is empty, please check!")
+
+
+# 各传输类型必填的字符串参数
+_REQUIRED_SERVER_KEYS = {
+    McpTransportType.STDIO.value: "command",
+    McpTransportType.SSE.value: "url",
+    McpTransportType.STREAMABLE_HTTP.value: "url",
+    McpTransportType.OPENAPI.value: "specPath",
+}
+
+
+def validate_proxy_mcp_server_config(config: Any) -> dict:
+    """ 校验 mcp server 配置的结构与各传输类型的必填参数，不合法时抛出 ValueError，启动 / 热更新前即可发现配置错误 """
+    if not isinstance(config, dict) or not isinstance(config.get('mcpServers'), dict) or not config['mcpServers']:
+        raise ValueError("mcpServers must be contain at least one mcp server configuration")
+    for mcp_name, server_config in config['mcpServers'].items():
+        if not isinstance(server_config, dict):
+            raise ValueError(f"mcp server {mcp_name}: configuration must be an object")
+        transport = server_config.get('transport', McpTransportType.STDIO.value)
+        if transport not in _REQUIRED_SERVER_KEYS:
+            raise ValueError(f"mcp server {mcp_name}: unsupported transport {transport!r}, "
+                             f"expected one of {', '.join(_REQUIRED_SERVER_KEYS)}")
+        required = _REQUIRED_SERVER_KEYS[transport]
+        if not isinstance(server_config.get(required), str) or not server_config[required]:
+            raise ValueError(f"mcp server {mcp_name}: {required} is required for {transport} transport")
+        for key, expected, description in (('args', list, "a list"), ('env', dict, "an object"),
+                                           ('headers', dict, "an object"), ('tools', dict, "an object")):
+            if key in server_config and not isinstance(server_config[key], expected):
+                raise ValueError(f"mcp server {mcp_name}: {key} must be {description}")
+    return config
 
 
 def create_proxy_mcp_server():
-    """ 创建 代理mcp server 服务， 目前仅提供 tool能力，prompt, resource暂不进行支持 """
-
-    @proxy_mcp_server.call_tool()
-    async def call_tool(name: str, arguments: dict
-                        ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
-        """ 工具调用 """
-        logger.info(f"calling tool: {name}, arguments: {arguments}")
-
-        if mcp_client_manager:
-            if not await init_proxy_mcp():
-                raise NameError(f"failed to init proxy mcp: {proxy_mcp_name}")
-        result = await mcp_client_manager.execute_tool(tool_name=name, arguments=arguments)
-        return result.content
+    """ 创建 代理mcp server 服务，提供 tool / resource / prompt 能力 """
+
+    async def call_tool(req: types.CallToolRequest) -> types.ServerResult:
+        """
+        工具调用，直接注册为 tools/call 请求处理器而不使用 @call_tool() 装饰器：
+        - 上游的 CallToolResult 原样透传（保留 structuredContent / isError）
+        - McpError（熔断 / 上游不可用 / 上游返回的 JSON-RPC 错误）以 JSON-RPC error 返回给下游
+        - 上游的进度 / 日志通知实时转发给当前下游请求
+        - 下游取消请求（notifications/cancelled）或超过截止时间时，取消上游调用
+        """
+        name = req.params.name
+        arguments = req.params.arguments or {}
+        if logger.isEnabledFor(logging.INFO) and McpLogger.sampled():
+            logger.info(f"calling tool: {name}, arguments: {McpLogger.format_payload(arguments)}")
+        remember_downstream_session()
+
+        downstream_request = proxy_mcp_server.request_context.request
+        with tracing.traced_call(name, getattr(downstream_request, "scope", None)):
+            try:
+                if not await init_proxy_mcp():
+                    raise NameError(f"failed to init proxy mcp: {proxy_mcp_name}")
+                relay = NotificationRelay.from_request_context(proxy_mcp_server.request_context, req)
+                with downstream_call_scope(downstream_request) as cancel_scope:
+                    result = await mcp_server_registry.execute_tool(
+                        tool_name=name, arguments=arguments, relay=relay,
+                        timeout=requested_timeout(getattr(downstream_request, "headers", None)))
+                if cancel_scope.cancelled_caught:
+                    logger.debug(f"downstream disconnected, tool call cancelled: {name}")
+                    raise McpError(types.ErrorData(code=ProxyErrorCode.REQUEST_CANCELLED.value,
+                                                   message="Request cancelled"))
+            except McpError:
+                raise
+            except Exception as e:
+                return types.ServerResult(
+                    types.CallToolResult(content=[types.TextContent(type="text", text=str(e))], isError=True))
+            return types.ServerResult(result)
+
+    proxy_mcp_server.request_handlers[types.CallToolRequest] = call_tool
 
     @proxy_mcp_server.list_tools()
     async def list_tools() -> list[types.Tool]:
         """ 返回所有可用工具 """
+        remember_downstream_session()
         return await proxy_mcp_tools()
 
+    @proxy_mcp_server.list_resources()
+    async def list_resources() -> list[types.Resource]:
+        return await (await proxy_mcp_registry()).list_resources()
+
+    @proxy_mcp_server.list_resource_templates()
+    async def list_resource_templates() -> list[types.ResourceTemplate]:
+        return await (await proxy_mcp_registry()).list_resource_templates()
+
+    async def read_resource(req: types.ReadResourceRequest) -> types.ServerResult:
+        """ 资源读取，直接注册为 resources/read 请求处理器，上游的 ReadResourceResult 原样透传 """
+        registry = await proxy_mcp_registry()
+        return types.ServerResult(await registry.read_resource(str(req.params.uri)))
+
+    proxy_mcp_server.request_handlers[types.ReadResourceRequest] = read_resource
+
+    @proxy_mcp_server.subscribe_resource()
+    async def subscribe_resource(uri) -> None:
+        """ 记录下游订阅，并向上游订阅；上游不支持订阅时不会收到更新通知 """
+        registry = await proxy_mcp_registry()
+        resource_subscriptions.setdefault(str(uri), weakref.WeakSet()).add(proxy_mcp_server.request_context.session)
+        await registry.subscribe_resource(str(uri))
+
+    @proxy_mcp_server.unsubscribe_resource()
+    async def unsubscribe_resource(uri) -> None:
+        # 上游订阅保留，用于资源读取缓存的失效，不再推送给该下游会话
+        sessions = resource_subscriptions.get(str(uri))
+        if sessions is not None:
+            sessions.discard(proxy_mcp_server.request_context.session)
+
+    @proxy_mcp_server.list_prompts()
+    async def list_prompts() -> list[types.Prompt]:
+        return await (await proxy_mcp_registry()).list_prompts()
+
+    @proxy_mcp_server.get_prompt()
+    async def get_prompt(name: str, arguments: dict[str, str] | None) -> types.GetPromptResult:
+        return await (await proxy_mcp_registry()).get_prompt(name, arguments)
+
     return proxy_mcp_server
 
 
+async def proxy_mcp_registry() -> McpServerRegistry:
+    """ 资源 / 提示词请求入口：记录下游会话并等待代理初始化完成 """
+    remember_downstream_session()
+    if not await init_proxy_mcp():
+        raise McpException(msg=f"failed to initialize proxy MCP server {proxy_mcp_name}")
+    return mcp_server_registry
+
+
+def requested_timeout(headers) -> float | None:
+    """ 下游通过请求头指定的截止时间（秒），stdio 模式没有请求头 """
+    value = headers.get(REQUEST_TIMEOUT_HEADER) if headers is not None else None
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        logger.debug(f"invalid {REQUEST_TIMEOUT_HEADER} header: {value}")
+        return None
+
+
+def passthrough_enabled() -> bool:
+    """ 无状态模式下，开启了 passthrough 的 mcp server 的工具调用直接透传上游响应字节（随配置热更新变化） """
+    return not stateful_http and any(
+        config.get('passthrough') for config in proxy_mcp_server_config.get('mcpServers', {}).values())
+
+
+def cancel_on_disconnect(scope, receive):
+    """
+    http 下游（streamable_http）断开时取消该请求上正在执行的工具调用：
+    mcp 的 http 传输在下游断开后只关闭响应流，工具调用会继续执行到结束，
+    这里在 receive 收到 http.disconnect 时取消 downstream_call_scope 登记的调用
+    """
+    calls: set[anyio.CancelScope] = set()
+    scope[DOWNSTREAM_CALLS_KEY] = calls
+
+    async def wrapped():
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            for cancel_scope in calls:
+                cancel_scope.cancel()
+        return message
+
+    return wrapped
+
+
+@contextmanager
+def downstream_call_scope(request):
+    """ 将工具调用登记到下游 http 请求上，下游断开时取消；stdio / sse 下游没有登记入口，调用不受影响 """
+    calls = getattr(request, "scope", {}).get(DOWNSTREAM_CALLS_KEY)
+    with anyio.CancelScope() as cancel_scope:
+        if calls is None:
+            yield cancel_scope
+            return
+        calls.add(cancel_scope)
+        try:
+            yield cancel_scope
+        finally:
+            calls.discard(cancel_scope)
+
+
+def remember_downstream_session():
+    """ 记录当前请求所属的下游会话 """
+    try:
+        downstream_sessions.add(proxy_mcp_server.request_context.session)
+    except LookupError:
+        pass
+
+
+def proxy_initialization_options():
+    """ 代理mcp server 初始化参数，声明支持 tools / resources / prompts 的 list_changed 通知 """
+    return proxy_mcp_server.create_initialization_options()
+
+
+async def notify_downstream_tools_changed():
+    """ 上游工具目录变更后，通知所有下游会话重新拉取工具列表 """
+    for session in list(downstream_sessions):
+        try:
+            await session.send_tool_list_changed()
+        except Exception as e:
+            # 下游会话已断开
+            logger.debug(f"failed to notify downstream session tools changed: {e}")
+            downstream_sessions.discard(session)
+
+
+async def notify_downstream_resources(notification):
+    """ 将上游的资源更新 / 资源列表变更 / 提示词列表变更通知推送给下游会话 """
+    if isinstance(notification, types.ResourceUpdatedNotification):
+        uri = notification.params.uri
+        sessions = list(resource_subscriptions.get(str(uri), ()))
+        send = lambda session: session.send_resource_updated(uri)  # noqa: E731
+    elif isinstance(notification, types.ResourceListChangedNotification):
+        sessions = list(downstream_sessions)
+        send = lambda session: session.send_resource_list_changed()  # noqa: E731
+    elif isinstance(notification, types.PromptListChangedNotification):
+        sessions = list(downstream_sessions)
+        send = lambda session: session.send_prompt_list_changed()  # noqa: E731
+    else:
+        return
+
+    for session in sessions:
+        try:
+            await send(session)
+        except Exception as e:
+            # 下游会话已断开
+            logger.debug(f"failed to notify downstream session {notification.method}: {e}")
+            downstream_sessions.discard(session)
+            for subscribers in resource_subscriptions.values():
+                subscribers.discard(session)
+
+
+async def handle_metrics(request):
+    """ Prometheus 指标采集接口 """
+    from starlette.responses import Response
+    from .metrics import CONTENT_TYPE, render_metrics
+
+    return Response(render_metrics(mcp_server_registry), media_type=CONTENT_TYPE)
+
+
+async def handle_health(request):
+    """ 存活检查：进程与事件循环可以正常响应即视为存活，不访问上游 """
+    from starlette.responses import JSONResponse
+
+    return JSONResponse({"status": "ok", "pid": os.getpid()})
+
+
+async def handle_ready(request):
+    """ 就绪检查：读取缓存的上游健康状态，任意一个 mcp server 健康即视为就绪 """
+    from starlette.responses import JSONResponse
+
+    if mcp_server_registry is None:
+        return JSONResponse({"status": "starting", "pid": os.getpid()}, status_code=503)
+    ready = mcp_server_registry.healthy()
+    # 多进程模式下每个 worker 持有独立的上游会话，pid 标识本次响应的 worker
+    return JSONResponse({"status": "ready" if ready else "unavailable", "pid": os.getpid(),
+                         "servers": mcp_server_registry.health_status()},
+                        status_code=200 if ready else 503)
+
+
+async def handle_batch(request):
+    """
+    批量工具调用 POST /batch：一次 http 请求并发执行多个工具调用，省去逐个调用的 http 请求与 mcp 会话开销
+    结果按完成顺序流式返回，默认为 NDJSON（每行一个结果），请求头 Accept 为 text/event-stream 时以 SSE 返回
+    """
+    from contextlib import aclosing
+    from starlette.responses import JSONResponse, StreamingResponse
+    from .batch import parse_batch_calls, run_batch
+
+    try:
+        calls, requested_concurrency = parse_batch_calls(await request.body(), batch_max_calls)
+    except ValueError as e:
+        return JSONResponse({"error": f"invalid batch request: {e}"}, status_code=400)
+    if not await init_proxy_mcp():
+        return JSONResponse({"error": f"failed to init proxy mcp: {proxy_mcp_name}"}, status_code=503)
+
+    # 下游指定的并发数不能超过 PROXY_MCP_BATCH_CONCURRENCY，调用同样经过准入控制
+    concurrency = min(requested_concurrency or batch_concurrency, batch_concurrency)
+    timeout = requested_timeout(request.headers)
+    logger.info(f"batch calling {len(calls)} tools, concurrency: {concurrency}")
+
+    async def execute(tool: str, arguments: dict) -> types.CallToolResult:
+        with tracing.traced_call(tool):
+            return await mcp_server_registry.execute_tool(tool_name=tool, arguments=arguments, timeout=timeout)
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        line_format, media_type = "data: %s\n\n", "text/event-stream"
+    else:
+        line_format, media_type = "%s\n", "application/x-ndjson"
+
+    async def stream():
+        # 下游断开时响应迭代被取消，aclosing 确保立即取消尚未完成的调用
+        async with aclosing(run_batch(execute, calls, concurrency)) as results:
+            async for line in results:
+                yield line_format % line
+
+    return StreamingResponse(stream(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+async def handle_admin_reload(request):
+    """
+    配置热更新接口 POST /admin/reload，需携带请求头 Authorization: Bearer <PROXY_MCP_ADMIN_TOKEN>
+    请求体为新的 mcp server 配置（json），为空时重新读取配置（同 SIGHUP）
+    """
+    from starlette.responses import JSONResponse
+
+    authorization = request.headers.get("authorization", "").encode()
+    if not secrets.compare_digest(authorization, f"Bearer {admin_token}".encode()):
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    if workers > 1:
+        # 请求只会到达其中一个 worker，各 worker 的配置会不一致
+        return JSONResponse({"error": "reload via admin api is not supported with multiple workers, "
+                                      "send SIGHUP to worker processes instead"}, status_code=409)
+    body = await request.body()
+    try:
+        config = validate_proxy_mcp_server_config(json.loads(body)) if body.strip() else None
+    except ValueError as e:
+        return JSONResponse({"error": f"invalid config: {e}"}, status_code=400)
+    try:
+        diff = await reload_proxy_mcp(config)
+    except Exception as e:
+        logger.warning("failed to reload mcp server configuration", exc_info=e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+    return JSONResponse({"status": "reloaded", **diff})
+
+
+async def handle_admin_traces(request):
+    """
+    调用追踪接口 GET /admin/traces，鉴权同 /admin/reload
+    返回当前进程最近 / 最慢的工具调用及各阶段耗时，用于定位慢调用的耗时来自代理自身还是上游
+    """
+    from starlette.responses import JSONResponse
+
+    authorization = request.headers.get("authorization", "").encode()
+    if not secrets.compare_digest(authorization, f"Bearer {admin_token}".encode()):
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    return JSONResponse({"pid": os.getpid(), **tracing.recorder.snapshot()})
+
+
+def admin_routes() -> list:
+    """ 配置了 PROXY_MCP_ADMIN_TOKEN 时才开放管理接口 """
+    from starlette.routing import Route
+
+    if not admin_token:
+        return []
+    return [Route("/admin/reload", endpoint=handle_admin_reload, methods=["POST"]),
+            Route("/admin/traces", endpoint=handle_admin_traces, methods=["GET"])]
+
+
+async def handle_tool_call(scope, receive, send):
+    """
+    无状态模式下工具调用的快速路径：单个 tools/call 请求不经过 mcp 的会话管理器
+    （会话管理器为每个请求创建传输层、服务端会话与多个任务组，是代理额外延迟的主要来源），
+    直接调用注册中心并以 JSON 返回结果，上游在调用过程中推送日志通知时改为 SSE 流式响应；
+    开启了 passthrough 的 mcp server，上游响应以原始字节返回，仅替换请求 ID，响应大小不再影响代理的 CPU 开销。
+    已处理时返回 None，否则返回可重新读取请求体的 receive 交给常规处理
+    """
+    from starlette.datastructures import Headers
+    from starlette.responses import Response
+    from .notification_relay import HttpResponseRelay
+    from .passthrough import parse_tool_call, read_body, replay_receive
+
+    body = await read_body(receive)
+    headers = Headers(scope=scope)
+    accept = headers.get("accept", "")
+    if "application/json" not in accept or "application/json" not in headers.get("content-type", ""):
+        return replay_receive(body, receive)
+    tool_call = parse_tool_call(body)
+    if tool_call is None:
+        return replay_receive(body, receive)
+    request_id, name, arguments = tool_call
+
+    if logger.isEnabledFor(logging.INFO) and McpLogger.sampled():
+        logger.info(f"calling tool: {name}, arguments: {McpLogger.format_payload(arguments)}")
+    # 下游不接受 SSE 时不转发通知
+    relay = HttpResponseRelay(send, request_id) if "text/event-stream" in accept else None
+    with tracing.traced_call(name, scope):
+        try:
+            if not await init_proxy_mcp():
+                raise NameError(f"failed to init proxy mcp: {proxy_mcp_name}")
+            # 请求体已读取完，之后只会收到 http.disconnect：下游先断开时取消上游调用
+            # 上游调用在独立的任务中执行，复制当前上下文，各层的 span 计入本次调用
+            call = asyncio.ensure_future(call_tool_direct(request_id, name, arguments, relay,
+                                                          requested_timeout(headers)))
+            disconnect = asyncio.ensure_future(receive())
+            try:
+                await asyncio.wait([call, disconnect], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                disconnect.cancel()
+                if not call.done():
+                    call.cancel()
+                    await asyncio.gather(call, return_exceptions=True)
+            if call.cancelled():
+                logger.debug(f"downstream disconnected, tool call cancelled: {name}")
+                return None
+            content = call.result()
+        except McpError as e:
+            content = types.JSONRPCError(jsonrpc="2.0", id=request_id, error=e.error).model_dump_json(
+                by_alias=True, exclude_none=True).encode()
+        except Exception as e:
+            content = jsonrpc_result(request_id, types.CallToolResult(
+                content=[types.TextContent(type="text", text=str(e))], isError=True))
+
+    if relay is not None and relay.streaming:
+        await relay.finish(content)
+    else:
+        await Response(content, media_type="application/json")(scope, receive, send)
+    return None
+
+
+async def call_tool_direct(request_id: types.RequestId, name: str, arguments: dict, relay,
+                           timeout: float | None) -> bytes:
+    """ 快速路径的工具调用，返回 JSON-RPC 响应字节；passthrough 不适用（未开启 / 工具配置了缓存等）时走常规调用 """
+    if passthrough_enabled():
+        raw = await mcp_server_registry.execute_tool_raw(tool_name=name, arguments=arguments, timeout=timeout)
+        if raw is not None:
+            return raw.with_id(request_id)
+    result = await mcp_server_registry.execute_tool(tool_name=name, arguments=arguments, relay=relay, timeout=timeout)
+    return jsonrpc_result(request_id, result)
+
+
+def jsonrpc_result(request_id: types.RequestId, result: types.CallToolResult) -> bytes:
+    """ 与 mcp server 相同的方式序列化工具调用结果 """
+    return types.JSONRPCResponse(jsonrpc="2.0", id=request_id, result=result.model_dump(
+        by_alias=True, mode="json", exclude_none=True)).model_dump_json(by_alias=True, exclude_none=True).encode()
+
+
 def start_proxy_mcp_server():
     """ 启动代理mcp服务器 """
     match transport_type:
@@ -97,150 +646,335 @@ def start_proxy_mcp_server():
             from mcp.server.stdio import stdio_server
 
             async def arun():
-                async with stdio_server() as streams:
-                    await proxy_mcp_server.run(
-                        streams[0], streams[1], proxy_mcp_server.create_initialization_options()
-                    )
-                # 异步调度
-                anyio.run(arun)
-
-            logger.info("======= STDIO Proxy mcp Application Started ======")
-
-        case McpTransportType.SSE.value:
-            # sse mcp server
-            from mcp.server.sse import SseServerTransport
-            from contextlib import asynccontextmanager
-            from collections.abc import AsyncIterator
-            from starlette.routing import Route, Mount
-            from fastapi import FastAPI
-
-            sse_transport = SseServerTransport("/messages/")
-
-            async def handle_sse(request):
-                async with sse_transport.connect_sse(request.scope,
-                                                     request.receive, request._send) as streams:
-                    await proxy_mcp_server.run(streams[0], streams[1],
-                                                 proxy_mcp_server.create_initialization_options())
-
-            @asynccontextmanager
-            async def sse_lifespan(app: FastAPI) -> AsyncIterator[None]:
-                """ 上下文会话管理 """
+                prewarm_proxy_mcp()
+                install_reload_signal_handler()
                 try:
-                    if not await init_proxy_mcp():
-                        raise McpException("failed to init mcp server")
-                    yield
-                    await mcp_client_manager.cleanup()
+                    async with stdio_server() as streams:
+                        await proxy_mcp_server.run(
+                            streams[0], streams[1], proxy_initialization_options()
+                        )
                 finally:
-                    logger.info("Application shutting down...")
-
-            # 构建fastapi web程序
-            sse_app = FastAPI(
-                debug=True,
-                routes=[
-                    Route("/sse", endpoint=handle_sse, methods=["GET"]),
-                    Mount("/messages/", app=sse_transport.handle_post_message),
-                ],
-                lifespan=sse_lifespan,
-            )
-
-            import uvicorn
-
-            uvicorn.run(sse_app, host="0.0.0.0", port=int(os.getenv("PROXY_MCP_PORT", "8000")))
-            logger.info("======= SSE Proxy mcp Application Started ======")
-            return
+                    await shutdown_proxy_mcp()
 
-        case McpTransportType.STREAMABLE_HTTP.value:
-            from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
-            from starlette.types import Scope
-            from starlette.types import Receive
-            from starlette.types import Send
-
-            from mcp.server.sse import SseServerTransport
-            from fastapi import FastAPI
-            from starlette.routing import Mount
-            from contextlib import asynccontextmanager
-            from collections.abc import AsyncIterator
-
-            session_manager = StreamableHTTPSessionManager(
-                app=proxy_mcp_server,
-                event_store=None,
-                json_response=False,
-                stateless=True,  # 设置为无状态
-            )
-
-            sse_transport = SseServerTransport("/messages/")
-
-            async def handle_streamable_http(
-                    scope: Scope, receive: Receive, send: Send
-            ) -> None:
-                await session_manager.handle_request(scope, receive, send)
-
-            @asynccontextmanager
-            async def streamable_lifespan(app: FastAPI) -> AsyncIterator[None]:
-                """ 上下文会话管理 """
-                logger.info("Starting session manager...")
-                async with session_manager.run():
-                    logger.info("Session manager started successfully")
-
-                    try:
-                        if not await init_proxy_mcp():
-                            raise McpException("failed to init_proxy_mcp")
-                        yield
-                    except Exception as e:
-                        logger.error(f"Error during MCP initialization: {e}")
-                        logger.error(f"Traceback: {traceback.format_exc()}")
-                        raise McpException(f"failed to init_proxy_mcp: {e}")
-                    finally:
-                        logger.info("Application shutting down...")
-                        await mcp_client_manager.cleanup()
-
-            # 启动web应用
-            streamable_app = FastAPI(
-                debug=True,
-                routes=[
-                    Mount("/mcp", app=handle_streamable_http),
-                    Mount("/messages/", app=sse_transport.handle_post_message),  # 兼容sse模式
-                ],
-                lifespan=streamable_lifespan,
-            )
+            logger.info("======= STDIO Proxy mcp Application Started ======")
+            # 异步调度
+            anyio.run(arun)
 
+        case McpTransportType.SSE.value | McpTransportType.STREAMABLE_HTTP.value:
             import uvicorn
-            uvicorn.run(streamable_app, host="0.0.0.0", port=int(os.getenv("PROXY_MCP_PORT", "8000")))
+
+            port = int(os.getenv("PROXY_MCP_PORT", "8000"))
+            if workers > 1:
+                # 多进程：uvicorn 主进程监听端口，每个 worker 进程通过应用工厂独立构建代理与上游会话，
+                # worker 异常退出时由主进程重新拉起，不影响其他 worker
+                logger.info(f"======= Proxy mcp Application Started with {workers} workers ======")
+                uvicorn.run("feifei_proxy_mcp.server:create_app", factory=True, workers=workers,
+                            host="0.0.0.0", port=port)
+                return
+            app = create_web_app()
+            startup_timer.mark("web app")
+            uvicorn.run(app, host="0.0.0.0", port=port)
 
         case _:
             raise ValueError("Invalid MCP_TRANSPORT_TYPE")
 
 
-async def init_proxy_mcp() -> bool:
-    global proxy_mcp_server_config, mcp_client_manager
-
-    # 如果代理mcp已经在运行中，则不需要再次构建连接
-    if mcp_client_manager:
-        return True
+def create_app():
+    """ 多进程模式的应用工厂，uvicorn 在每个 worker 进程中调用 """
+    configure_proxy_mcp()
+    app = create_web_app()
+    startup_timer.mark("web app")
+    return app
+
+
+def create_web_app():
+    """ 构建 sse / streamable_http 代理的 web 应用 """
+    if transport_type == McpTransportType.SSE.value:
+        return _create_sse_app()
+    if transport_type == McpTransportType.STREAMABLE_HTTP.value:
+        return _create_streamable_http_app()
+    raise ValueError("Invalid MCP_TRANSPORT_TYPE")
+
+
+def _create_sse_app():
+    """ sse mcp server """
+    from mcp.server.sse import SseServerTransport
+    from contextlib import asynccontextmanager
+    from collections.abc import AsyncIterator
+    from starlette.applications import Starlette
+    from starlette.routing import Route, Mount
+
+    sse_transport = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        async with sse_transport.connect_sse(request.scope,
+                                             request.receive, request._send) as streams:
+            await proxy_mcp_server.run(streams[0], streams[1],
+                                         proxy_initialization_options())
+
+    @asynccontextmanager
+    async def sse_lifespan(app: Starlette) -> AsyncIterator[None]:
+        """ 上下文会话管理 """
+        startup_timer.mark("web server")
+        prewarm_proxy_mcp()
+        install_reload_signal_handler()
+        start_worker_watchdog()
+        try:
+            yield
+        finally:
+            logger.info("Application shutting down...")
+            await shutdown_proxy_mcp()
+
+    # 构建web程序（使用 Starlette 而非 FastAPI，减少冷启动时的导入耗时）
+    sse_app = Starlette(
+        debug=True,
+        routes=[
+            Route("/sse", endpoint=handle_sse, methods=["GET"]),
+            Route("/metrics", endpoint=handle_metrics, methods=["GET"]),
+            Route("/health", endpoint=handle_health, methods=["GET"]),
+            Route("/ready", endpoint=handle_ready, methods=["GET"]),
+            Route("/batch", endpoint=handle_batch, methods=["POST"]),
+            *admin_routes(),
+            Mount("/messages/", app=sse_transport.handle_post_message),
+        ],
+        lifespan=sse_lifespan,
+    )
+
+    return sse_app
+
+
+def _create_streamable_http_app():
+    """ streamable_http mcp server """
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.types import Scope
+    from starlette.types import Receive
+    from starlette.types import Send
+
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.routing import Mount, Route
+    from contextlib import asynccontextmanager
+    from collections.abc import AsyncIterator
+
+    # 默认无状态；有状态模式下复用会话，并保留最近的事件供客户端断线后续传
+    if stateful_http:
+        from .event_store import RingBufferEventStore, SessionScopedManager
+        # 每个会话使用独立的事件存储视图，会话结束时释放
+        session_manager = SessionScopedManager(
+            app=proxy_mcp_server,
+            event_store=RingBufferEventStore(max_events_per_stream=event_store_max_events_per_stream,
+                                             max_bytes=event_store_max_bytes),
+            json_response=False,
+            stateless=False,
+        )
+    else:
+        session_manager = StreamableHTTPSessionManager(
+            app=proxy_mcp_server,
+            json_response=False,
+            stateless=True,
+        )
+
+    sse_transport = SseServerTransport("/messages/")
+
+    async def handle_streamable_http(
+            scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["method"] != "POST":
+            await session_manager.handle_request(scope, receive, send)
+            return
+        tracing.begin_request(scope)
+        try:
+            if not stateful_http:
+                receive = await handle_tool_call(scope, receive, send)
+                if receive is None:
+                    return
+            await session_manager.handle_request(scope, cancel_on_disconnect(scope, receive), send)
+        finally:
+            # 响应已发送，结束该请求上的调用追踪（记录响应序列化与发送耗时）
+            tracing.end_request(scope)
+
+    @asynccontextmanager
+    async def streamable_lifespan(app: Starlette) -> AsyncIterator[None]:
+        """ 上下文会话管理 """
+        startup_timer.mark("web server")
+        # 上游会话在后台预热，web 服务无需等待即可开始监听；初始化完成前 /ready 返回 503，
+        # 提前到达的请求等待同一个初始化任务
+        prewarm_proxy_mcp()
+        install_reload_signal_handler()
+        start_worker_watchdog()
+        logger.info("Starting session manager...")
+        async with session_manager.run():
+            logger.info("Session manager started successfully")
+            try:
+                yield
+            finally:
+                logger.info("Application shutting down...")
+                await shutdown_proxy_mcp()
+
+    # 启动web应用（使用 Starlette 而非 FastAPI，减少冷启动时的导入耗时）
+    streamable_app = Starlette(
+        debug=True,
+        routes=[
+            Mount("/mcp", app=handle_streamable_http),
+            Route("/metrics", endpoint=handle_metrics, methods=["GET"]),
+            Route("/health", endpoint=handle_health, methods=["GET"]),
+            Route("/ready", endpoint=handle_ready, methods=["GET"]),
+            Route("/batch", endpoint=handle_batch, methods=["POST"]),
+            *admin_routes(),
+            Mount("/messages/", app=sse_transport.handle_post_message),  # 兼容sse模式
+        ],
+        lifespan=streamable_lifespan,
+    )
+
+    return streamable_app
+
+
+def prewarm_proxy_mcp():
+    """ 在后台初始化上游会话与工具目录，与 web 服务启动并行进行 """
+    global _init_task
+    if _init_task is None:
+        _init_task = asyncio.ensure_future(_init_proxy_mcp())
+        _init_task.add_done_callback(_on_prewarm_done)
+
+
+def _on_prewarm_done(task: asyncio.Task):
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.error("failed to prewarm proxy mcp, retry on first request", exc_info=task.exception())
+
+
+async def shutdown_proxy_mcp():
+    """ 取消未完成的初始化，关闭所有上游连接 """
+    if _watchdog_task is not None:
+        _watchdog_task.cancel()
+    if _init_task is not None and not _init_task.done():
+        _init_task.cancel()
+        await asyncio.gather(_init_task, return_exceptions=True)
+    if mcp_server_registry is not None:
+        await mcp_server_registry.cleanup()
+
+
+async def reload_proxy_mcp(config: dict | None = None) -> dict[str, list[str]]:
+    """ 配置热更新，未传入配置时重新读取配置；返回新增 / 变更 / 移除 / 未变化的 mcp server """
+    global proxy_mcp_server_config
+    config = load_proxy_mcp_server_config() if config is None else validate_proxy_mcp_server_config(config)
+    try:
+        await init_proxy_mcp()
+    except Exception as e:
+        # 当前配置无法初始化（如配置不合法），直接使用新配置重新初始化
+        logger.warning(f"current configuration failed to initialize, initialize with new configuration: {e}")
+        proxy_mcp_server_config = config
+        await init_proxy_mcp()
+        return {"added": list(config.get('mcpServers', {})), "changed": [], "removed": [], "unchanged": []}
+    diff = await mcp_server_registry.reload(config, drain_timeout=drain_timeout)
+    proxy_mcp_server_config = config
+    return diff
+
+
+def install_reload_signal_handler():
+    """ 收到 SIGHUP 时重新读取配置并热更新（windows 没有 SIGHUP） """
+    if not hasattr(signal, "SIGHUP"):
+        return
+    asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _reload_on_signal)
+
+
+def _reload_on_signal():
+    logger.info("received SIGHUP, reload mcp server configuration")
+    task = asyncio.ensure_future(reload_proxy_mcp())
+    _reload_tasks.add(task)
+    task.add_done_callback(_on_reload_done)
+
+
+def _on_reload_done(task: asyncio.Task):
+    _reload_tasks.discard(task)
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.error("failed to reload mcp server configuration", exc_info=task.exception())
+
+
+def start_worker_watchdog():
+    """ 多进程模式下，上游持续不可用超过 PROXY_MCP_WORKER_RESTART_AFTER 秒时退出当前 worker，由 uvicorn 主进程重新拉起 """
+    global _watchdog_task
+    if workers > 1 and worker_restart_after > 0 and _watchdog_task is None:
+        _watchdog_task = asyncio.ensure_future(_worker_watchdog())
+
+
+async def _worker_watchdog():
+    unhealthy_since: float | None = None
+    interval = min(5.0, worker_restart_after / 4)
+    while True:
+        await asyncio.sleep(interval)
+        if mcp_server_registry is not None and mcp_server_registry.healthy():
+            unhealthy_since = None
+            continue
+        now = time.monotonic()
+        if unhealthy_since is None:
+            unhealthy_since = now
+        elif now - unhealthy_since >= worker_restart_after:
+            # 与收到 SIGTERM 相同，正常关闭上游会话后退出
+            logger.error(f"worker {os.getpid()}: upstream unavailable for {worker_restart_after}s, restart worker")
+            os.kill(os.getpid(), signal.SIGTERM)
+            return
 
-    # 创建mcp客户端连接
-    tmp_mcp_client_manager = McpClientManager(mcp_server_config=proxy_mcp_server_config)
 
-    # 等待 mcp客户端连接 + 初始化完成
-    await tmp_mcp_client_manager.wait_for_initialization()
+async def init_proxy_mcp() -> bool:
+    global _init_task
 
-    # 健康检查
-    if await tmp_mcp_client_manager.healthy():
-        mcp_client_manager = tmp_mcp_client_manager
-        # 获取mcp server相关服务版本信息
-        init_result = mcp_client_manager.get_initialized_response()
-        version = getattr(getattr(init_result, 'serverInfo', None), 'version', "1.0.0")
-        proxy_mcp_server.version = version
+    # 如果代理mcp已经在运行中，则不需要再次构建连接
+    if mcp_server_registry:
         return True
 
+    # 首次初始化或上一次初始化失败时发起初始化，并发请求等待同一个初始化任务
+    if _init_task is None or _init_task.done():
+        _init_task = asyncio.ensure_future(_init_proxy_mcp())
+    return await asyncio.shield(_init_task)
+
+
+async def _init_proxy_mcp() -> bool:
+    global mcp_server_registry
+
+    # 创建所有 mcp server 的客户端连接池 并发等待 mcp客户端连接 + 初始化完成
+    admission_controller = AdmissionController(max_concurrency=max_concurrency, max_queue=max_queue,
+                                               queue_timeout=queue_timeout)
+    tmp_mcp_server_registry = McpServerRegistry(mcp_server_config=proxy_mcp_server_config,
+                                                 result_cache_max_bytes=result_cache_max_bytes,
+                                                 admission_controller=admission_controller,
+                                                 call_timeout=call_timeout)
+    try:
+        started = await tmp_mcp_server_registry.start()
+        startup_timer.mark("upstream sessions")
+        if started:
+            # 就绪前预先加载聚合工具目录，首个 tools/list 请求无需等待上游
+            await tmp_mcp_server_registry.list_tools()
+            startup_timer.mark("tool catalog")
+    except BaseException:
+        await tmp_mcp_server_registry.cleanup()
+        raise
+
+    # 启动失败的 mcp server 同样保留连接池，由连接池巡检任务按退避策略在后台重连，恢复前 /ready 返回 503
+    mcp_server_registry = tmp_mcp_server_registry
+    mcp_server_registry.add_tools_changed_listener(notify_downstream_tools_changed)
+    mcp_server_registry.add_notification_listener(notify_downstream_resources)
+    if started and mcp_server_registry.healthy():
+        summary = startup_timer.finish()
+        if summary:
+            logger.info(f"====== proxy mcp is ready, {summary} ======")
     else:
-        return False
+        logger.error(f"====== proxy mcp {proxy_mcp_name} is not ready, reconnect upstream in background ======")
+
+    # 获取mcp server相关服务版本信息，聚合多个 mcp server 时使用代理版本
+    init_result = mcp_server_registry.get_initialized_response()
+    version = getattr(getattr(init_result, 'serverInfo', None), 'version', mcp_proxy_version)
+    proxy_mcp_server.version = version
+    return True
 
 
 async def proxy_mcp_tools() -> list[types.Tool]:
     if await init_proxy_mcp():
         try:
-            return await mcp_client_manager.list_tools()
+            return await mcp_server_registry.list_tools()
         except (KeyError, Exception) as e:
             logger.warning("failed to list tools for proxy mcp server: " + proxy_mcp_name, exc_info=e)
             return []
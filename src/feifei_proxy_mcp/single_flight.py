@@ -0,0 +1,64 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+
+class _Flight:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters: int = 0
+
+
+class SingleFlight:
+    """
+    相同请求合并 同一时刻参数完全相同的工具调用只向上游发送一次，所有调用方共享同一个结果
+
+    "tools": {
+      "fetch": {"coalesce": true}
+    }
+
+    - 只合并正在进行中的请求，请求完成后立即移除，不会返回过期数据（与结果缓存相互独立）
+    - 所有调用方都取消后，上游请求随之取消
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, _Flight] = {}
+
+        # 统计信息
+        self.leaders: int = 0  # 实际发往上游的请求数
+        self.coalesced: int = 0  # 被合并的请求数
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # shield：单个调用方取消不影响其他调用方
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _finish(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # 所有调用方都已取消时，避免 "exception was never retrieved" 警告
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
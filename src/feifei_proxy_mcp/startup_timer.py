@@ -0,0 +1,34 @@
+import time
+
+
+class StartupTimer:
+    """
+    启动耗时统计 记录从包导入开始到代理就绪的各阶段耗时，就绪后输出一行汇总日志，便于排查冷启动慢的原因
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.stages: list[tuple[str, float]] = []
+        self.finished: bool = False
+
+    def mark(self, stage: str):
+        """ 记录上一个阶段结束到当前的耗时 """
+        if self.finished:
+            return
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def finish(self) -> str | None:
+        """ 结束统计并返回汇总信息，重复调用时返回 None """
+        if self.finished:
+            return None
+        self.finished = True
+        total = (self._last - self.started) * 1000
+        breakdown = ", ".join(f"{stage}: {elapsed * 1000:.0f}ms" for stage, elapsed in self.stages)
+        return f"startup took {total:.0f}ms ({breakdown})"
+
+
+# 在包导入时创建，第一个阶段即包含依赖导入耗时
+startup_timer = StartupTimer()
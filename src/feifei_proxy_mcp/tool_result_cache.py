@@ -0,0 +1,124 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any
+
+import mcp
+
+from .logger import McpLogger
+
+logger = McpLogger.get_logger()
+
+
+def canonical_arguments_hash(arguments: dict[str, Any]) -> str:
+    """ 工具参数的规范化哈希：键排序 + 紧凑序列化，参数顺序不同但内容相同的调用得到相同哈希 """
+    canonical = json.dumps(arguments, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def tool_call_key(mcp_name: str, tool_name: str, arguments: dict[str, Any]) -> tuple[str, str, str]:
+    """ 工具调用的唯一标识：mcp server 名称 + 工具名称 + 参数规范化哈希 """
+    return mcp_name, tool_name, canonical_arguments_hash(arguments)
+
+
+class _CacheEntry:
+    __slots__ = ('result', 'size', 'expire_at')
+
+    def __init__(self, result: mcp.types.Result, size: int, expire_at: float):
+        self.result = result
+        self.size = size
+        self.expire_at = expire_at
+
+
+class ToolResultCache:
+    """
+    工具调用结果缓存 按工具开启，适用于纯函数 / 变化缓慢的查询类工具
+
+    "fetch": {
+      "command": "uvx",
+      "args": ["mcp-server-fetch"],
+      "tools": {
+        "fetch": {"cacheTtl": 60}    # 开启 fetch 工具的结果缓存，有效期 60 秒
+      }
+    }
+
+    - 缓存键为 mcp server 名称 + 工具名称 + 参数规范化哈希
+    - 所有工具共享同一个内存预算（PROXY_MCP_RESULT_CACHE_MAX_BYTES），超出预算时按 LRU 淘汰
+    - isError 的结果永远不会被缓存
+    - 资源读取结果（resourceCacheTtl）同样缓存在这里，共享同一个内存预算
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes: int = 0
+        self._entries: OrderedDict[tuple[str, str, str], _CacheEntry] = OrderedDict()
+
+        # 统计信息
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def get(self, key: tuple[str, str, str]) -> mcp.types.Result | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.monotonic() >= entry.expire_at:
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.result
+
+    def put(self, key: tuple[str, str, str], result: mcp.types.Result, ttl: float):
+        if getattr(result, 'isError', False) or ttl <= 0:
+            return
+
+        size = len(result.model_dump_json(by_alias=True, exclude_none=True))
+        if size > self.max_bytes:
+            logger.debug(f"tool result of {key[0]}/{key[1]} is too large to cache: {size} bytes")
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _CacheEntry(result, size, time.monotonic() + ttl)
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: tuple[str, str, str]):
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry.size
+
+    def invalidate(self, key: tuple[str, str, str]) -> bool:
+        if key not in self._entries:
+            return False
+        self._remove(key)
+        return True
+
+    def invalidate_server(self, mcp_name: str) -> int:
+        """ 失效某个 mcp server 的所有缓存（配置热更新后该 mcp server 的上游已替换） """
+        keys = [key for key in self._entries if key[0] == mcp_name]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,268 @@
+import heapq
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from typing import Any
+
+from .logger import McpLogger
+
+logger = McpLogger.get_logger()
+
+# 下游 http 请求（ASGI scope）的开始时间 / 该请求上等待响应发送完成的调用追踪
+REQUEST_STARTED_KEY = "feifei_proxy_mcp.request_started"
+_REQUEST_TRACES_KEY = "feifei_proxy_mcp.request_traces"
+
+_current_trace: ContextVar["Trace | None"] = ContextVar("feifei_proxy_mcp_trace", default=None)
+
+
+class Trace:
+    """
+    单次工具调用的分阶段耗时（秒），阶段：
+    - request：下游 http 请求到达至工具调用处理器开始（请求解析 / 校验 / 会话分发）
+    - route / admission / acquire：路由 / 准入控制排队 / 等待可用上游会话
+    - upstream：上游往返（含发送排队、上游执行与响应解析）
+    - response：工具调用处理器结束至响应发送完成（响应序列化与发送）
+    """
+
+    __slots__ = ('tool', 'started', 'started_at', 'handler_ended', 'ended', 'spans', 'attributes', 'profile')
+
+    def __init__(self, tool: str, started: float | None = None):
+        now = time.perf_counter()
+        self.tool = tool
+        self.started = started if started is not None else now
+        self.started_at = time.time() - (now - self.started)
+        self.handler_ended: float | None = None
+        self.ended: float | None = None
+        self.spans: dict[str, float] = {}
+        if started is not None:
+            self.spans["request"] = now - started
+        self.attributes: dict[str, Any] = {}
+        self.profile: list[tuple[str, int]] | None = None
+
+    def add_span(self, stage: str, elapsed: float):
+        self.spans[stage] = self.spans.get(stage, 0.0) + elapsed
+
+    @property
+    def duration(self) -> float:
+        return (self.ended or time.perf_counter()) - self.started
+
+    def to_dict(self) -> dict[str, Any]:
+        duration = self.duration
+        data: dict[str, Any] = {
+            "tool": self.tool,
+            "startedAt": round(self.started_at, 3),
+            "durationMs": round(duration * 1000, 3),
+            "spansMs": {stage: round(elapsed * 1000, 3) for stage, elapsed in self.spans.items()},
+            "unaccountedMs": round((duration - sum(self.spans.values())) * 1000, 3),
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.profile is not None:
+            data["profile"] = [{"stack": stack, "samples": samples} for stack, samples in self.profile]
+        return data
+
+
+class SamplingProfiler:
+    """
+    采样分析 有调用进行中时，后台线程按固定间隔采样事件循环线程的调用栈；
+    慢调用结束时汇总其执行期间的采样，用于定位代理自身的开销（如大响应的 JSON 解析 / pydantic 校验），
+    事件循环空闲（等待上游）时采样到的是 selector 的等待
+    """
+
+    def __init__(self, interval: float = 0.005, max_samples: int = 20000, max_depth: int = 40):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._samples: deque[tuple[float, str]] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self._active: int = 0
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._target_thread_id: int | None = None
+
+    def acquire(self):
+        """ 调用开始，在事件循环线程中调用 """
+        self._active += 1
+        if self._thread is None:
+            self._target_thread_id = threading.get_ident()
+            self._thread = threading.Thread(target=self._run, name="proxy-trace-profiler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def release(self):
+        self._active -= 1
+        if self._active <= 0:
+            self._active = 0
+            self._wakeup.clear()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is not None:
+                stack = self._collapse(frame)
+                with self._lock:
+                    self._samples.append((time.perf_counter(), stack))
+            del frame
+            time.sleep(self.interval)
+
+    def _collapse(self, frame) -> str:
+        """ 折叠调用栈（根在前），只保留最内层的 max_depth 帧 """
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def samples_between(self, start: float, end: float, top: int = 10) -> list[tuple[str, int]]:
+        with self._lock:
+            samples = list(self._samples)
+        return Counter(stack for at, stack in samples if start <= at <= end).most_common(top)
+
+
+class TraceRecorder:
+    """
+    调用追踪记录 最近 N 次与最慢 N 次调用保存在有界内存中，供 /admin/traces 查询
+
+    PROXY_MCP_TRACE_BUFFER_SIZE   保留的最近 / 最慢调用数，0 表示关闭追踪
+    PROXY_MCP_TRACE_SLOW_MS       慢调用阈值（毫秒），超过时输出告警日志并调用慢调用钩子，0 表示关闭
+    PROXY_MCP_TRACE_PROFILE       开启采样分析，慢调用附带其执行期间事件循环线程的调用栈采样
+    """
+
+    def __init__(self):
+        self.size: int = 0
+        self.slow_threshold: float = 0.0
+        self.profiler: SamplingProfiler | None = None
+        self._recent: deque[Trace] = deque(maxlen=1)
+        # 最小堆，堆顶为已保留的最慢调用中最快的一个
+        self._slowest: list[tuple[float, int, Trace]] = []
+        self._seq = count()
+        self._slow_call_hooks: list[Callable[[Trace], None]] = []
+
+    def configure(self, size: int, slow_threshold: float = 0.0, profile: bool = False):
+        self.size = max(0, size)
+        self.slow_threshold = slow_threshold
+        self._recent = deque(maxlen=max(1, self.size))
+        self._slowest = []
+        if profile and self.enabled and slow_threshold > 0 and self.profiler is None:
+            self.profiler = SamplingProfiler()
+        if slow_threshold > 0 and _log_slow_call not in self._slow_call_hooks:
+            self._slow_call_hooks.append(_log_slow_call)
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def add_slow_call_hook(self, hook: Callable[[Trace], None]):
+        """ 注册慢调用钩子，如接入外部分析工具 """
+        self._slow_call_hooks.append(hook)
+
+    def start(self, tool: str, started: float | None = None) -> Trace | None:
+        if not self.enabled:
+            return None
+        if self.profiler is not None:
+            self.profiler.acquire()
+        return Trace(tool, started)
+
+    def finish(self, trace: Trace):
+        trace.ended = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.release()
+
+        self._recent.append(trace)
+        item = (trace.duration, next(self._seq), trace)
+        if len(self._slowest) < self.size:
+            heapq.heappush(self._slowest, item)
+        else:
+            heapq.heappushpop(self._slowest, item)
+
+        if 0 < self.slow_threshold <= trace.duration:
+            if self.profiler is not None:
+                trace.profile = self.profiler.samples_between(trace.started, trace.ended)
+            for hook in self._slow_call_hooks:
+                try:
+                    hook(trace)
+                except Exception as e:
+                    logger.warning(f"slow call hook failed: {e}")
+
+    def snapshot(self) -> dict[str, list[dict[str, Any]]]:
+        return {
+            "recent": [trace.to_dict() for trace in reversed(self._recent)],
+            "slowest": [trace.to_dict() for _, _, trace in sorted(self._slowest, reverse=True)],
+        }
+
+
+def _log_slow_call(trace: Trace):
+    spans = ", ".join(f"{stage}: {elapsed * 1000:.1f}ms" for stage, elapsed in trace.spans.items())
+    logger.warning(f"slow tool call {trace.tool}: {trace.duration * 1000:.1f}ms ({spans})")
+
+
+# 进程内唯一的追踪记录，在 server.startup 中按环境变量配置
+recorder = TraceRecorder()
+
+
+@contextmanager
+def traced_call(tool: str, scope: dict[str, Any] | None = None):
+    """
+    追踪一次工具调用，作用域内各层的 span 计入该调用；
+    下游为 http 请求（scope 由 begin_request 标记）时，在响应发送完成后（end_request）结束追踪
+    """
+    started = scope.get(REQUEST_STARTED_KEY) if scope is not None else None
+    trace = recorder.start(tool, started)
+    if trace is None:
+        yield None
+        return
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        if started is not None:
+            trace.handler_ended = time.perf_counter()
+            scope.setdefault(_REQUEST_TRACES_KEY, []).append(trace)
+        else:
+            recorder.finish(trace)
+
+
+@contextmanager
+def span(stage: str):
+    """ 记录当前调用某个阶段的耗时，没有进行中的追踪时不做任何事 """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(stage, time.perf_counter() - started)
+
+
+def annotate(**attributes: Any):
+    """ 为当前调用附加属性（mcp server 名称 / 错误码等） """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def begin_request(scope: dict[str, Any]):
+    """ 标记下游 http 请求开始 """
+    if recorder.enabled:
+        scope[REQUEST_STARTED_KEY] = time.perf_counter()
+
+
+def end_request(scope: dict[str, Any]):
+    """ 下游 http 请求处理完成（响应已发送），结束该请求上的调用追踪 """
+    traces = scope.pop(_REQUEST_TRACES_KEY, None)
+    if not traces:
+        return
+    now = time.perf_counter()
+    for trace in traces:
+        trace.add_span("response", now - trace.handler_ended)
+        recorder.finish(trace)
@@ -0,0 +1,250 @@
+"""
+代理性能基准测试 完全离线运行，用于在升级依赖 / 修改代码前发现性能回退
+
+使用 fake_mcp_server.py 作为上游，分别测量：
+  direct  客户端直接调用上游 mcp server
+  proxy   客户端经由代理（streamable_http）调用同一个上游 mcp server
+输出吞吐量、p50 / p99 延迟、错误数，以及代理带来的额外延迟
+
+cd src && python -m tests.benchmark_proxy --transport all --clients 16 --requests 200 --latency 0.005
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+FAKE_SERVER = Path(__file__).with_name("fake_mcp_server.py")
+SRC_DIR = Path(__file__).resolve().parent.parent
+
+TRANSPORTS = ("stdio", "sse", "streamable_http")
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def summary(self) -> str:
+        mean = statistics.fmean(self.latencies) if self.latencies else 0.0
+        return (f"{self.name:<28} {len(self.latencies):>7} calls {self.errors:>5} errors "
+                f"{self.throughput:>9.1f} req/s  mean {mean * 1000:>8.2f}ms  "
+                f"p50 {self.percentile(0.5) * 1000:>8.2f}ms  p99 {self.percentile(0.99) * 1000:>8.2f}ms")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _fake_server_args(args: argparse.Namespace, transport: str, port: int) -> list[str]:
+    return [str(FAKE_SERVER), "--transport", transport, "--port", str(port),
+            "--latency", str(args.latency), "--payload-size", str(args.payload_size),
+            "--error-rate", str(args.error_rate)]
+
+
+async def _wait_http_ready(url: str, process: subprocess.Popen, timeout: float = 60):
+    """ 等待 http 服务开始监听 """
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise TimeoutError(f"{url} is not ready after {timeout}s")
+
+
+@asynccontextmanager
+async def _client_session(transport: str, target: Any):
+    """ 按传输类型建立一个客户端会话，target 为 stdio 启动参数或 url """
+    if transport == "stdio":
+        context = stdio_client(target)
+    elif transport == "sse":
+        context = sse_client(target)
+    else:
+        context = streamablehttp_client(target)
+    async with context as streams:
+        async with ClientSession(streams[0], streams[1]) as session:
+            await session.initialize()
+            yield session
+
+
+class _StartGate:
+    """ 所有客户端完成初始化与预热后同时开始计时 """
+
+    def __init__(self, clients: int):
+        self.clients = clients
+        self.ready: int = 0
+        self.all_ready = asyncio.Event()
+        self.start = asyncio.Event()
+
+    async def arrive(self):
+        self.ready += 1
+        if self.ready == self.clients:
+            self.all_ready.set()
+        await self.start.wait()
+
+
+async def _run_client(transport: str, target: Any, tool_name: str, args: argparse.Namespace,
+                      gate: _StartGate, result: BenchmarkResult):
+    async with _client_session(transport, target) as session:
+        for _ in range(args.warmup):
+            await session.call_tool(tool_name, {"text": "warmup"})
+        await gate.arrive()
+        for i in range(args.requests):
+            started = time.perf_counter()
+            try:
+                response = await session.call_tool(tool_name, {"text": str(i)})
+            except Exception:
+                result.errors += 1
+                continue
+            if response.isError:
+                result.errors += 1
+            result.latencies.append(time.perf_counter() - started)
+
+
+async def run_load(name: str, transport: str, target: Any, args: argparse.Namespace,
+                   tool_name: str = "echo") -> BenchmarkResult:
+    """ clients 个客户端各自建立会话并发调用工具 """
+    result = BenchmarkResult(name=name)
+    gate = _StartGate(args.clients)
+    tasks = [asyncio.create_task(_run_client(transport, target, tool_name, args, gate, result))
+             for _ in range(args.clients)]
+
+    # 任意客户端提前失败时直接抛出异常，不再等待其他客户端
+    ready = asyncio.create_task(gate.all_ready.wait())
+    await asyncio.wait([ready, *tasks], return_when=asyncio.FIRST_COMPLETED)
+    if not ready.done():
+        ready.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks)
+
+    started = time.perf_counter()
+    gate.start.set()
+    await asyncio.gather(*tasks)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _proxy_pool_size(transport: str, args: argparse.Namespace) -> int:
+    """
+    代理到上游的会话数，未指定时与直连保持一致：
+    stdio 直连时每个客户端各自启动一个上游进程，代理同样为每个客户端准备一个会话；远程传输直连与代理都只有一个上游进程
+    """
+    if args.pool_size is not None:
+        return args.pool_size
+    return args.clients if transport == "stdio" else 1
+
+
+async def benchmark_transport(transport: str, args: argparse.Namespace) -> tuple[BenchmarkResult, BenchmarkResult]:
+    processes: list[subprocess.Popen] = []
+    try:
+        # 上游
+        if transport == "stdio":
+            upstream_config = {"command": sys.executable, "args": _fake_server_args(args, "stdio", 0)}
+            direct_target = StdioServerParameters(command=sys.executable, args=upstream_config["args"])
+        else:
+            port = _free_port()
+            upstream = subprocess.Popen([sys.executable, *_fake_server_args(args, transport, port)],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            processes.append(upstream)
+            path = "/sse" if transport == "sse" else "/mcp"
+            direct_target = f"http://127.0.0.1:{port}{path}"
+            await _wait_http_ready(f"http://127.0.0.1:{port}/", upstream)
+            upstream_config = {"transport": transport, "url": direct_target}
+        pool_size = _proxy_pool_size(transport, args)
+        if pool_size > 1:
+            upstream_config["pool"] = {"minSize": pool_size, "maxSize": pool_size}
+
+        # 代理
+        proxy_port = _free_port()
+        env = dict(os.environ,
+                   TRANSPORT_TYPE="streamable_http",
+                   PROXY_MCP_PORT=str(proxy_port),
+                   PROXY_MCP_SERVER_CONFIG=json.dumps({"mcpServers": {"fake": upstream_config}}),
+                   PROXY_MCP_LOG_LEVEL=os.getenv("PROXY_MCP_LOG_LEVEL", "WARNING"),
+                   PYTHONPATH=os.pathsep.join(filter(None, [str(SRC_DIR), os.getenv("PYTHONPATH")])))
+        proxy = subprocess.Popen([sys.executable, "-m", "feifei_proxy_mcp"], env=env,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        processes.append(proxy)
+        await _wait_http_ready(f"http://127.0.0.1:{proxy_port}/metrics", proxy)
+
+        direct = await run_load(f"{transport} direct", transport, direct_target, args)
+        proxied = await run_load(f"{transport} via proxy", "streamable_http",
+                                 f"http://127.0.0.1:{proxy_port}/mcp", args)
+        return direct, proxied
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    transports = TRANSPORTS if args.transport == "all" else (args.transport,)
+    print(f"clients={args.clients} requests/client={args.requests} latency={args.latency}s "
+          f"payload={args.payload_size}B error_rate={args.error_rate}")
+
+    for transport in transports:
+        print(f"{transport}: proxy pool_size={_proxy_pool_size(transport, args)}")
+        direct, proxied = await benchmark_transport(transport, args)
+        print(direct.summary())
+        print(proxied.summary())
+        print(f"{'proxy overhead':<28} p50 {(proxied.percentile(0.5) - direct.percentile(0.5)) * 1000:+.2f}ms  "
+              f"p99 {(proxied.percentile(0.99) - direct.percentile(0.99)) * 1000:+.2f}ms  "
+              f"throughput {(proxied.throughput / direct.throughput - 1) * 100 if direct.throughput else 0:+.1f}%")
+        print()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="feifei-proxy-mcp benchmark")
+    parser.add_argument("--transport", choices=[*TRANSPORTS, "all"], default="all", help="上游 mcp server 传输类型")
+    parser.add_argument("--clients", type=int, default=8, help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=100, help="每个客户端的工具调用次数")
+    parser.add_argument("--warmup", type=int, default=5, help="每个客户端计时前的预热调用次数")
+    parser.add_argument("--latency", type=float, default=0.0, help="上游每次工具调用的处理耗时（秒）")
+    parser.add_argument("--payload-size", type=int, default=128, help="上游返回的文本大小（字节）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="上游返回 isError 结果的概率")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="代理到上游的会话数（pool.minSize / maxSize），默认 stdio 与客户端数相同、其余为 1")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
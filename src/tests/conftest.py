@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    """ 异步用例只在 asyncio 上运行，被测组件直接使用 asyncio 的任务与 Future """
+    return "asyncio"
+
+
+class FakeClock:
+    """ 可手动拨动的 time.monotonic，用于熔断恢复 / 缓存过期等与时间相关的用例 """
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr("time.monotonic", fake.monotonic)
+    return fake
+
+
+FAKE_SERVER = str(Path(__file__).with_name("fake_mcp_server.py"))
+
+
+def fake_server_config(*args: str, **config: Any) -> dict[str, Any]:
+    """ 以 stdio 启动 fake_mcp_server.py 的 mcp server 配置，args 为其命令行参数，config 为其余配置项 """
+    return {"command": sys.executable, "args": [FAKE_SERVER, "--payload-size", "0", *args], **config}
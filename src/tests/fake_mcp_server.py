@@ -0,0 +1,127 @@
+"""
+基准测试使用的本地 mcp server，不依赖网络，支持 stdio / sse / streamable_http 三种传输方式
+
+python fake_mcp_server.py --transport streamable_http --port 9001 --latency 0.01 --payload-size 1024 --error-rate 0.01
+
+提供一个工具 echo：等待 latency 秒后返回 payload-size 字节的文本，按 error-rate 的概率返回 isError 结果；
+单元测试可通过参数 delay 额外指定本次调用的处理耗时；工具 crash 使进程立即退出，用于模拟上游崩溃；
+工具 report 每一步推送一条进度通知与日志通知，用于通知转发
+工具 block 同步阻塞进程的事件循环（不再应答 ping），用于模拟卡死的上游；工具 register 动态注册一个新工具，可选推送 notifications/tools/list_changed，用于工具目录缓存
+资源 fake://counter 返回计数，工具 bump 使计数加一并向订阅了该资源的会话推送更新通知，工具 subscriptions 返回收到的订阅请求
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.fastmcp.exceptions import ToolError
+from pydantic import AnyUrl
+
+# 命令行传输类型 -> FastMCP 传输类型
+_TRANSPORTS = {
+    "stdio": "stdio",
+    "sse": "sse",
+    "streamable_http": "streamable-http",
+}
+
+
+def build_server(latency: float, payload_size: int, error_rate: float, host: str, port: int) -> FastMCP:
+    server = FastMCP("fake-mcp-server", host=host, port=port, log_level="WARNING")
+    payload = "x" * payload_size
+
+    @server.tool(structured_output=False)
+    async def echo(text: str = "", delay: float = 0.0) -> str:
+        """ 返回固定大小的文本 """
+        if latency + delay > 0:
+            await asyncio.sleep(latency + delay)
+        if error_rate > 0 and random.random() < error_rate:
+            raise ToolError("injected error")
+        return text + payload
+
+    @server.tool(structured_output=False)
+    async def crash() -> str:
+        """ 进程立即退出 """
+        os._exit(1)
+
+    @server.tool(structured_output=False)
+    async def report(ctx: Context, steps: int = 3) -> str:
+        """ 每一步推送一条进度通知与日志通知 """
+        for step in range(1, steps + 1):
+            await ctx.report_progress(step, steps)
+            await ctx.info(f"step {step}")
+        return f"{steps} steps"
+
+    @server.tool(structured_output=False)
+    async def block(seconds: float = 1.0) -> str:
+        """ 阻塞事件循环 seconds 秒 """
+        time.sleep(seconds)
+        return "unblocked"
+
+    @server.tool(structured_output=False)
+    async def register(ctx: Context, name: str, notify: bool = True) -> str:
+        """ 注册一个返回自身名称的新工具，notify 为 true 时推送 notifications/tools/list_changed """
+        async def registered() -> str:
+            return name
+
+        server.add_tool(registered, name=name, structured_output=False)
+        if notify:
+            await ctx.session.send_tool_list_changed()
+        return name
+
+    counter = {"value": 0}
+    subscriptions: list[str] = []
+
+    @server.resource("fake://counter")
+    def counter_resource() -> str:
+        """ 当前计数 """
+        return str(counter["value"])
+
+    @server._mcp_server.subscribe_resource()
+    async def subscribe(uri: AnyUrl) -> None:
+        subscriptions.append(str(uri))
+
+    @server.tool(structured_output=False)
+    async def bump(ctx: Context) -> str:
+        """ 计数加一，资源被订阅时推送 notifications/resources/updated """
+        counter["value"] += 1
+        if "fake://counter" in subscriptions:
+            await ctx.session.send_resource_updated(AnyUrl("fake://counter"))
+        return str(counter["value"])
+
+    @server.tool(name="subscriptions", structured_output=False)
+    async def list_subscriptions() -> str:
+        """ 收到的订阅请求（json 列表） """
+        return json.dumps(subscriptions)
+
+    # FastMCP 不声明资源订阅能力
+    lowlevel_server = server._mcp_server
+    get_capabilities = lowlevel_server.get_capabilities
+
+    def get_capabilities_with_subscribe(*args, **kwargs):
+        capabilities = get_capabilities(*args, **kwargs)
+        capabilities.resources.subscribe = True
+        return capabilities
+
+    lowlevel_server.get_capabilities = get_capabilities_with_subscribe
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fake mcp server for benchmarks")
+    parser.add_argument("--transport", choices=list(_TRANSPORTS), default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency", type=float, default=0.0, help="每次工具调用的处理耗时（秒）")
+    parser.add_argument("--payload-size", type=int, default=128, help="工具返回的文本大小（字节）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 isError 结果的概率，0 ~ 1")
+    args = parser.parse_args()
+
+    server = build_server(args.latency, args.payload_size, args.error_rate, args.host, args.port)
+    server.run(transport=_TRANSPORTS[args.transport])
+
+
+if __name__ == "__main__":
+    main()
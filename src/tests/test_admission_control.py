@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from feifei_proxy_mcp.admission_control import AdmissionController, ConcurrencyLimiter
+from feifei_proxy_mcp.enums import ProxyErrorCode
+from feifei_proxy_mcp.mcp_exception import McpProxyError
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_limiter_queues_in_fifo_order():
+    limiter = ConcurrencyLimiter("test", limit=1, max_queue=10, queue_timeout=5)
+    await limiter.acquire()
+    order = []
+
+    async def waiter(name: str):
+        await limiter.acquire()
+        order.append(name)
+        limiter.release()
+
+    tasks = [asyncio.create_task(waiter(name)) for name in ("a", "b", "c")]
+    await asyncio.sleep(0)
+    assert limiter.waiting == 3
+
+    limiter.release()
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b", "c"]
+    assert limiter.active == 0
+
+
+async def test_limiter_rejects_when_queue_full():
+    limiter = ConcurrencyLimiter("test", limit=1, max_queue=1, queue_timeout=5)
+    await limiter.acquire()
+    queued = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(McpProxyError) as exc_info:
+        await limiter.acquire()
+    assert exc_info.value.error.code == ProxyErrorCode.OVERLOADED.value
+    assert limiter.rejected == 1
+
+    limiter.release()
+    await queued
+    limiter.release()
+    assert limiter.active == 0
+
+
+async def test_limiter_queue_timeout():
+    limiter = ConcurrencyLimiter("test", limit=1, max_queue=10, queue_timeout=0.01)
+    await limiter.acquire()
+
+    with pytest.raises(McpProxyError):
+        await limiter.acquire()
+    assert limiter.timed_out == 1
+    assert limiter.waiting == 0
+
+    limiter.release()
+    assert limiter.active == 0
+
+
+async def test_cancelled_waiter_does_not_leak_slot():
+    limiter = ConcurrencyLimiter("test", limit=1, max_queue=10, queue_timeout=5)
+    await limiter.acquire()
+    queued = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    queued.cancel()
+    await asyncio.gather(queued, return_exceptions=True)
+    assert limiter.waiting == 0
+
+    limiter.release()
+    assert limiter.active == 0
+
+
+async def test_admit_applies_tool_and_global_limits():
+    controller = AdmissionController(max_concurrency=2, max_queue=0, queue_timeout=5)
+    tool_config = {"maxConcurrency": 1, "maxQueue": 0}
+
+    async with controller.admit("fake", "echo", tool_config):
+        # 工具级名额已满
+        with pytest.raises(McpProxyError):
+            async with controller.admit("fake", "echo", tool_config):
+                pass
+        async with controller.admit("fake", "other", {}):
+            # 全局名额已满
+            with pytest.raises(McpProxyError):
+                async with controller.admit("fake", "third", {}):
+                    pass
+
+    assert controller.global_limiter.active == 0
+    assert controller.tool_limiters[("fake", "echo")].active == 0
+
+
+async def test_forget_server_drops_tool_limiters():
+    controller = AdmissionController()
+    async with controller.admit("fake", "echo", {"maxConcurrency": 1}):
+        pass
+    controller.forget_server("fake")
+    assert controller.tool_limiters == {}
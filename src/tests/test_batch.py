@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import mcp
+import pytest
+
+from feifei_proxy_mcp.batch import parse_batch_calls, run_batch
+
+
+def _body(payload) -> bytes:
+    return json.dumps(payload).encode()
+
+
+def test_object_with_concurrency():
+    calls, concurrency = parse_batch_calls(_body({
+        "calls": [{"tool": "fetch.fetch", "arguments": {"url": "u"}}, {"tool": "a.echo"}],
+        "concurrency": 4,
+    }), max_calls=10)
+    assert calls == [("fetch.fetch", {"url": "u"}), ("a.echo", {})]
+    assert concurrency == 4
+
+
+def test_bare_list():
+    calls, concurrency = parse_batch_calls(_body([{"tool": "a.echo", "arguments": None}]), max_calls=10)
+    assert calls == [("a.echo", {})]
+    assert concurrency is None
+
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {"calls": []},
+    {"calls": "a.echo"},
+    {"calls": [{"tool": "a.echo"}], "concurrency": 0},
+    {"calls": [{"tool": "a.echo"}], "concurrency": True},
+    {"calls": [{"tool": "a.echo"}], "concurrency": "2"},
+    [{"arguments": {}}],
+    [{"tool": "a.echo", "arguments": [1]}],
+    ["a.echo"],
+])
+def test_invalid_payload(payload):
+    with pytest.raises(ValueError):
+        parse_batch_calls(_body(payload), max_calls=10)
+
+
+def test_too_many_calls():
+    with pytest.raises(ValueError, match="too many calls"):
+        parse_batch_calls(_body([{"tool": "a.echo"}] * 3), max_calls=2)
+
+
+def test_malformed_json():
+    with pytest.raises(ValueError):
+        parse_batch_calls(b"{", max_calls=10)
+
+
+async def _collect(execute, calls, concurrency: int = 2) -> list[dict]:
+    async with asyncio.timeout(5):
+        return [json.loads(line) async for line in run_batch(execute, calls, concurrency)]
+
+
+@pytest.mark.anyio
+async def test_every_call_yields_one_result():
+    async def execute(tool: str, arguments: dict) -> mcp.types.CallToolResult:
+        if tool == "cancelled":
+            # 调用内部的截止时间取消泄漏到 worker
+            raise asyncio.CancelledError()
+        if tool == "group":
+            raise BaseExceptionGroup("upstream", [asyncio.CancelledError()])
+        if tool == "unavailable":
+            raise mcp.McpError(mcp.types.ErrorData(code=-32001, message="no session"))
+        if tool == "broken":
+            raise RuntimeError("broken")
+        return mcp.types.CallToolResult(content=[mcp.types.TextContent(type="text", text=tool)])
+
+    tools = ["ok", "cancelled", "group", "unavailable", "broken", "ok2"]
+    results = sorted(await _collect(execute, [(tool, {}) for tool in tools]), key=lambda item: item["index"])
+    assert [item["tool"] for item in results] == tools
+    assert [item["isError"] for item in results] == [False, True, True, True, True, False]
+    assert results[1]["error"]["code"] == mcp.types.INTERNAL_ERROR
+    assert results[2]["error"]["code"] == mcp.types.INTERNAL_ERROR
+    assert results[3]["error"]["code"] == -32001
+    assert results[4]["result"]["content"][0]["text"] == "broken"
+
+
+@pytest.mark.anyio
+async def test_closing_batch_cancels_pending_calls():
+    started: list[str] = []
+    cancelled: list[str] = []
+
+    async def execute(tool: str, arguments: dict) -> mcp.types.CallToolResult:
+        started.append(tool)
+        if tool != "fast":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(tool)
+                raise
+        return mcp.types.CallToolResult(content=[])
+
+    batch = run_batch(execute, [("fast", {}), ("slow1", {}), ("slow2", {})], concurrency=3)
+    assert json.loads(await anext(batch))["tool"] == "fast"
+    await batch.aclose()
+    assert sorted(cancelled) == ["slow1", "slow2"]
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from conftest import fake_server_config
+from feifei_proxy_mcp.enums import ProxyErrorCode
+from feifei_proxy_mcp.mcp_client_manager import McpClientManager
+from feifei_proxy_mcp.mcp_exception import McpProxyError
+from feifei_proxy_mcp.mcp_server_registry import McpServerRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_call_after_deadline_succeeds_on_same_session():
+    registry = McpServerRegistry({"mcpServers": {"fake": fake_server_config(callTimeout=0.3)}})
+    try:
+        assert await registry.start()
+        pool = registry.pools["fake"]
+
+        with pytest.raises(McpProxyError) as exc_info:
+            await registry.execute_tool("echo", {"text": "slow", "delay": 5})
+        assert exc_info.value.error.code == ProxyErrorCode.DEADLINE_EXCEEDED.value
+
+        # 默认不向上游发送取消通知，会话不受影响，之后的调用在同一个会话上成功
+        await asyncio.sleep(0.5)
+        result = await registry.execute_tool("echo", {"text": "after"})
+        assert not result.isError
+        assert result.content[0].text == "after"
+        assert pool.alive_size == 1
+        assert pool.sessions_lost == 0
+    finally:
+        await registry.cleanup()
+
+
+async def test_cancel_targets_the_cancelled_request():
+    """ 开启 cancelUpstream 时，同一个会话上并发的调用中只取消被取消的那一个上游请求 """
+    manager = McpClientManager("fake", fake_server_config(cancelUpstream=True))
+    try:
+        await manager.wait_for_initialization()
+        assert manager.is_alive()
+
+        sent: dict = {}
+        write_stream = manager.session._write_stream
+        forward = write_stream.send
+
+        async def record(message):
+            request = message.message.root
+            if getattr(request, "method", None) == "tools/call":
+                sent[request.id] = request.params["arguments"]["text"]
+            await forward(message)
+
+        write_stream.send = record
+        cancelled: list[str] = []
+        manager._cancel_upstream_request = lambda request_id: cancelled.append(sent[request_id])
+
+        calls = {f"call{n}": asyncio.create_task(manager.execute_tool("echo", {"text": f"call{n}", "delay": 1}))
+                 for n in range(6)}
+        await asyncio.sleep(0.3)
+        calls["call1"].cancel()
+        calls["call4"].cancel()
+        await asyncio.gather(*calls.values(), return_exceptions=True)
+
+        assert sorted(cancelled) == ["call1", "call4"]
+        assert [name for name, call in calls.items() if not call.cancelled()] == ["call0", "call2", "call3", "call5"]
+    finally:
+        await manager.cleanup()
@@ -0,0 +1,92 @@
+import pytest
+
+from feifei_proxy_mcp.circuit_breaker import CircuitBreaker
+from feifei_proxy_mcp.enums import CircuitState, ProxyErrorCode
+from feifei_proxy_mcp.mcp_exception import McpProxyError
+
+
+def _breaker(threshold: int = 3, recovery: float = 10) -> CircuitBreaker:
+    return CircuitBreaker("fake", {"failureThreshold": threshold, "recoveryTimeout": recovery})
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = _breaker()
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(McpProxyError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.error.code == ProxyErrorCode.CIRCUIT_OPEN.value
+
+
+def test_success_resets_failure_count(clock):
+    breaker = _breaker()
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = _breaker(threshold=1)
+    breaker.record_failure()
+    clock.advance(10)
+
+    breaker.before_call()
+    assert breaker.state == CircuitState.HALF_OPEN
+    # 探测请求未结束时其余请求快速失败
+    with pytest.raises(McpProxyError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = _breaker(threshold=1)
+    breaker.record_failure()
+    clock.advance(10)
+    breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(McpProxyError):
+        breaker.before_call()
+    clock.advance(10)
+    breaker.before_call()
+    assert breaker.state == CircuitState.HALF_OPEN
+
+
+def test_stuck_probe_is_replaced_after_recovery_timeout(clock):
+    breaker = _breaker(threshold=1)
+    breaker.record_failure()
+    clock.advance(10)
+    breaker.before_call()
+
+    clock.advance(10)
+    breaker.before_call()
+    assert breaker.state == CircuitState.HALF_OPEN
+
+
+def test_cancelled_probe_releases_slot(clock):
+    breaker = _breaker(threshold=1)
+    breaker.record_failure()
+    clock.advance(10)
+
+    assert breaker.before_call() is True
+    breaker.release_probe()
+    # 探测请求被取消后立即允许新的探测，无需等待 recoveryTimeout
+    assert breaker.before_call() is True
+    assert breaker.state == CircuitState.HALF_OPEN
+
+
+def test_closed_calls_are_not_probes(clock):
+    assert _breaker().before_call() is False
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+from mcp.server.streamable_http import EventMessage
+from mcp.types import JSONRPCMessage, JSONRPCNotification
+
+from feifei_proxy_mcp.event_store import RingBufferEventStore
+
+pytestmark = pytest.mark.anyio
+
+
+def _message(n: int, padding: int = 0) -> JSONRPCMessage:
+    return JSONRPCMessage(JSONRPCNotification(jsonrpc="2.0", method="notifications/message",
+                                              params={"n": n, "padding": "x" * padding}))
+
+
+async def _replay(store, last_event_id: str) -> tuple[object, list[int]]:
+    replayed: list[EventMessage] = []
+
+    async def send(event: EventMessage):
+        replayed.append(event)
+
+    stream_id = await store.replay_events_after(last_event_id, send)
+    return stream_id, [event.message.root.params["n"] for event in replayed]
+
+
+async def test_replay_after_event():
+    store = RingBufferEventStore()
+    ids = [await store.store_event("s1", _message(n)) for n in range(3)]
+    await store.store_event("s2", _message(100))
+
+    assert await _replay(store, ids[0]) == ("s1", [1, 2])
+    assert await _replay(store, ids[2]) == ("s1", [])
+
+
+async def test_unknown_or_invalid_event_id():
+    store = RingBufferEventStore()
+    await store.store_event("s1", _message(0))
+    assert (await _replay(store, "999"))[0] is None
+    assert (await _replay(store, "not-a-number"))[0] is None
+
+
+async def test_per_stream_limit_bounds_order():
+    store = RingBufferEventStore(max_events_per_stream=10)
+    for n in range(10000):
+        await store.store_event("s1", _message(n))
+
+    stats = store.stats()
+    assert stats["events"] == 10
+    assert stats["evictions"] == 9990
+    # 单个流淘汰的事件不会在全局写入顺序中堆积
+    assert len(store._order) <= 2 * stats["events"] + 64
+
+
+async def test_byte_budget_evicts_oldest_across_streams():
+    size = len(_message(0, padding=100).model_dump_json(by_alias=True, exclude_none=True))
+    store = RingBufferEventStore(max_bytes=size * 3)
+    first = await store.store_event("s1", _message(0, padding=100))
+    for n in range(1, 4):
+        await store.store_event(f"s{n % 2}", _message(n, padding=100))
+
+    assert store.current_bytes <= store.max_bytes
+    assert (await _replay(store, first))[0] is None
+
+
+async def test_session_views_are_isolated():
+    store = RingBufferEventStore()
+    first, second = store.session_store(), store.session_store()
+    # 不同会话使用相同的流 ID（mcp 以请求 ID 作为流 ID）
+    first_id = await first.store_event("1", _message(0))
+    await first.store_event("1", _message(1))
+    second_id = await second.store_event("1", _message(10))
+    await second.store_event("1", _message(11))
+
+    assert await _replay(first, first_id) == ("1", [1])
+    assert await _replay(second, second_id) == ("1", [11])
+    assert (await _replay(second, first_id))[0] is None
+
+
+async def test_session_close_releases_streams():
+    store = RingBufferEventStore()
+    session = store.session_store()
+    other = store.session_store()
+    for n in range(5):
+        await session.store_event(str(n), _message(n))
+    kept = await other.store_event("1", _message(100))
+
+    session.close()
+    assert store.stats()["streams"] == 1
+    assert store.current_bytes == len(_message(100).model_dump_json(by_alias=True, exclude_none=True))
+    assert (await _replay(other, kept))[0] == "1"
+
+
+async def test_session_manager_releases_each_session_on_delete():
+    import httpx
+    from mcp.server.lowlevel import Server
+
+    from feifei_proxy_mcp.event_store import SessionScopedManager
+
+    app = Server("test")
+
+    @app.list_tools()
+    async def list_tools():
+        return []
+
+    store = RingBufferEventStore()
+    manager = SessionScopedManager(app=app, event_store=store, json_response=False, stateless=False)
+    headers = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+
+    async def open_session(client: httpx.AsyncClient) -> dict[str, str]:
+        response = await client.post("/mcp", headers=headers, json={
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {"protocolVersion": "2025-06-18", "capabilities": {},
+                       "clientInfo": {"name": "test", "version": "1"}}})
+        session = {**headers, "mcp-session-id": response.headers["mcp-session-id"]}
+        await client.post("/mcp", headers=session, json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+        response = await client.post("/mcp", headers=session, json={"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        assert '"tools":[]' in response.text
+        return session
+
+    async def wait_streams(expected: int):
+        for _ in range(100):
+            if store.stats()["streams"] == expected:
+                return
+            await asyncio.sleep(0.01)
+        assert store.stats()["streams"] == expected
+
+    async with manager.run():
+        transport = httpx.ASGITransport(app=manager.handle_request)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            first = await open_session(client)
+            second = await open_session(client)
+            # 每个会话的 initialize / tools/list 两个请求流
+            await wait_streams(4)
+            assert len({stream_key[0] for stream_key in store._streams}) == 2
+
+            await client.delete("/mcp", headers=first)
+            await wait_streams(2)
+            assert len({stream_key[0] for stream_key in store._streams}) == 1
+
+            await client.delete("/mcp", headers=second)
+            await wait_streams(0)
+            assert store.current_bytes == 0
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from conftest import fake_server_config
+from feifei_proxy_mcp.mcp_server_registry import McpServerRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+async def _wait_until(predicate, timeout: float = 5.0):
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.05)
+
+
+async def test_hung_upstream_becomes_unready_and_recovers():
+    config = fake_server_config(healthCheck={"interval": 0.2, "timeout": 0.2, "passiveWindow": 0})
+    registry = McpServerRegistry({"mcpServers": {"fake": config}})
+    try:
+        assert await registry.start()
+        pool = registry.pools["fake"]
+        await _wait_until(lambda: pool.last_health_check_time > 0)
+        assert registry.healthy()
+        assert registry.health_status()["fake"]["healthySessions"] == 1
+
+        # 上游卡死：会话仍然存活，但 ping 超时，缓存的健康状态变为不健康
+        blocked = asyncio.create_task(registry.execute_tool("block", {"seconds": 1.5}))
+        await _wait_until(lambda: not registry.healthy())
+        status = registry.health_status()["fake"]
+        assert (status["healthy"], status["sessions"], status["healthySessions"]) == (False, 1, 0)
+
+        assert (await blocked).content[0].text == "unblocked"
+        await _wait_until(registry.healthy)
+    finally:
+        await registry.cleanup()
+
+
+async def test_recent_success_skips_ping(monkeypatch):
+    registry = McpServerRegistry({"mcpServers": {"fake": fake_server_config()}})
+    try:
+        assert await registry.start()
+        member = registry.pools["fake"]._members[0]
+        await registry.execute_tool("echo", {})
+
+        async def ping_fails(timeout: float) -> bool:
+            return True
+
+        monkeypatch.setattr(member, "is_session_disconnected", ping_fails)
+        # passiveWindow 内有成功应答的调用，视为健康，不发送 ping
+        assert await member.check_health(timeout=1, passive_window=60)
+        assert not await member.check_health(timeout=1, passive_window=0)
+        assert not registry.healthy()
+    finally:
+        await registry.cleanup()
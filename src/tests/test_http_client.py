@@ -0,0 +1,41 @@
+import httpx
+import pytest
+
+from feifei_proxy_mcp.http_client import SharedHttpClient
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def http_client():
+    http_client = SharedHttpClient("remote", {"transport": "streamable_http", "url": "http://remote/mcp",
+                                              "timeout": 30, "connectTimeout": 5})
+    yield http_client
+    await http_client.aclose()
+
+
+async def test_factory_uses_headers_and_timeout(http_client):
+    async with http_client.mcp_client_factory(headers={"Authorization": "Bearer a"},
+                                              timeout=httpx.Timeout(30, read=300)) as client:
+        assert client.headers["Authorization"] == "Bearer a"
+        assert client.timeout == httpx.Timeout(300, connect=5, write=30, pool=30)
+
+    async with http_client.mcp_client_factory(headers={"Authorization": "Bearer b"},
+                                              timeout=httpx.Timeout(10, read=60)) as other:
+        assert other is not client
+        assert other.headers["Authorization"] == "Bearer b"
+        assert other.timeout.read == 60
+    assert not client.is_closed
+
+
+async def test_factory_shares_client_for_same_arguments(http_client):
+    clients = []
+    for _ in range(3):
+        async with http_client.mcp_client_factory(headers={"x-tenant": "t"}, timeout=httpx.Timeout(30, read=300)) \
+                as client:
+            clients.append(client)
+    assert clients[0] is clients[1] is clients[2]
+    # 会话结束时不关闭共享客户端，连接池关闭时统一关闭
+    assert not clients[0].is_closed
+    await http_client.aclose()
+    assert clients[0].is_closed
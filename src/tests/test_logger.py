@@ -0,0 +1,75 @@
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueListener
+
+from feifei_proxy_mcp.logger import DeferredQueueHandler, McpLogger
+
+
+class RecordingFormatter(logging.Formatter):
+    """ 记录执行格式化的线程 """
+
+    def __init__(self):
+        super().__init__("%(levelname)s %(message)s")
+        self.threads: list[str] = []
+
+    def format(self, record: logging.LogRecord) -> str:
+        self.threads.append(threading.current_thread().name)
+        return super().format(record)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines: list[str] = []
+        self.done = threading.Event()
+
+    def emit(self, record: logging.LogRecord):
+        self.lines.append(self.format(record))
+        self.done.set()
+
+
+def test_formatting_runs_on_listener_thread():
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    formatter = RecordingFormatter()
+    target = ListHandler()
+    target.setFormatter(formatter)
+    listener = QueueListener(log_queue, target)
+    listener.start()
+    logger = logging.getLogger("test_deferred_queue_handler")
+    logger.propagate = False
+    handler = DeferredQueueHandler(log_queue)
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.error("call %s failed", "echo", exc_info=True)
+        assert target.done.wait(5)
+    finally:
+        logger.removeHandler(handler)
+        listener.stop()
+
+    # 调用线程只入队，格式化（含异常堆栈）只在后台线程中执行一次
+    assert len(formatter.threads) == 1
+    assert formatter.threads[0] != threading.current_thread().name
+    assert target.lines[0].startswith("ERROR call echo failed")
+    assert "ValueError: boom" in target.lines[0]
+
+
+def test_prepare_does_not_mutate_record():
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    record = logging.LogRecord("test", logging.ERROR, __file__, 1, "call %s failed", ("echo",), sys.exc_info())
+    prepared = handler.prepare(record)
+    assert prepared is not record
+    assert (prepared.msg, prepared.args) == ("call %s failed", ("echo",))
+
+
+def test_format_payload_redacts_and_truncates(monkeypatch):
+    monkeypatch.setattr(McpLogger, "max_payload", 40)
+    text = McpLogger.format_payload({"url": "u", "api_key": "k", "nested": [{"Authorization": "t"}]})
+    assert '"api_key": "***"' in text
+    assert '"k"' not in text
+    assert text.endswith("chars truncated)")
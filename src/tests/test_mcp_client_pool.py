@@ -0,0 +1,211 @@
+import asyncio
+import sys
+import time
+
+import anyio
+import mcp
+import pytest
+
+from conftest import fake_server_config
+from feifei_proxy_mcp.enums import CircuitState, ProxyErrorCode
+from feifei_proxy_mcp.mcp_client_pool import McpClientPool
+from feifei_proxy_mcp.mcp_exception import McpProxyError
+from feifei_proxy_mcp.mcp_server_registry import McpServerRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeMember:
+    """ 不启动上游的连接池成员，按预设结果应答 """
+
+    def __init__(self, name: str, error: Exception | None = None):
+        self.name = name
+        self.error = error
+        self.health_ok = True
+        self.outstanding_requests = 0
+        self.last_used_time = 0.0
+        self.alive = True
+        self.calls = 0
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    async def call(self) -> str:
+        self.calls += 1
+        if self.error is not None:
+            self.alive = False
+            raise self.error
+        return self.name
+
+    async def list_tools(self) -> list[mcp.types.Tool]:
+        return [mcp.types.Tool(name=await self.call(), inputSchema={"type": "object"})]
+
+
+def _pool(*members: FakeMember) -> McpClientPool:
+    pool = McpClientPool("fake", {"command": "unused", "pool": {"minSize": 1, "maxSize": 1}})
+    pool._members = list(members)
+    return pool
+
+
+_CONNECTION_CLOSED = mcp.McpError(mcp.types.ErrorData(code=mcp.types.CONNECTION_CLOSED, message="Connection closed"))
+
+
+async def test_idempotent_request_retried_on_another_member():
+    lost, healthy = FakeMember("lost", _CONNECTION_CLOSED), FakeMember("healthy")
+    pool = _pool(lost, healthy)
+    assert await pool._run_on_member("resources/list", lambda member: member.call()) == "healthy"
+    assert (lost.calls, healthy.calls) == (1, 1)
+
+
+async def test_tool_call_in_flight_is_not_retried():
+    lost, healthy = FakeMember("lost", _CONNECTION_CLOSED), FakeMember("healthy")
+    pool = _pool(lost, healthy)
+    with pytest.raises(mcp.McpError):
+        await pool._run_on_member("echo", lambda member: member.call(), idempotent=False)
+    assert healthy.calls == 0
+
+
+async def test_tool_call_never_sent_is_retried():
+    lost, healthy = FakeMember("lost", anyio.ClosedResourceError()), FakeMember("healthy")
+    pool = _pool(lost, healthy)
+    assert await pool._run_on_member("echo", lambda member: member.call(), idempotent=False) == "healthy"
+
+
+async def test_tool_catalog_refresh_is_dispatched():
+    lost, healthy = FakeMember("lost", _CONNECTION_CLOSED), FakeMember("healthy")
+    pool = _pool(lost, healthy)
+    assert [tool.name for tool in await pool._refresh_tools()] == ["healthy"]
+    assert (lost.calls, healthy.calls) == (1, 1)
+
+
+async def test_tool_catalog_refresh_respects_open_circuit():
+    member = FakeMember("healthy")
+    pool = _pool(member)
+    for _ in range(pool.circuit_breaker.failure_threshold):
+        pool.circuit_breaker.record_failure()
+    with pytest.raises(McpProxyError) as exc_info:
+        await pool._refresh_tools()
+    assert exc_info.value.error.code == ProxyErrorCode.CIRCUIT_OPEN.value
+    assert member.calls == 0
+
+
+async def test_dead_member_is_not_selected():
+    dead, healthy = FakeMember("dead"), FakeMember("healthy")
+    dead.alive = False
+    pool = _pool(dead, healthy)
+    assert await pool._run_on_member("echo", lambda member: member.call()) == "healthy"
+    assert dead.calls == 0
+
+
+async def test_crashed_session_is_replaced_for_next_call():
+    registry = McpServerRegistry({"mcpServers": {"fake": fake_server_config()}})
+    try:
+        assert await registry.start()
+        with pytest.raises(mcp.McpError):
+            await registry.execute_tool("crash", {})
+
+        # 无需等待巡检任务，下一次调用立即重建会话
+        result = await registry.execute_tool("echo", {"text": "after crash"})
+        assert result.content[0].text == "after crash"
+    finally:
+        await registry.cleanup()
+
+
+async def test_hanging_upstream_trips_breaker():
+    config = fake_server_config(callTimeout=0.2, circuitBreaker={"failureThreshold": 2, "recoveryTimeout": 30})
+    registry = McpServerRegistry({"mcpServers": {"fake": config}})
+    try:
+        assert await registry.start()
+        for _ in range(2):
+            with pytest.raises(McpProxyError) as exc_info:
+                await registry.execute_tool("echo", {"delay": 5})
+            assert exc_info.value.error.code == ProxyErrorCode.DEADLINE_EXCEEDED.value
+
+        assert registry.pools["fake"].circuit_breaker.state == CircuitState.OPEN
+        with pytest.raises(McpProxyError) as exc_info:
+            await registry.execute_tool("echo", {})
+        assert exc_info.value.error.code == ProxyErrorCode.CIRCUIT_OPEN.value
+    finally:
+        await registry.cleanup()
+
+
+async def test_cancelled_probe_does_not_block_recovery():
+    config = fake_server_config(callTimeout=0.2, circuitBreaker={"failureThreshold": 1, "recoveryTimeout": 0.5})
+    registry = McpServerRegistry({"mcpServers": {"fake": config}})
+    try:
+        assert await registry.start()
+        with pytest.raises(McpProxyError):
+            await registry.execute_tool("echo", {"delay": 5})
+        await asyncio.sleep(0.6)
+
+        # 半开状态的探测请求被下游取消
+        probe = asyncio.create_task(registry.execute_tool("echo", {"delay": 0.1}))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+        result = await registry.execute_tool("echo", {"text": "recovered"})
+        assert result.content[0].text == "recovered"
+        assert registry.pools["fake"].circuit_breaker.state == CircuitState.CLOSED
+    finally:
+        await registry.cleanup()
+
+
+async def test_cleanup_cancels_pending_spawns():
+    # 上游进程启动后不应答 initialize
+    pool = McpClientPool("fake", {"command": sys.executable, "args": ["-c", "import time; time.sleep(60)"],
+                                  "initTimeout": 120})
+    start = asyncio.create_task(pool.start())
+    await asyncio.sleep(0.5)
+    assert pool.size == 1
+
+    started = time.monotonic()
+    await pool.cleanup()
+    assert time.monotonic() - started < 10
+    assert await start is False
+    assert pool.size == 0
+
+
+async def test_cancelled_request_does_not_cancel_spawn():
+    pool = McpClientPool("fake", fake_server_config())
+    try:
+        with pytest.raises(TimeoutError):
+            async with asyncio.timeout(0.01):
+                await pool._acquire_member()
+        # 被取消的请求触发的会话仍会完成初始化并加入连接池
+        await asyncio.wait(list(pool._spawning))
+        assert pool.alive_size == 1
+    finally:
+        await pool.cleanup()
+
+
+async def test_pool_scales_with_load_and_spreads_calls():
+    config = fake_server_config(pool={"minSize": 1, "maxSize": 3, "checkInterval": 0.1, "idleTimeout": 1})
+    registry = McpServerRegistry({"mcpServers": {"fake": config}})
+    try:
+        assert await registry.start()
+        pool = registry.pools["fake"]
+        assert pool.size == 1
+
+        # 唯一的会话繁忙时后台扩容，扩容不超过 maxSize
+        results = await asyncio.gather(*(registry.execute_tool("echo", {"text": str(n), "delay": 0.5})
+                                         for n in range(6)))
+        assert [result.content[0].text for result in results] == [str(n) for n in range(6)]
+        if pool._spawning:
+            await asyncio.wait(list(pool._spawning))
+        assert pool.size == pool.alive_size == 3
+
+        # 新的调用分发到未完成请求数最少的会话
+        calls = [asyncio.create_task(registry.execute_tool("echo", {"delay": 0.5})) for _ in range(3)]
+        await asyncio.sleep(0.2)
+        assert [member.outstanding_requests for member in pool._members] == [1, 1, 1]
+        await asyncio.gather(*calls)
+
+        # 空闲超过 idleTimeout 的会话被回收，保留 minSize 个
+        for _ in range(50):
+            if pool.size == 1:
+                break
+            await asyncio.sleep(0.1)
+        assert pool.size == pool.alive_size == 1
+    finally:
+        await registry.cleanup()
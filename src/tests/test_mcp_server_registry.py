@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from conftest import fake_server_config
+from feifei_proxy_mcp.mcp_server_registry import UNKNOWN_TOOL_LABEL, McpServerRegistry
+from feifei_proxy_mcp.metrics import TOOL_CALL_ERRORS, TOOL_CALLS
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_coalesced_calls_store_result_once(monkeypatch):
+    registry = McpServerRegistry({"mcpServers": {"fake": fake_server_config(
+        tools={"echo": {"cacheTtl": 60, "coalesce": True}})}})
+    try:
+        assert await registry.start()
+        stored = []
+        put = registry.result_cache.put
+
+        def record_put(key, result, ttl):
+            stored.append(key)
+            put(key, result, ttl=ttl)
+
+        monkeypatch.setattr(registry.result_cache, "put", record_put)
+
+        results = await asyncio.gather(*(registry.execute_tool("echo", {"text": "a", "delay": 0.3}) for _ in range(5)))
+        assert [result.content[0].text for result in results] == ["a"] * 5
+        assert registry.single_flight.leaders == 1
+        assert len(stored) == 1
+
+        # 之后的调用命中缓存
+        assert (await registry.execute_tool("echo", {"text": "a", "delay": 0.3})).content[0].text == "a"
+        assert len(stored) == 1
+    finally:
+        await registry.cleanup()
+
+
+async def test_unknown_tool_names_share_one_metric_label():
+    registry = McpServerRegistry({"mcpServers": {"metrics_a": fake_server_config(), "metrics_b": fake_server_config()}})
+    try:
+        assert await registry.start()
+        assert (await registry.execute_tool("metrics_a.echo", {"text": "a"})).content[0].text == "a"
+        # 不在目录中的工具名按命名空间兜底路由到上游，由上游返回错误
+        for name in ("no_such_tool_1", "no_such_tool_2"):
+            assert (await registry.execute_tool(f"metrics_a.{name}", {})).isError
+
+        labels = [label_values for label_values in TOOL_CALLS._values if label_values[0] == "metrics_a"]
+        assert sorted(labels) == [("metrics_a", "echo"), ("metrics_a", UNKNOWN_TOOL_LABEL)]
+        assert TOOL_CALLS._values[("metrics_a", UNKNOWN_TOOL_LABEL)] == 2
+        assert ("metrics_a", UNKNOWN_TOOL_LABEL, "tool_error") in TOOL_CALL_ERRORS._values
+    finally:
+        await registry.cleanup()
+
+
+async def test_single_server_tools_are_not_namespaced():
+    registry = McpServerRegistry({"mcpServers": {"fake": fake_server_config()}})
+    try:
+        assert await registry.start()
+        assert "echo" in {tool.name for tool in await registry.list_tools()}
+        assert registry.get_initialized_response().serverInfo.name == "fake-mcp-server"
+    finally:
+        await registry.cleanup()
+
+
+async def test_namespaced_tools_route_to_their_server():
+    registry = McpServerRegistry({"mcpServers": {"a": fake_server_config(), "b": fake_server_config()}})
+    try:
+        assert await registry.start()
+        names = {tool.name for tool in await registry.list_tools()}
+        assert {"a.echo", "b.echo", "a.bump", "b.bump"} <= names
+        assert "echo" not in names
+        # 聚合多个 mcp server 时不透传某一个上游的初始化信息
+        assert registry.get_initialized_response() is None
+
+        # 每个 mcp server 有独立的计数，按命名空间路由到各自的上游
+        assert (await registry.execute_tool("a.bump", {})).content[0].text == "1"
+        assert (await registry.execute_tool("a.bump", {})).content[0].text == "2"
+        assert (await registry.execute_tool("b.bump", {})).content[0].text == "1"
+
+        # 上游工具名本身带分隔符时，按第一个分隔符拆分命名空间
+        await registry.execute_tool("b.register", {"name": "x.y", "notify": False})
+        registry.pools["b"].invalidate_tools()
+        assert "b.x.y" in {tool.name for tool in await registry.list_tools()}
+        assert (await registry.execute_tool("b.x.y", {})).content[0].text == "x.y"
+
+        with pytest.raises(ValueError, match="Unknown tool"):
+            await registry.execute_tool("echo", {})
+        with pytest.raises(ValueError, match="Unknown tool"):
+            await registry.execute_tool("c.echo", {})
+    finally:
+        await registry.cleanup()
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from conftest import fake_server_config
+from feifei_proxy_mcp.mcp_server_registry import McpServerRegistry
+from feifei_proxy_mcp.notification_relay import NotificationRelay
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingSession:
+    """ 记录转发给下游的通知 """
+
+    def __init__(self):
+        self.sent: list[tuple] = []
+
+    async def send_progress_notification(self, progress_token, progress, total=None, message=None,
+                                         related_request_id=None):
+        self.sent.append(("progress", progress_token, progress, related_request_id))
+
+    async def send_log_message(self, level, data, logger=None, related_request_id=None):
+        self.sent.append(("log", level, data, related_request_id))
+
+
+@pytest.fixture
+async def registry():
+    registry = McpServerRegistry({"mcpServers": {"fake": fake_server_config()}})
+    try:
+        assert await registry.start()
+        yield registry
+    finally:
+        await registry.cleanup()
+
+
+async def test_progress_and_logs_are_relayed_before_result(registry):
+    session = RecordingSession()
+    relay = NotificationRelay(session, request_id=7, progress_token="downstream-token")
+
+    result = await registry.execute_tool("report", {"steps": 2}, relay=relay)
+    assert result.content[0].text == "2 steps"
+    # 结果返回前积压的通知已发送完成，进度通知使用下游的 progressToken
+    assert session.sent == [
+        ("progress", "downstream-token", 1, "7"), ("log", "info", "step 1", 7),
+        ("progress", "downstream-token", 2, "7"), ("log", "info", "step 2", 7),
+    ]
+
+
+async def test_progress_is_not_relayed_without_token(registry):
+    session = RecordingSession()
+    await registry.execute_tool("report", {"steps": 2}, relay=NotificationRelay(session, request_id=1))
+    assert [item[0] for item in session.sent] == ["log", "log"]
+
+
+async def test_logs_of_concurrent_calls_are_not_misrouted(registry):
+    sessions = [RecordingSession(), RecordingSession()]
+    # 同一个会话上同时进行两个调用，日志通知无法确定归属时丢弃；进度通知按 progressToken 各自转发
+    slow = asyncio.create_task(registry.execute_tool(
+        "echo", {"text": "slow", "delay": 0.5}, relay=NotificationRelay(sessions[0], request_id=1)))
+    await asyncio.sleep(0.1)
+    await registry.execute_tool("report", {"steps": 2},
+                                relay=NotificationRelay(sessions[1], request_id=2, progress_token="p"))
+    await slow
+
+    assert sessions[0].sent == []
+    assert sessions[1].sent == [("progress", "p", 1, "2"), ("progress", "p", 2, "2")]
@@ -0,0 +1,124 @@
+import json
+
+import httpx
+import pytest
+
+from feifei_proxy_mcp.http_client import SharedHttpClient
+from feifei_proxy_mcp.openapi_client import OpenApiClientManager, compile_operations
+
+pytestmark = pytest.mark.anyio
+
+SPEC = {
+    "openapi": "3.0.3",
+    "info": {"title": "petstore", "version": "1.0"},
+    "servers": [{"url": "http://petstore"}],
+    "paths": {
+        "/pets/{petId}": {
+            "parameters": [{"$ref": "#/components/parameters/PetId"},
+                           {"name": "verbose", "in": "query", "schema": {"type": "boolean"}}],
+            "get": {
+                "operationId": "getPet",
+                "parameters": [{"name": "verbose", "in": "query", "required": True, "schema": {"type": "integer"}},
+                               {"name": "x-trace", "in": "header", "schema": {"type": "string"}}],
+            },
+            "put": {
+                "operationId": "updatePet",
+                "requestBody": {"required": True,
+                                "content": {"application/json": {"schema": {"$ref": "#/components/schemas/Pet"}}}},
+            },
+        },
+    },
+    "components": {
+        "parameters": {"PetId": {"name": "petId", "in": "path", "schema": {"type": "string"}}},
+        "schemas": {
+            "Pet": {"type": "object", "required": ["name"], "properties": {
+                "name": {"type": "string"},
+                "status": {"type": "string", "enum": ["available", "sold"], "nullable": True},
+                "owner": {"allOf": [{"$ref": "#/components/schemas/Owner"}], "nullable": True},
+                "parent": {"$ref": "#/components/schemas/Pet"},
+            }},
+            "Owner": {"type": "object", "properties": {"name": {"type": "string"}}},
+        },
+    },
+}
+
+
+def test_refs_and_path_parameters_are_compiled():
+    operations = compile_operations(SPEC)
+    assert set(operations) == {"getPet", "updatePet"}
+
+    get_pet = operations["getPet"]
+    assert (get_pet.method, get_pet.path_params, get_pet.query_params, get_pet.header_params) == \
+           ("GET", ["petId"], ["verbose"], ["x-trace"])
+    # 接口级参数覆盖路径级同名参数，路径参数总是必填
+    schema = get_pet.tool.inputSchema
+    assert schema["properties"]["verbose"] == {"type": "integer"}
+    assert schema["required"] == ["petId", "verbose"]
+
+    body = operations["updatePet"].tool.inputSchema["properties"]["body"]
+    assert body["properties"]["owner"]["anyOf"][0]["allOf"][0]["properties"] == {"name": {"type": "string"}}
+    # 循环引用处保留为不限制类型的 schema
+    assert body["properties"]["parent"] == {}
+
+
+def test_nullable_is_converted_to_json_schema():
+    update_pet = compile_operations(SPEC)["updatePet"]
+    pet = update_pet.tool.inputSchema["properties"]["body"]
+    assert pet["properties"]["status"] == {"type": ["string", "null"], "enum": ["available", "sold", None]}
+    assert pet["properties"]["owner"]["anyOf"][1] == {"type": "null"}
+    assert "nullable" not in json.dumps(update_pet.tool.inputSchema)
+
+    validator = update_pet.validator
+    assert validator.is_valid({"petId": "1", "body": {"name": "rex", "status": None, "owner": None}})
+    assert not validator.is_valid({"petId": "1", "body": {"name": "rex", "status": "lost"}})
+    assert not validator.is_valid({"petId": "1"})
+
+
+class MockHttpClient(SharedHttpClient):
+    """ 以 httpx.MockTransport 应答的共享客户端 """
+
+    def __init__(self, handler):
+        super().__init__("petstore", {"transport": "openapi"})
+        self.handler = handler
+
+    def get(self, **kwargs) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler), **kwargs)
+
+
+async def test_tool_call_builds_http_request(tmp_path):
+    spec_path = tmp_path / "petstore.json"
+    spec_path.write_text(json.dumps(SPEC))
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("missing"):
+            return httpx.Response(404, text="not found")
+        return httpx.Response(200, json={"ok": True})
+
+    manager = OpenApiClientManager("petstore", {"transport": "openapi", "specPath": str(spec_path),
+                                                "headers": {"Authorization": "Bearer t"}},
+                                   http_client=MockHttpClient(handler))
+    try:
+        await manager.wait_for_initialization()
+        assert manager.is_alive()
+        assert manager.get_initialized_response().serverInfo.name == "petstore"
+
+        result = await manager.execute_tool("getPet", {"petId": "a/b", "verbose": 1, "x-trace": "t1"})
+        assert not result.isError
+        request = requests[-1]
+        assert (request.method, request.url.raw_path) == ("GET", b"/pets/a%2Fb?verbose=1")
+        assert (request.headers["x-trace"], request.headers["authorization"]) == ("t1", "Bearer t")
+
+        await manager.execute_tool("updatePet", {"petId": "1", "body": {"name": "rex", "status": None}})
+        assert (requests[-1].method, json.loads(requests[-1].content)) == ("PUT", {"name": "rex", "status": None})
+
+        # 参数校验失败时不发出请求；HTTP 错误状态码返回 isError 结果
+        count = len(requests)
+        result = await manager.execute_tool("getPet", {"petId": "1", "verbose": "yes"})
+        assert result.isError and "Invalid arguments" in result.content[0].text
+        assert len(requests) == count
+        result = await manager.execute_tool("getPet", {"petId": "missing", "verbose": 1})
+        assert result.isError and result.content[0].text == "HTTP 404: not found"
+    finally:
+        await manager.cleanup()
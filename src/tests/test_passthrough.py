@@ -0,0 +1,166 @@
+import asyncio
+import json
+
+import mcp
+import pytest
+
+from conftest import fake_server_config
+from feifei_proxy_mcp.mcp_server_registry import McpServerRegistry
+from feifei_proxy_mcp.passthrough import RawChannel, RawResponse, parse_tool_call
+
+
+def _body(message) -> bytes:
+    return json.dumps(message).encode()
+
+
+def test_tool_call():
+    body = _body({"jsonrpc": "2.0", "id": 7, "method": "tools/call",
+                  "params": {"name": "a.echo", "arguments": {"text": "hi"}}})
+    assert parse_tool_call(body) == (7, "a.echo", {"text": "hi"})
+
+
+def test_missing_arguments_default_to_empty():
+    body = _body({"jsonrpc": "2.0", "id": "x", "method": "tools/call", "params": {"name": "a.echo"}})
+    assert parse_tool_call(body) == ("x", "a.echo", {})
+
+
+@pytest.mark.parametrize("message", [
+    # 非 tools/call / 通知 / 批量请求
+    {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+    {"jsonrpc": "2.0", "method": "tools/call", "params": {"name": "a.echo"}},
+    [{"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "a.echo"}}],
+    # 参数格式不正确
+    {"jsonrpc": "2.0", "id": 1, "method": "tools/call"},
+    {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": 1}},
+    {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "a.echo", "arguments": [1]}},
+    # 需要进度通知
+    {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+     "params": {"name": "a.echo", "_meta": {"progressToken": "p"}}},
+])
+def test_falls_back_to_regular_handling(message):
+    assert parse_tool_call(_body(message)) is None
+
+
+def test_malformed_json():
+    assert parse_tool_call(b"{") is None
+
+
+class RecordingUpstream:
+    """ 记录 RawChannel 写入上游的行 """
+
+    def __init__(self):
+        self.lines: list[bytes] = []
+        self.sent = asyncio.Event()
+
+    async def send_line(self, line: bytes):
+        self.lines.append(line)
+        self.sent.set()
+
+    def last_request_id(self) -> str:
+        return json.loads(self.lines[-1])["id"]
+
+
+async def _start_request(channel: RawChannel, upstream: RecordingUpstream) -> tuple[asyncio.Task, str]:
+    upstream.sent.clear()
+    task = asyncio.create_task(channel.request("tools/call", {"name": "echo", "arguments": {"text": "中文"}}))
+    await upstream.sent.wait()
+    return task, upstream.last_request_id()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("template", [
+    '{{"jsonrpc":"2.0","id":"{id}","result":{{"content":[],"isError":false}}}}',
+    '{{"jsonrpc": "2.0", "result": {{"content": [], "isError": false}}, "id" : "{id}"}}',
+    # 请求 ID 在大响应的末尾 / 不在首尾窗口内
+    '{{"jsonrpc":"2.0","result":{{"content":[{{"type":"text","text":"' + "x" * 1024 + '"}}],"isError":false}},'
+    '"id":"{id}"}}',
+    '{{"jsonrpc":"2.0","result":{{"content":[{{"type":"text","text":"' + "x" * 1024 + '"}}],"isError":false}},'
+    '"id":"{id}","padding":"' + "y" * 1024 + '"}}',
+])
+async def test_raw_channel_matches_response_and_rewrites_id(template):
+    upstream = RecordingUpstream()
+    channel = RawChannel(upstream.send_line)
+    task, raw_id = await _start_request(channel, upstream)
+    assert raw_id.startswith("raw-")
+    assert json.loads(upstream.lines[-1])["params"]["arguments"] == {"text": "中文"}
+
+    line = template.format(id=raw_id).encode()
+    assert channel.dispatch(line)
+    response = await task
+    for downstream_id in (42, "req-1"):
+        message = json.loads(response.with_id(downstream_id))
+        assert message["id"] == downstream_id
+        assert message["result"]["isError"] is False
+    assert response.error_code is None
+
+
+def test_raw_channel_ignores_other_messages():
+    channel = RawChannel(None)
+    other = RawChannel(None)
+    assert not channel.dispatch(b'{"jsonrpc":"2.0","id":3,"result":{}}')
+    assert not channel.dispatch(b'{"jsonrpc":"2.0","method":"notifications/message","params":{}}')
+    # 其他通道（随机标记不同）的透传响应
+    assert not channel.dispatch(b'{"jsonrpc":"2.0","id":"raw-%s-1","result":{}}' % other._token)
+
+
+@pytest.mark.parametrize("line, error_code", [
+    (b'{"jsonrpc":"2.0","id":"x","error":{"code":-32602,"message":"bad"}}', "-32602"),
+    (b'{"jsonrpc":"2.0","id":"x","result":{"content":[],"isError":true}}', "tool_error"),
+    (b'{"jsonrpc":"2.0","id":"x","result":{"content":[{"type":"text","text":"' + b"x" * 70000 + b'"}],'
+     b'"isError":true}}', "tool_error"),
+])
+def test_raw_response_error_code(line, error_code):
+    assert RawResponse(line, (0, 0)).error_code == error_code
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cancel_upstream", [True, False])
+async def test_raw_channel_cancellation(cancel_upstream):
+    upstream = RecordingUpstream()
+    channel = RawChannel(upstream.send_line)
+    channel.cancel_upstream = cancel_upstream
+    task, raw_id = await _start_request(channel, upstream)
+
+    upstream.sent.clear()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    if cancel_upstream:
+        await upstream.sent.wait()
+        cancelled = json.loads(upstream.lines[-1])
+        assert (cancelled["method"], cancelled["params"]["requestId"]) == ("notifications/cancelled", raw_id)
+    else:
+        await asyncio.sleep(0)
+        assert len(upstream.lines) == 1
+    # 已取消请求迟到的响应被丢弃，不交给 ClientSession
+    assert channel.dispatch(b'{"jsonrpc":"2.0","id":"%s","result":{}}' % raw_id.encode())
+
+
+@pytest.mark.anyio
+async def test_raw_channel_close_fails_pending_requests():
+    upstream = RecordingUpstream()
+    channel = RawChannel(upstream.send_line)
+    task, _ = await _start_request(channel, upstream)
+    channel.close()
+    with pytest.raises(mcp.McpError) as exc_info:
+        await task
+    assert exc_info.value.error.code == mcp.types.CONNECTION_CLOSED
+    with pytest.raises(mcp.McpError):
+        await channel.request("tools/call", {})
+
+
+@pytest.mark.anyio
+async def test_passthrough_tool_call_through_fake_server():
+    registry = McpServerRegistry({"mcpServers": {"fake": fake_server_config(passthrough=True)}})
+    try:
+        assert await registry.start()
+        response = await registry.execute_tool_raw("echo", {"text": "raw"})
+        message = json.loads(response.with_id(9))
+        assert (message["id"], message["result"]["content"][0]["text"]) == (9, "raw")
+
+        # 透传调用与 ClientSession 的请求共用同一个上游进程
+        assert (await registry.execute_tool("echo", {"text": "parsed"})).content[0].text == "parsed"
+        response = await registry.execute_tool_raw("echo", {"delay": "not a number"})
+        assert response.error_code == "tool_error"
+    finally:
+        await registry.cleanup()
@@ -0,0 +1,84 @@
+import asyncio
+import sys
+
+import pytest
+
+from conftest import fake_server_config
+from feifei_proxy_mcp.mcp_server_registry import McpServerRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def registry():
+    registry = McpServerRegistry({"mcpServers": {"a": fake_server_config()}})
+    try:
+        assert await registry.start()
+        yield registry
+    finally:
+        await registry.cleanup()
+
+
+async def _tool_names(registry: McpServerRegistry) -> set[str]:
+    return {tool.name for tool in await registry.list_tools() if tool.name.endswith("echo")}
+
+
+async def test_reload_adds_and_keeps_unchanged_servers(registry):
+    pool = registry.pools["a"]
+    changed = asyncio.Event()
+
+    async def listener():
+        changed.set()
+
+    registry.add_tools_changed_listener(listener)
+    diff = await registry.reload({"mcpServers": {"a": fake_server_config(), "b": fake_server_config()}})
+    assert diff == {"added": ["b"], "changed": [], "removed": [], "unchanged": ["a"]}
+    # 配置未变化的 mcp server 保留原有连接池，聚合后工具名带上命名空间
+    assert registry.pools["a"] is pool
+    assert await _tool_names(registry) == {"a.echo", "b.echo"}
+    assert (await registry.execute_tool("b.echo", {"text": "b"})).content[0].text == "b"
+    assert changed.is_set()
+
+    assert await registry.reload({"mcpServers": {"a": fake_server_config(), "b": fake_server_config()}}) == \
+           {"added": [], "changed": [], "removed": [], "unchanged": ["a", "b"]}
+
+
+async def test_changed_server_drains_in_flight_calls(registry):
+    old_pool = registry.pools["a"]
+    in_flight = asyncio.create_task(registry.execute_tool("echo", {"text": "old", "delay": 3}))
+    await asyncio.sleep(0.1)
+
+    diff = await registry.reload({"mcpServers": {"a": fake_server_config(toolsTtl=60)}})
+    assert diff["changed"] == ["a"]
+    new_pool = registry.pools["a"]
+    assert new_pool is not old_pool
+    # 新请求路由到新的连接池，旧连接池上进行中的调用正常完成后才关闭
+    assert (await registry.execute_tool("echo", {"text": "new"})).content[0].text == "new"
+    assert not old_pool._closed
+    assert (await in_flight).content[0].text == "old"
+    async with asyncio.timeout(5):
+        while registry._retiring:
+            await asyncio.sleep(0.05)
+    assert old_pool._closed and not new_pool._closed
+
+
+async def test_removed_server_is_closed(registry):
+    await registry.reload({"mcpServers": {"a": fake_server_config(), "b": fake_server_config()}})
+    pool_b = registry.pools["b"]
+    diff = await registry.reload({"mcpServers": {"a": fake_server_config()}})
+    assert (diff["removed"], diff["unchanged"]) == (["b"], ["a"])
+    # 只剩一个 mcp server，工具名不再带命名空间
+    assert await _tool_names(registry) == {"echo"}
+    async with asyncio.timeout(5):
+        while registry._retiring:
+            await asyncio.sleep(0.05)
+    assert pool_b._closed
+
+
+async def test_failed_reload_keeps_current_configuration(registry):
+    pool = registry.pools["a"]
+    broken = {"command": sys.executable, "args": ["-c", "import sys; sys.exit(1)"], "initTimeout": 5}
+    with pytest.raises(RuntimeError, match="keep current configuration"):
+        await registry.reload({"mcpServers": {"a": fake_server_config(toolsTtl=60), "b": broken}})
+    assert registry.pools == {"a": pool}
+    assert (await registry.execute_tool("echo", {"text": "still a"})).content[0].text == "still a"
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import mcp
+import pytest
+
+from conftest import fake_server_config
+from feifei_proxy_mcp.mcp_server_registry import McpServerRegistry
+
+pytestmark = pytest.mark.anyio
+
+COUNTER = "fake://counter"
+
+
+@pytest.fixture
+async def registry():
+    registry = McpServerRegistry({"mcpServers": {"fake": fake_server_config(resourceCacheTtl=300)}})
+    try:
+        assert await registry.start()
+        yield registry
+    finally:
+        await registry.cleanup()
+
+
+async def _counter(registry: McpServerRegistry) -> str:
+    return (await registry.read_resource(COUNTER)).contents[0].text
+
+
+async def _upstream_subscriptions(registry: McpServerRegistry) -> list[str]:
+    result = await registry.execute_tool("subscriptions", {})
+    return json.loads(result.content[0].text)
+
+
+async def test_list_resources(registry):
+    assert [str(resource.uri) for resource in await registry.list_resources()] == [COUNTER]
+
+
+async def test_read_is_cached_and_does_not_subscribe(registry):
+    assert await _counter(registry) == "0"
+    await registry.execute_tool("bump", {})
+    # 没有下游订阅，缓存只按 ttl 过期
+    assert await _counter(registry) == "0"
+    assert await _upstream_subscriptions(registry) == []
+
+
+async def test_subscription_invalidates_cache(registry):
+    updated = asyncio.Event()
+
+    async def listener(notification):
+        if isinstance(notification, mcp.types.ResourceUpdatedNotification):
+            updated.set()
+
+    registry.add_notification_listener(listener)
+
+    # 多个下游同时订阅同一个资源，只向上游订阅一次
+    assert await asyncio.gather(*(registry.subscribe_resource(COUNTER) for _ in range(3))) == [True] * 3
+    assert await registry.subscribe_resource(COUNTER)
+    assert await _upstream_subscriptions(registry) == [COUNTER]
+
+    assert await _counter(registry) == "0"
+    await registry.execute_tool("bump", {})
+    async with asyncio.timeout(5):
+        await updated.wait()
+    assert await _counter(registry) == "1"
+
+
+async def test_failed_subscription_can_be_retried(registry, monkeypatch):
+    pool = registry.pools["fake"]
+    member = pool._members[0]
+    subscribe = member.subscribe_resource
+
+    async def fail(uri: str):
+        raise mcp.McpError(mcp.types.ErrorData(code=mcp.types.INTERNAL_ERROR, message="subscribe failed"))
+
+    monkeypatch.setattr(member, "subscribe_resource", fail)
+    with pytest.raises(mcp.McpError):
+        await registry.subscribe_resource(COUNTER)
+
+    monkeypatch.setattr(member, "subscribe_resource", subscribe)
+    assert await registry.subscribe_resource(COUNTER)
+    assert await _upstream_subscriptions(registry) == [COUNTER]
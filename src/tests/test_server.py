@@ -0,0 +1,241 @@
+import asyncio
+import json
+import shutil
+
+import pytest
+
+from conftest import FAKE_SERVER, fake_server_config
+from feifei_proxy_mcp import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def proxy(monkeypatch):
+    """ 以模块全局变量构建的代理（不启动 web 服务），用例结束后关闭上游连接 """
+    monkeypatch.setattr(server, "proxy_mcp_server", server.ProxyMcpServer("test"), raising=False)
+    monkeypatch.setattr(server, "mcp_server_registry", None)
+    monkeypatch.setattr(server, "_init_task", None)
+    yield server
+    await server.shutdown_proxy_mcp()
+
+
+async def _ready(proxy) -> tuple[int, dict]:
+    response = await proxy.handle_ready(None)
+    return response.status_code, json.loads(response.body)
+
+
+async def test_failed_startup_keeps_registry_and_reconnects(proxy, monkeypatch, tmp_path):
+    upstream = tmp_path / "fake_mcp_server.py"
+    config = fake_server_config(initTimeout=5, pool={"checkInterval": 0.1},
+                                reconnect={"initialDelay": 0.1, "maxDelay": 0.2})
+    # 上游脚本尚不存在，启动时会话初始化失败
+    config["args"][0] = str(upstream)
+    monkeypatch.setattr(server, "proxy_mcp_server_config", {"mcpServers": {"fake": config}})
+
+    assert await proxy.init_proxy_mcp()
+    registry = proxy.mcp_server_registry
+    assert registry is not None
+    status, body = await _ready(proxy)
+    assert status == 503
+    assert body["status"] == "unavailable"
+
+    # 上游恢复后由连接池在后台重连，不需要重新初始化代理
+    shutil.copy(FAKE_SERVER, upstream)
+    for _ in range(100):
+        if registry.healthy():
+            break
+        await asyncio.sleep(0.1)
+    assert proxy.mcp_server_registry is registry
+    status, body = await _ready(proxy)
+    assert status == 200
+    assert body["servers"]["fake"]["sessions"] == 1
+    assert [tool.name for tool in await proxy.proxy_mcp_tools() if tool.name == "echo"] == ["echo"]
+
+
+async def test_ready_before_init(proxy):
+    status, body = await _ready(proxy)
+    assert status == 503
+    assert body["status"] == "starting"
+
+
+@pytest.fixture
+async def http_proxy(proxy, monkeypatch):
+    """ 无状态 streamable_http 代理的 web 应用（不监听端口），通过 httpx 的 ASGI 传输访问 """
+    import httpx
+    from sse_starlette.sse import AppStatus
+
+    # sse_starlette 的退出事件绑定在首次创建它的事件循环上，每个用例使用新的事件循环
+    monkeypatch.setattr(AppStatus, "should_exit_event", None)
+    monkeypatch.setattr(server, "proxy_mcp_server_config", {"mcpServers": {"fake": fake_server_config()}})
+    proxy.create_proxy_mcp_server()
+    app = proxy.create_web_app()
+    async with app.router.lifespan_context(app):
+        assert await proxy.init_proxy_mcp()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://proxy") as client:
+            yield client
+
+
+def _tool_call(name: str, arguments: dict, request_id: int = 1, **params) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": name, "arguments": arguments, **params}}
+
+
+_HEADERS = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+
+
+def _sse_messages(body: str) -> list[dict]:
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+
+
+async def test_tool_call_bypasses_session_manager(http_proxy):
+    response = await http_proxy.post("/mcp/", json=_tool_call("echo", {"text": "hi"}, request_id=7), headers=_HEADERS)
+    assert response.status_code == 200
+    # 会话管理器返回 SSE 响应，快速路径直接返回 JSON
+    assert response.headers["content-type"] == "application/json"
+    message = response.json()
+    assert message["id"] == 7
+    assert message["result"]["content"] == [{"type": "text", "text": "hi"}]
+    assert message["result"]["isError"] is False
+
+
+async def test_tool_call_streams_upstream_logs(http_proxy):
+    response = await http_proxy.post("/mcp/", json=_tool_call("report", {"steps": 2}), headers=_HEADERS)
+    assert response.headers["content-type"] == "text/event-stream"
+    messages = _sse_messages(response.text)
+    assert [message["params"]["data"] for message in messages[:-1]] == ["step 1", "step 2"]
+    assert messages[-1]["id"] == 1
+    assert messages[-1]["result"]["content"][0]["text"] == "2 steps"
+
+
+async def test_tool_call_with_progress_token_uses_session_manager(http_proxy):
+    response = await http_proxy.post("/mcp/", json=_tool_call("report", {"steps": 2}, _meta={"progressToken": "p"}),
+                                     headers=_HEADERS)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = _sse_messages(response.text)
+    progress = [message["params"] for message in messages if message.get("method") == "notifications/progress"]
+    assert [(item["progressToken"], item["progress"]) for item in progress] == [("p", 1), ("p", 2)]
+    assert messages[-1]["result"]["content"][0]["text"] == "2 steps"
+
+
+async def test_tool_call_errors(http_proxy):
+    response = await http_proxy.post("/mcp/", json=_tool_call("missing", {}), headers=_HEADERS)
+    result = response.json()["result"]
+    assert result["isError"] is True
+    assert "Unknown tool" in result["content"][0]["text"]
+
+
+async def test_mcp_client_through_fast_path(http_proxy):
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    def client_factory(headers=None, timeout=None, auth=None):
+        return type(http_proxy)(transport=http_proxy._transport, base_url="http://proxy", headers=headers)
+
+    async with streamablehttp_client("http://proxy/mcp/", httpx_client_factory=client_factory) as streams:
+        async with ClientSession(streams[0], streams[1]) as session:
+            await session.initialize()
+            tools = await session.list_tools()
+            assert "echo" in [tool.name for tool in tools.tools]
+            result = await session.call_tool("echo", {"text": "via client"})
+            assert result.content[0].text == "via client"
+
+
+@pytest.mark.parametrize("config, error", [
+    ({}, "mcpServers"),
+    ({"mcpServers": []}, "mcpServers"),
+    ({"mcpServers": {"fetch": "uvx mcp-server-fetch"}}, "must be an object"),
+    ({"mcpServers": {"fetch": {"args": ["mcp-server-fetch"]}}}, "command is required for stdio"),
+    ({"mcpServers": {"fetch": {"transport": "websocket", "url": "ws://x"}}}, "unsupported transport"),
+    ({"mcpServers": {"fetch": {"transport": "streamable_http"}}}, "url is required"),
+    ({"mcpServers": {"petstore": {"transport": "openapi", "url": "http://x"}}}, "specPath is required"),
+    ({"mcpServers": {"fetch": {"command": "uvx", "args": "mcp-server-fetch"}}}, "args must be a list"),
+])
+def test_invalid_config_is_rejected(monkeypatch, config, error):
+    monkeypatch.delenv("PROXY_MCP_SERVER_CONFIG_FILE", raising=False)
+    monkeypatch.setenv("PROXY_MCP_SERVER_CONFIG", json.dumps(config))
+    with pytest.raises(ValueError, match=error):
+        server.load_proxy_mcp_server_config()
+
+
+async def test_reload_rejects_invalid_config(proxy, monkeypatch):
+    monkeypatch.setattr(server, "proxy_mcp_server_config", {"mcpServers": {"fake": fake_server_config()}})
+    assert await proxy.init_proxy_mcp()
+    registry = proxy.mcp_server_registry
+
+    with pytest.raises(ValueError, match="url is required"):
+        await proxy.reload_proxy_mcp({"mcpServers": {"remote": {"transport": "sse"}}})
+    # 配置不合法时不影响当前运行的 mcp server
+    assert proxy.mcp_server_registry is registry
+    assert list(registry.pools) == ["fake"]
+    assert (await registry.execute_tool("echo", {"text": "still up"})).content[0].text == "still up"
+
+
+class StubRegistry:
+    def __init__(self, healthy: bool):
+        self.is_healthy = healthy
+
+    def healthy(self) -> bool:
+        return self.is_healthy
+
+
+@pytest.fixture
+def watchdog(monkeypatch):
+    """ 多进程模式的 worker 守护任务，记录发送给当前进程的信号而不真正退出 """
+    signals = []
+    monkeypatch.setattr(server, "workers", 2)
+    monkeypatch.setattr(server, "worker_restart_after", 0.4)
+    monkeypatch.setattr(server, "_watchdog_task", None)
+    monkeypatch.setattr(server.os, "kill", lambda pid, sig: signals.append((pid, sig)))
+    yield signals
+    if server._watchdog_task is not None:
+        server._watchdog_task.cancel()
+
+
+async def test_watchdog_restarts_worker_when_upstream_stays_unavailable(watchdog, monkeypatch):
+    import os
+    import signal
+
+    monkeypatch.setattr(server, "mcp_server_registry", StubRegistry(healthy=False))
+    server.start_worker_watchdog()
+    async with asyncio.timeout(5):
+        await server._watchdog_task
+    assert watchdog == [(os.getpid(), signal.SIGTERM)]
+
+
+async def test_watchdog_tolerates_short_outages(watchdog, monkeypatch):
+    registry = StubRegistry(healthy=False)
+    monkeypatch.setattr(server, "mcp_server_registry", registry)
+    server.start_worker_watchdog()
+    for _ in range(4):
+        # 每次不可用的时间都短于 worker_restart_after
+        registry.is_healthy = False
+        await asyncio.sleep(0.25)
+        registry.is_healthy = True
+        await asyncio.sleep(0.25)
+    assert watchdog == []
+    assert not server._watchdog_task.done()
+
+
+async def test_watchdog_is_disabled_for_single_worker(watchdog, monkeypatch):
+    monkeypatch.setattr(server, "workers", 1)
+    server.start_worker_watchdog()
+    assert server._watchdog_task is None
+
+
+@pytest.mark.parametrize("env, error", [
+    ({"TRANSPORT_TYPE": "sse"}, "not supported for sse transport"),
+    ({"PROXY_MCP_STATEFUL_HTTP": "true"}, "not supported with PROXY_MCP_STATEFUL_HTTP"),
+])
+def test_multiple_workers_require_stateless_http(monkeypatch, env, error):
+    # 读取环境变量会覆盖模块全局变量，用例结束后恢复
+    for name in ("transport_type", "proxy_mcp_name", "result_cache_max_bytes", "max_concurrency", "max_queue",
+                 "queue_timeout", "call_timeout", "drain_timeout", "admin_token", "batch_concurrency",
+                 "batch_max_calls", "workers", "worker_restart_after", "trace_buffer_size", "trace_slow_ms",
+                 "trace_profile", "stateful_http", "event_store_max_bytes", "event_store_max_events_per_stream"):
+        monkeypatch.setattr(server, name, getattr(server, name))
+    monkeypatch.setenv("PROXY_MCP_WORKERS", "2")
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    with pytest.raises(ValueError, match=error):
+        server.load_proxy_mcp_settings()
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from conftest import fake_server_config
+from feifei_proxy_mcp.mcp_server_registry import McpServerRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+async def _start(**config) -> McpServerRegistry:
+    registry = McpServerRegistry({"mcpServers": {"fake": fake_server_config(**config)}})
+    assert await registry.start()
+    return registry
+
+
+def _names(tools) -> set[str]:
+    return {tool.name for tool in tools}
+
+
+async def test_catalog_is_cached_until_ttl(monkeypatch):
+    registry = await _start(toolsTtl=0.5)
+    pool = registry.pools["fake"]
+    try:
+        fetches = []
+        dispatch = pool._dispatch
+
+        async def record_dispatch(description, request, idempotent=True):
+            if description == "tools/list":
+                fetches.append(description)
+            return await dispatch(description, request, idempotent)
+
+        monkeypatch.setattr(pool, "_dispatch", record_dispatch)
+
+        # 上游新增工具但不推送 list_changed，ttl 内一直使用缓存的目录
+        await registry.execute_tool("register", {"name": "quiet", "notify": False})
+        for _ in range(3):
+            assert "quiet" not in _names(await registry.list_tools())
+        assert fetches == []
+
+        # 过期后先返回旧目录，同时在后台刷新
+        await asyncio.sleep(0.6)
+        assert "quiet" not in _names(await registry.list_tools())
+        await pool._tools_refresh_task
+        assert fetches == ["tools/list"]
+        assert "quiet" in _names(await registry.list_tools())
+        assert (await registry.execute_tool("quiet", {})).content[0].text == "quiet"
+    finally:
+        await registry.cleanup()
+
+
+async def test_list_changed_refreshes_catalog_and_notifies():
+    registry = await _start(toolsTtl=300)
+    try:
+        changed = asyncio.Event()
+
+        async def listener():
+            changed.set()
+
+        registry.add_tools_changed_listener(listener)
+        await registry.execute_tool("register", {"name": "announced"})
+        async with asyncio.timeout(5):
+            await changed.wait()
+
+        # 收到 list_changed 后不等待 ttl 过期，立即刷新聚合目录与路由表
+        assert "announced" in _names(await registry.list_tools())
+        assert (await registry.execute_tool("announced", {})).content[0].text == "announced"
+    finally:
+        await registry.cleanup()
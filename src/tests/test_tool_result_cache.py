@@ -0,0 +1,71 @@
+import mcp
+
+from feifei_proxy_mcp.tool_result_cache import ToolResultCache, canonical_arguments_hash, tool_call_key
+
+
+def _result(text: str, is_error: bool = False) -> mcp.types.CallToolResult:
+    return mcp.types.CallToolResult(content=[mcp.types.TextContent(type="text", text=text)], isError=is_error)
+
+
+def _size(result: mcp.types.CallToolResult) -> int:
+    return len(result.model_dump_json(by_alias=True, exclude_none=True))
+
+
+def test_arguments_hash_ignores_key_order():
+    assert canonical_arguments_hash({"a": 1, "b": [1, 2]}) == canonical_arguments_hash({"b": [1, 2], "a": 1})
+    assert canonical_arguments_hash({"a": 1}) != canonical_arguments_hash({"a": 2})
+
+
+def test_hit_and_expiry(clock):
+    cache = ToolResultCache(max_bytes=1024 * 1024)
+    key = tool_call_key("fake", "echo", {"text": "hi"})
+    cache.put(key, _result("hi"), ttl=60)
+
+    assert cache.get(key).content[0].text == "hi"
+    clock.advance(60)
+    assert cache.get(key) is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_errors_are_never_cached(clock):
+    cache = ToolResultCache(max_bytes=1024 * 1024)
+    key = tool_call_key("fake", "echo", {})
+    cache.put(key, _result("failed", is_error=True), ttl=60)
+    assert cache.get(key) is None
+
+
+def test_lru_eviction_within_budget(clock):
+    result = _result("x" * 100)
+    cache = ToolResultCache(max_bytes=_size(result) * 2)
+    first, second, third = (tool_call_key("fake", "echo", {"n": n}) for n in range(3))
+    cache.put(first, result, ttl=60)
+    cache.put(second, result, ttl=60)
+    # 访问 first 后 second 成为最久未使用
+    cache.get(first)
+    cache.put(third, result, ttl=60)
+
+    assert cache.get(second) is None
+    assert cache.get(first) is not None
+    assert cache.get(third) is not None
+    assert cache.evictions == 1
+    assert cache.current_bytes <= cache.max_bytes
+
+
+def test_oversized_result_is_skipped(clock):
+    cache = ToolResultCache(max_bytes=10)
+    key = tool_call_key("fake", "echo", {})
+    cache.put(key, _result("x" * 100), ttl=60)
+    assert cache.get(key) is None
+    assert cache.current_bytes == 0
+
+
+def test_invalidate_server(clock):
+    cache = ToolResultCache(max_bytes=1024 * 1024)
+    cache.put(tool_call_key("a", "echo", {}), _result("a"), ttl=60)
+    cache.put(tool_call_key("a", "other", {}), _result("a"), ttl=60)
+    cache.put(tool_call_key("b", "echo", {}), _result("b"), ttl=60)
+
+    assert cache.invalidate_server("a") == 2
+    assert cache.stats()["entries"] == 1
+    assert cache.current_bytes == _size(_result("b"))
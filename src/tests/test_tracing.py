@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from conftest import fake_server_config
+from feifei_proxy_mcp import tracing
+from feifei_proxy_mcp.mcp_server_registry import McpServerRegistry
+from feifei_proxy_mcp.tracing import TraceRecorder
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    """ 替换进程内的追踪记录，用例之间互不影响 """
+    recorder = TraceRecorder()
+    monkeypatch.setattr(tracing, "recorder", recorder)
+    return recorder
+
+
+def _record(recorder: TraceRecorder, tool: str, duration: float):
+    trace = recorder.start(tool)
+    trace.started -= duration
+    recorder.finish(trace)
+
+
+def test_recent_and_slowest_are_bounded(recorder):
+    recorder.configure(3)
+    for n, duration in enumerate([0.5, 0.1, 0.9, 0.2, 0.3, 0.7, 0.05]):
+        _record(recorder, f"t{n}", duration)
+
+    snapshot = recorder.snapshot()
+    assert [trace["tool"] for trace in snapshot["recent"]] == ["t6", "t5", "t4"]
+    assert [trace["tool"] for trace in snapshot["slowest"]] == ["t2", "t5", "t0"]
+
+
+def test_disabled_recorder_records_nothing(recorder):
+    recorder.configure(0)
+    with tracing.traced_call("echo") as trace:
+        with tracing.span("upstream"):
+            tracing.annotate(server="fake")
+    assert trace is None
+    assert recorder.snapshot() == {"recent": [], "slowest": []}
+
+
+def test_slow_call_hooks(recorder):
+    recorder.configure(10, slow_threshold=0.2)
+    slow = []
+
+    def failing_hook(trace):
+        raise RuntimeError("hook failed")
+
+    recorder.add_slow_call_hook(failing_hook)
+    recorder.add_slow_call_hook(lambda trace: slow.append(trace.tool))
+    _record(recorder, "fast", 0.1)
+    _record(recorder, "slow", 0.3)
+    # 钩子失败不影响记录与其他钩子
+    assert slow == ["slow"]
+    assert len(recorder.snapshot()["recent"]) == 2
+
+
+def test_http_request_spans(recorder):
+    recorder.configure(10)
+    scope = {}
+    tracing.begin_request(scope)
+    with tracing.traced_call("echo", scope):
+        with tracing.span("upstream"):
+            time.sleep(0.01)
+    # 响应发送完成前不结束追踪
+    assert recorder.snapshot()["recent"] == []
+    tracing.end_request(scope)
+
+    trace = recorder.snapshot()["recent"][0]
+    assert set(trace["spansMs"]) == {"request", "upstream", "response"}
+    assert trace["spansMs"]["upstream"] >= 10
+    assert trace["unaccountedMs"] >= 0
+
+
+async def test_tool_call_stages_are_traced(recorder):
+    recorder.configure(10)
+    registry = McpServerRegistry({"mcpServers": {"fake": fake_server_config()}})
+    try:
+        assert await registry.start()
+        with tracing.traced_call("echo"):
+            await registry.execute_tool("echo", {"text": "traced", "delay": 0.05})
+        with tracing.traced_call("echo"):
+            await registry.execute_tool("echo", {"delay": "not a number"})
+    finally:
+        await registry.cleanup()
+
+    failed, succeeded = recorder.snapshot()["recent"]
+    assert {"route", "acquire", "upstream"} <= set(succeeded["spansMs"])
+    assert succeeded["spansMs"]["upstream"] >= 50
+    assert succeeded["attributes"] == {"server": "fake", "sessionInflight": 0}
+    assert failed["attributes"]["error"] == "tool_error"
+
+
+def test_profiler_samples_slow_call(recorder):
+    recorder.configure(10, slow_threshold=0.05, profile=True)
+
+    def busy_loop():
+        deadline = time.perf_counter() + 0.2
+        while time.perf_counter() < deadline:
+            pass
+
+    with tracing.traced_call("busy"):
+        busy_loop()
+
+    profile = recorder.snapshot()["recent"][0]["profile"]
+    assert profile
+    assert any(":busy_loop:" in item["stack"] for item in profile)